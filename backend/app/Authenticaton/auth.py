@@ -3,6 +3,7 @@ from jose import jwt
 import os
 from dotenv import load_dotenv
 from passlib.context import CryptContext
+from ..cache import TTLCache
 
 pwd_context = CryptContext(schemes=["argon2"], deprecated = "auto")
 
@@ -23,4 +24,18 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+# Principals resolved by get_current_user, keyed on the token subject (user_name).
+# Entries are dropped explicitly when the user or its role changes; the TTL bounds
+# staleness for changes made through another worker process.
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+def invalidate_principal(username: str):
+    principal_cache.pop(username)
+
+def invalidate_role_principals(role_id: int):
+    principal_cache.discard_where(lambda principal: principal["role_id"] == role_id)
@@ -0,0 +1,147 @@
+"""
+Round-trip regression benchmark for dashboard endpoints.
+
+Calls the route handlers directly on a connection from the configured database, counting
+the statements each request sends and timing it:
+
+    python -m app.api.bench --runs 50
+    python -m app.api.bench --endpoint admin-stats users --runs 200
+
+Every endpoint has a round-trip budget; the run exits non-zero when any request needs
+more, so it can gate CI against reintroducing one-query-per-metric handlers and
+per-row (N+1) lookups. Round trips do not depend on table sizes, so the budget holds
+however large the database grows. One untimed call first loads process-level caches,
+as a running server would have. tests/test_query_budgets.py checks the same budgets
+against a stub connection, so they hold in CI without a database:
+
+    python -m pytest -q tests
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from ..db import async_database, database
+from ..services.lookups import lookups
+from . import core
+
+LIST_ARGS = {"cursor": None, "limit": 500}
+
+# endpoint -> (handler, round-trip budget per request, extra handler arguments)
+ENDPOINTS = {
+    "admin-stats": (core.get_admin_dashboard_stats, 1, {}),
+    "manager-stats": (core.get_manager_dashboard_stats, 5, {}),
+    "admin-chart-data": (core.get_admin_chart_data, 3, {}),
+    "warehouse-manager-stats": (core.get_warehouse_manager_stats, 6, {}),
+    "users": (core.get_users, 1, {}),
+    "employees": (core.get_employees, 1, {"employee_type_id": None, **LIST_ARGS}),
+}
+
+
+class CountingCursor:
+    """Wraps a psycopg cursor and counts execute calls (one round trip each)."""
+
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    async def execute(self, *args, **kwargs):
+        self._counter[0] += 1
+        return await self._cursor.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CountingConnection:
+    def __init__(self, conn):
+        self._conn = conn
+        self.counter = [0]
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._conn.cursor(*args, **kwargs), self.counter)
+
+    async def execute(self, *args, **kwargs):
+        self.counter[0] += 1
+        return await self._conn.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class SyncCountingCursor(CountingCursor):
+    """CountingCursor for the psycopg2 connections of sync handlers."""
+
+    def execute(self, *args, **kwargs):
+        self._counter[0] += 1
+        return self._cursor.execute(*args, **kwargs)
+
+
+class SyncCountingConnection(CountingConnection):
+    def cursor(self, *args, **kwargs):
+        return SyncCountingCursor(self._conn.cursor(*args, **kwargs), self.counter)
+
+
+def admin_user():
+    """A principal with the Admin role, for handlers that check it."""
+    with database.connection() as conn:
+        cur = conn.cursor()
+        try:
+            return {"role_id": lookups.role_id(cur, "Admin")}
+        finally:
+            cur.close()
+
+
+async def run_endpoint(name, runs):
+    handler, budget, kwargs = ENDPOINTS[name]
+    is_async = asyncio.iscoroutinefunction(handler)
+    current_user = admin_user()
+    round_trips, latencies = [], []
+    async with async_database.connection() as async_conn:
+        with database.connection() as sync_conn:
+            counting = CountingConnection(async_conn) if is_async else SyncCountingConnection(sync_conn)
+            # Run 0 is the untimed warm-up
+            for run in range(runs + 1):
+                counting.counter[0] = 0
+                started = time.perf_counter()
+                if is_async:
+                    await handler(current_user=current_user, conn=counting, **kwargs)
+                else:
+                    handler(current_user=current_user, conn=counting, **kwargs)
+                if run:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    round_trips.append(counting.counter[0])
+                if is_async:
+                    await async_conn.rollback()
+                else:
+                    sync_conn.rollback()
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "runs": runs,
+        "round_trips": max(round_trips),
+        "budget": budget,
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        "ok": max(round_trips) <= budget,
+    }
+
+
+async def main(args):
+    await async_database.init_pool()
+    try:
+        results = [await run_endpoint(name, args.runs) for name in args.endpoint]
+    finally:
+        await async_database.close_pool()
+    for result in results:
+        print(json.dumps(result))
+    return all(result["ok"] for result in results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--endpoint", nargs="+", default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument("--runs", type=int, default=50)
+    sys.exit(0 if asyncio.run(main(parser.parse_args())) else 1)
@@ -1,11 +1,20 @@
 from fastapi import Depends,HTTPException,status,APIRouter
 from fastapi.security import OAuth2PasswordBearer,OAuth2PasswordRequestForm
-from fastapi import Response
+from fastapi import Query, Request, Response
 from jose import JWTError, jwt 
 from datetime import timedelta
-from ..db import database
+from ..db import database, async_database
 from ..Authenticaton import auth
+from ..realtime.hub import hub, topic
+from ..services import allocation, bulk_orders
+from ..services.capacity_index import trip_capacity
+from ..services.lookups import lookups
+from ..services.roster import STAFF_MEMBER_QUERY, roster
+from .etags import EMPLOYEE_TYPE, INVENTORY, PRODUCT, catalog_versions, conditional
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_query, page
+from .report_cache import ORDERS, PRODUCTS, SCHEDULES, report_cache
 from datetime import datetime,date
+from typing import Optional
 
 
 from ..schemas import schemas
@@ -36,7 +45,9 @@ orders_router = APIRouter(
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+_PRINCIPAL_QUERY = 'SELECT user_id, employee_id, role_id, user_name, email FROM "user" where user_name = %s;'
+
+def _token_subject(token: str) -> str:
     try:
         payload = jwt.decode(token, auth.SECRET_KEY, algorithms=auth.ALGORITHM)
         username: str = payload.get("sub")
@@ -46,51 +57,117 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"}
             )
+        return username
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"}
         )
-    
-    conn = None
-    cur = None
-    try:
-        conn = database.get_db_connection()
-        cur = conn.cursor()
 
-        cur.execute('SELECT user_id, employee_id, role_id, user_name, email FROM "user" where user_name = %s;', (username,))
-        
-        user = cur.fetchone()
+def _remember_principal(username: str, user) -> dict:
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    # Return user data as a dictionary for consistent access
+    principal = {
+        "user_id": user['user_id'] if isinstance(user, dict) else user[0],
+        "employee_id": user['employee_id'] if isinstance(user, dict) else user[1],
+        "role_id": user['role_id'] if isinstance(user, dict) else user[2],
+        "user_name": user['user_name'] if isinstance(user, dict) else user[3],
+        "email": user['email'] if isinstance(user, dict) else user[4]
+    }
+    auth.principal_cache.set(username, principal)
+    return dict(principal)
 
-        if not user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        
-        # Return user data as a dictionary for consistent access
-        return {
-            "user_id": user['user_id'] if isinstance(user, dict) else user[0],
-            "employee_id": user['employee_id'] if isinstance(user, dict) else user[1],
-            "role_id": user['role_id'] if isinstance(user, dict) else user[2],
-            "user_name": user['user_name'] if isinstance(user, dict) else user[3],
-            "email": user['email'] if isinstance(user, dict) else user[4]
-        }
+def get_current_user(token: str = Depends(oauth2_scheme), conn = Depends(database.get_db)):
+    username = _token_subject(token)
+
+    principal = auth.principal_cache.get(username)
+    if principal is not None:
+        return dict(principal)
+
+    cur = conn.cursor()
+    try:
+        cur.execute(_PRINCIPAL_QUERY, (username,))
+        return _remember_principal(username, cur.fetchone())
     
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     finally:
-        if cur:
+        cur.close()
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), conn = Depends(async_database.get_async_db)):
+    """get_current_user for `async def` routes; shares the request's async connection."""
+    username = _token_subject(token)
+
+    principal = auth.principal_cache.get(username)
+    if principal is not None:
+        return dict(principal)
+
+    cur = conn.cursor()
+    try:
+        await cur.execute(_PRINCIPAL_QUERY, (username,))
+        return _remember_principal(username, await cur.fetchone())
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await conn.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    finally:
+        await cur.close()
+
+def get_current_user_lazy(token: str = Depends(oauth2_scheme)):
+    """
+    get_current_user for routes that need no request connection (cached reports): a
+    principal cache hit takes nothing from the pool, a miss borrows a connection briefly.
+    """
+    username = _token_subject(token)
+
+    principal = auth.principal_cache.get(username)
+    if principal is not None:
+        return dict(principal)
+
+    try:
+        with database.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(_PRINCIPAL_QUERY, (username,))
+                return _remember_principal(username, cur.fetchone())
+            finally:
+                cur.close()
+    except HTTPException:
+        raise
+    except database.PoolTimeout as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Database connection error: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+def requires(permission: str):
+    """
+    Dependency resolving the current user and checking that their role grants
+    `permission` ("resource:action", e.g. "users:write"); 403 otherwise. Roles come from
+    the process-level lookup cache, so the check itself runs no query.
+    """
+    def check(current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
+        cur = conn.cursor()
+        try:
+            allowed = lookups.allows(cur, current_user["role_id"], permission)
+        finally:
             cur.close()
-        if conn:
-            conn.close()
+        if not allowed:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You haven't access for the data")
+        return current_user
+    return check
 
 @auth_router.post("/auth/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    conn = database.get_db_connection()
+def login(form_data: OAuth2PasswordRequestForm = Depends(), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
@@ -130,10 +207,9 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
     
     finally:
         cur.close()
-        conn.close()
 
 @auth_router.post("/auth/register_public_customer")
-def register_public_customer(payload: schemas.PublicCustomerRegister):
+def register_public_customer(payload: schemas.PublicCustomerRegister, conn = Depends(database.get_db)):
     """Public registration endpoint for customer accounts only.
 
     Fixes applied:
@@ -154,12 +230,7 @@ def register_public_customer(payload: schemas.PublicCustomerRegister):
     if not username or not password or not email or not name:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="username, password, email and name are required")
 
-    try:
-        conn = database.get_db_connection()
-    except Exception as e:
-        # Database connection failed; return 503 with a helpful message
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Database connection error: {e}")
-
+    # Database connection failures surface as 503 from database.get_db
     cur = conn.cursor()
 
     try:
@@ -220,7 +291,6 @@ def register_public_customer(payload: schemas.PublicCustomerRegister):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     finally:
         cur.close()
-        conn.close()
 
 @auth_router.post("/auth/logout", status_code=status.HTTP_204_NO_CONTENT, tags = ["Authentication & Profile"])
 def logout():
@@ -237,20 +307,17 @@ def test_auth(current_user: dict = Depends(get_current_user)):
     }
 
 @auth_router.get("/auth/profile", response_model=schemas.UserResponse)
-def get_profile(current_user: dict = Depends(get_current_user)):
+def get_profile(current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
 
     user_id = current_user["user_id"]
     role_id = current_user["role_id"]
     username = current_user["user_name"]
     email = current_user["email"]
 
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT role_name FROM role WHERE role_id = %s;",(role_id,))
-        role_result = cur.fetchone()
-        role_name = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
+        role_name = lookups.role_name(cur, role_id)
 
         # Fetch linked customer_id if exists
         cur.execute("SELECT customer_id FROM customer WHERE user_id = %s;", (user_id,))
@@ -273,23 +340,22 @@ def get_profile(current_user: dict = Depends(get_current_user)):
 
     finally:
         cur.close()
-        conn.close()
 
 @auth_router.put("/auth/profile", response_model=schemas.UserResponse)
-def update_profile(profile: schemas.UserPorfileUpdate, current_user: dict = Depends(get_current_user)):
+def update_profile(profile: schemas.UserPorfileUpdate, current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     user_id = current_user["user_id"]
     role_id = current_user["role_id"]
     username = current_user["user_name"]
     email = current_user["email"]
     employee_id = current_user["employee_id"]
 
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
         cur.execute('UPDATE "user" SET email= %s WHERE user_id=%s RETURNING user_id;',(profile.email, user_id,))
         updated = cur.fetchone()
         conn.commit()
+        auth.invalidate_principal(username)
 
         if not updated:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
@@ -301,9 +367,7 @@ def update_profile(profile: schemas.UserPorfileUpdate, current_user: dict = Depe
         if not updated:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Employee not found")
         
-        cur.execute("SELECT role_name FROM role WHERE role_id = %s;",(role_id,))
-        role_result = cur.fetchone()
-        role_name = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
+        role_name = lookups.role_name(cur, role_id)
         return {
             "user_id": user_id,
             "user_name": username,
@@ -316,245 +380,177 @@ def update_profile(profile: schemas.UserPorfileUpdate, current_user: dict = Depe
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     finally:
         cur.close()
-        conn.close()
  
 @user_router.get("/users")
-def get_users(current_user: dict = Depends(get_current_user)):
-
-    role_id = current_user["role_id"]
-
-    conn = database.get_db_connection()
+def get_users(current_user: dict = Depends(requires("users:read")), conn = Depends(database.get_db)):
     cur = conn.cursor()
     
     try:
-        cur.execute("SELECT role_name FROM role WHERE role_id = %s;",(role_id,))
-        role_result = cur.fetchone()
-        current_user_role = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-        if current_user_role == "Admin":
-            cur.execute('SELECT user_id, user_name, email, role_id FROM "user";')
-            rows = cur.fetchall()
-
-            users = []
-            for row in rows:
-                # Handle both dict and tuple formats
-                role_id_for_row = row['role_id'] if isinstance(row, dict) else row[3]
-                cur.execute("SELECT role_name FROM role WHERE role_id = %s;",(role_id_for_row,))
-                role_result = cur.fetchone()
-                role_name = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-                
-                user : schemas.UserResponse = {
-                    "user_id": row['user_id'] if isinstance(row, dict) else row[0],
-                    "user_name": row['user_name'] if isinstance(row, dict) else row[1],
-                    "email": row['email'] if isinstance(row, dict) else row[2],
-                    "role": role_name
-                }
-                users.append(user)
+        # One query for every user and role name
+        cur.execute('''
+            SELECT u.user_id, u.user_name, u.email, r.role_name
+            FROM "user" u
+            LEFT JOIN role r ON r.role_id = u.role_id;
+        ''')
+        rows = cur.fetchall()
 
-            return users
-        else:
-            conn.rollback()
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail = "You haven't access for the data")
+        users = []
+        for row in rows:
+            user : schemas.UserResponse = {
+                "user_id": row['user_id'],
+                "user_name": row['user_name'],
+                "email": row['email'],
+                "role": row['role_name']
+            }
+            users.append(user)
+
+        return users
     
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail = str(e))
     
     finally:
         cur.close()
-        conn.close()
 
 @user_router.post("/users", response_model=schemas.UserResponse)
-def create_user(new_user: schemas.UserCreate, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def create_user(new_user: schemas.UserCreate, current_user: dict = Depends(requires("users:write")), conn = Depends(database.get_db)):
     cur = conn.cursor()
-    role_id = current_user["role_id"]
     try:
-        cur.execute("SELECT role_name FROM role WHERE role_id = %s;",(role_id,))
-        role_result = cur.fetchone()
-        current_user_role = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-        if current_user_role == "Admin":
-            cur.execute('SELECT COUNT(user_id) FROM "user";')
-            user_count_result = cur.fetchone()
-            user_count = (user_count_result['count'] if isinstance(user_count_result, dict) else user_count_result[0]) or 0
+        role_id = lookups.role_id(cur, new_user.role)
+        if role_id is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Role not found")
+
+        cur.execute('SELECT COUNT(user_id) FROM "user" WHERE user_name = %s or email = %s',(new_user.username,new_user.email,))
+        exist_user_count_result = cur.fetchone()
+        if (exist_user_count_result['count'] if isinstance(exist_user_count_result, dict) else exist_user_count_result[0]):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail = "Username or Email already exists")
+        
+        password_hash = auth.get_password_hash(new_user.password)
 
-            new_user_id = user_count+1
+        cur.execute('INSERT INTO "user" (employee_id, role_id, user_name, email, password_hash, last_login) VALUES (%s, %s, %s, %s, %s, %s) RETURNING user_id;',(new_user.employee_id, role_id, new_user.username, new_user.email, password_hash, datetime.now(),))
+        new_user_id = cur.fetchone()['user_id']
 
-            cur.execute("SELECT role_id FROM role where role_name = %s",(new_user.role,))
-            role_row = cur.fetchone()
-            if not role_row:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Role not found")
-            role_id = role_row['role_id'] if isinstance(role_row, dict) else role_row[0]
-
-            cur.execute('SELECT COUNT(user_id) FROM "user" WHERE user_name = %s or email = %s',(new_user.username,new_user.email,))
-            exist_user_count_result = cur.fetchone()
-            if (exist_user_count_result['count'] if isinstance(exist_user_count_result, dict) else exist_user_count_result[0]):
-                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail = "Username or Email already exists")
-            
-            password_hash = auth.get_password_hash(new_user.password)
-
-            cur.execute('INSERT INTO "user" (user_id, employee_id, role_id, user_name, email, password_hash, last_login) VALUES (%s, %s, %s, %s, %s, %s, %s);',(new_user_id, new_user.employee_id, role_id, new_user.username, new_user.email, password_hash, datetime.now(),))
-
-            conn.commit()
-
-            return{
-                "user_id": new_user_id,
-                "user_name": new_user.username,
-                "email": new_user.email,
-                "role" : new_user.role
-            }
+        conn.commit()
 
-        else:
-            conn.rollback()
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail = "You haven't access for the data")
-        
+        return{
+            "user_id": new_user_id,
+            "user_name": new_user.username,
+            "email": new_user.email,
+            "role" : new_user.role
+        }
+
+    except HTTPException:
+        conn.rollback()
+        raise
     except Exception as e:
+        conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     finally:
         cur.close()
-        conn.close()
 
 @user_router.get("/users/{user_id}",response_model=schemas.UserResponse)
-def get_user(user_id: int,current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def get_user(user_id: int,current_user: dict = Depends(requires("users:read")), conn = Depends(database.get_db)):
     cur = conn.cursor()
-    role_id = current_user["role_id"]
     try:
-        cur.execute("SELECT role_name FROM role WHERE role_id = %s;",(role_id,))
-        role_result = cur.fetchone()
-        current_user_role = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-        if current_user_role == "Admin":
-            cur.execute('SELECT role_id,user_name, email FROM "user" WHERE user_id = %s;', (user_id,))
-            user_count = cur.rowcount
-            if user_count == 0:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID {user_id} not found")
-            user = cur.fetchone()
-
-            cur.execute("SELECT role_name FROM role WHERE role_id = %s;",(user['role_id'] if isinstance(user, dict) else user[0],))
-            role_result = cur.fetchone()
-            role_name = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-
-            return{
-                "user_id": user_id,
-                "user_name": user['user_name'] if isinstance(user, dict) else user[1],
-                "email": user['email'] if isinstance(user, dict) else user[2],
-                "role": role_name
-            }
+        cur.execute('SELECT role_id,user_name, email FROM "user" WHERE user_id = %s;', (user_id,))
+        user_count = cur.rowcount
+        if user_count == 0:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID {user_id} not found")
+        user = cur.fetchone()
 
-        else:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail = "You haven't access for the data")
-        
+        role_name = lookups.role_name(cur, user['role_id'] if isinstance(user, dict) else user[0])
+
+        return{
+            "user_id": user_id,
+            "user_name": user['user_name'] if isinstance(user, dict) else user[1],
+            "email": user['email'] if isinstance(user, dict) else user[2],
+            "role": role_name
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     finally:
         cur.close()
-        conn.close()
 
 @user_router.put("/users/{user_id}", response_model=schemas.UserResponse)
-def update_user(user_id: int, email: str, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def update_user(user_id: int, email: str, current_user: dict = Depends(requires("users:write")), conn = Depends(database.get_db)):
     cur = conn.cursor()
-    role_id = current_user["role_id"]
 
     try:
-        cur.execute("SELECT role_name FROM role WHERE role_id=%s;",(role_id,))
-        role_result = cur.fetchone()
-        role_name = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-        if role_name == "Admin":
-            cur.execute('UPDATE "user" SET email = %s WHERE user_id = %s', (email, user_id,))
-            updated_count = cur.rowcount
-
-            if (updated_count==0):
-                conn.rollback()
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID {user_id} not found")
-            
-            conn.commit()
-
-            cur.execute('SELECT user_name,email,role_id FROM "user" WHERE user_id = %s;',(user_id,))
-            user = cur.fetchone()
-
-            cur.execute("SELECT role_name FROM role WHERE role_id = %s;",(user['role_id'] if isinstance(user, dict) else user[2],))
-            role_result = cur.fetchone()
-            role_name = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
+        cur.execute('UPDATE "user" SET email = %s WHERE user_id = %s', (email, user_id,))
+        updated_count = cur.rowcount
 
-            return {
-                "user_id": user_id,
-                "user_name": user['user_name'] if isinstance(user, dict) else user[0],
-                "email": user['email'] if isinstance(user, dict) else user[1],
-                "role": role_name
-            }
-        else:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail = "You haven't access for the data")
+        if (updated_count==0):
+            conn.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with ID {user_id} not found")
+        
+        conn.commit()
+
+        cur.execute('SELECT user_name,email,role_id FROM "user" WHERE user_id = %s;',(user_id,))
+        user = cur.fetchone()
+        auth.invalidate_principal(user['user_name'] if isinstance(user, dict) else user[0])
+
+        role_name = lookups.role_name(cur, user['role_id'] if isinstance(user, dict) else user[2])
+
+        return {
+            "user_id": user_id,
+            "user_name": user['user_name'] if isinstance(user, dict) else user[0],
+            "email": user['email'] if isinstance(user, dict) else user[1],
+            "role": role_name
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     finally:
         cur.close()
-        conn.close()
 
 @user_router.delete("/users/{user_id}")
-def delete_user(user_id:int, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def delete_user(user_id:int, current_user: dict = Depends(requires("users:write")), conn = Depends(database.get_db)):
     cur = conn.cursor()
-    role_id = current_user["role_id"]
 
     try:
-        cur.execute("SELECT role_name FROM role WHERE role_id=%s;",(role_id,))
-        role_result = cur.fetchone()
-        role = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-        if role == "Admin":
-            cur.execute('DELETE FROM "user" WHERE user_id=%s;',(user_id,))
-            deleted_count = cur.rowcount  # Number of deleted rows
-            if deleted_count == 0:
-                conn.rollback()
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"User with ID {user_id} not found"
-                )
-            
-            conn.commit()
-
-            return Response(status_code=status.HTTP_204_NO_CONTENT)
-        else:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail = "You haven't access for the data")
+        cur.execute('DELETE FROM "user" WHERE user_id=%s RETURNING user_name;',(user_id,))
+        deleted = cur.fetchone()
+        if not deleted:
+            conn.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User with ID {user_id} not found"
+            )
+        
+        conn.commit()
+        auth.invalidate_principal(deleted['user_name'] if isinstance(deleted, dict) else deleted[0])
+
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail = str(e))
     
     finally:
         conn.rollback()
         cur.close()
-        conn.close()
 
 @user_router.get("/roles")
-def get_roles(current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def get_roles(current_user: dict = Depends(requires("roles:read")), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
-        # Check if current user is admin
-        cur.execute("SELECT role_name FROM role WHERE role_id=%s;", (current_user.get("role_id"),))
-        role_result = cur.fetchone()
-
-        if not role_result:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User role not found")
-
-        role = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-
-        if role != "Admin":
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You don't have access to this data")
-
         # Get all roles
-        cur.execute("SELECT role_id, role_name, access_rights FROM role;")
-        rows = cur.fetchall()
-
         roles = []
-        for row in rows:
+        for row in lookups.all_roles(cur):
             role_dict = {
-                "role_id": row['role_id'] if isinstance(row, dict) else row[0],
-                "role_name": row['role_name'] if isinstance(row, dict) else row[1],
-                "accessRights": row['access_rights'] if isinstance(row, dict) else row[2]
+                "role_id": row['role_id'],
+                "role_name": row['role_name'],
+                "accessRights": row['access_rights']
             }
             roles.append(role_dict)
 
@@ -567,37 +563,19 @@ def get_roles(current_user: dict = Depends(get_current_user)):
 
     finally:
         cur.close()
-        conn.close()    
 
 @user_router.post("/roles", response_model=schemas.Role)
-def create_role(new_role: schemas.createRole, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def create_role(new_role: schemas.createRole, current_user: dict = Depends(requires("roles:write")), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
-        # Check if current user is admin
-        cur.execute("SELECT role_name FROM role WHERE role_id=%s;", (current_user.get("role_id"),))
-        role_result = cur.fetchone()
-
-        if not role_result:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User role not found")
-
-        role = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-
-        if role != "Admin":
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You don't have access to create roles")
-
-        # Get next role ID
-        cur.execute("SELECT MAX(role_id) FROM role;")
-        max_id_result = cur.fetchone()
-        max_id = max_id_result['max'] if isinstance(max_id_result, dict) else max_id_result[0]
-        new_role_id = (max_id or 0) + 1
-
         cur.execute(
-            "INSERT INTO role (role_id, role_name, access_rights) VALUES(%s, %s, %s);",
-            (new_role_id, new_role.role_name, new_role.accessRights)
+            "INSERT INTO role (role_name, access_rights) VALUES(%s, %s) RETURNING role_id;",
+            (new_role.role_name, new_role.accessRights)
         )
+        new_role_id = cur.fetchone()['role_id']
         conn.commit()
+        lookups.invalidate()
 
         return {
             "role_id": new_role_id,
@@ -612,127 +590,109 @@ def create_role(new_role: schemas.createRole, current_user: dict = Depends(get_c
 
     finally:
         cur.close()
-        conn.close()
 
 @user_router.put("/roles/{new_role_id}", response_model=schemas.Role)
-def update_role(new_role_id: int,accessRights: str, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def update_role(new_role_id: int,accessRights: str, current_user: dict = Depends(requires("roles:write")), conn = Depends(database.get_db)):
     cur = conn.cursor()
-    role_id = current_user["role_id"]
 
     try:
-        cur.execute("SELECT role_name FROM role WHERE role_id=%s;",(role_id,))
-        role_result = cur.fetchone()
-        role = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-        if role == "Admin":
-            cur.execute("UPDATE role SET access_rights = %s WHERE role_id = %s",(accessRights, new_role_id,))
-            role_count = cur.rowcount
+        cur.execute("UPDATE role SET access_rights = %s WHERE role_id = %s",(accessRights, new_role_id,))
+        role_count = cur.rowcount
 
-            if role_count == 0:
-                conn.rollback()
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail = f"Role id with {new_role_id} not found")
+        if role_count == 0:
+            conn.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail = f"Role id with {new_role_id} not found")
 
-            conn.commit()
+        conn.commit()
+        auth.invalidate_role_principals(new_role_id)
+        lookups.invalidate()
 
-            cur.execute("SELECT role_name FROM role WHERE role_id = %s;",(role_id,))
-            role_name_result = cur.fetchone()
-            role_name = role_name_result['role_name'] if isinstance(role_name_result, dict) else role_name_result[0]
+        role_name = lookups.role_name(cur, new_role_id)
 
-            return {
-                "role_id":new_role_id,
-                "role_name": role_name,
-                "accessRights": accessRights
-            }
-        else:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail = "You haven't access for the data")
+        return {
+            "role_id":new_role_id,
+            "role_name": role_name,
+            "accessRights": accessRights
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail = str(e))
     
     finally:
         cur.close()
-        conn.close()
 
 @user_router.delete("/roles/{delete_role_id}")
-def delete_role(delete_role_id: int, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def delete_role(delete_role_id: int, current_user: dict = Depends(requires("roles:write")), conn = Depends(database.get_db)):
     cur = conn.cursor()
-    role_id = current_user["role_id"]
 
     try:
-        cur.execute("SELECT role_name FROM role WHERE role_id=%s;",(role_id,))
-        role_result = cur.fetchone()
-        role = role_result['role_name'] if isinstance(role_result, dict) else role_result[0]
-        if role == "Admin":
-            cur.execute("DELETE FROM role WHERE role_id = %s",(delete_role_id,))
-            delete_count = cur.rowcount
-
-            if delete_count == 0:
-                conn.rollback()
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail = f"Role with role_id {delete_role_id} not found")
-            
-            conn.commit()
-
-            return Response(status_code=status.HTTP_204_NO_CONTENT)
-        else:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail = "You haven't access for the data")
+        cur.execute("DELETE FROM role WHERE role_id = %s",(delete_role_id,))
+        delete_count = cur.rowcount
+
+        if delete_count == 0:
+            conn.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail = f"Role with role_id {delete_role_id} not found")
+        
+        conn.commit()
+        auth.invalidate_role_principals(delete_role_id)
+        lookups.invalidate()
+
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail = str(e))
     
     finally:
         cur.close()
-        conn.close()
 
 @employee_router.get("/employees")
-def get_employees(current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def get_employees(
+    employee_type_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user),
+    conn = Depends(database.get_db)
+):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT employee_id, employee_type_id, first_name, last_name FROM employee;")
-        rows = cur.fetchall()
-
-        employees = []
-        for row in rows:
-            # Handle both dict and tuple formats
-            employee_type_id = row['employee_type_id'] if isinstance(row, dict) else row[1]
-            cur.execute("SELECT type_name FROM employee_type WHERE employee_type_id = %s",(employee_type_id,))
-            employee_type_result = cur.fetchone()
-            employee_type = employee_type_result['type_name'] if isinstance(employee_type_result, dict) else employee_type_result[0]
-
-            employee: schemas.Employee = {
-                "employee_id": row['employee_id'] if isinstance(row, dict) else row[0],
-                "firstName": row['first_name'] if isinstance(row, dict) else row[2],
-                "lastName": row['last_name'] if isinstance(row, dict) else row[3],
-                "type": employee_type
-            }
-
-            employees.append(employee)
+        keys = [("e.employee_id", "int")]
+        query, params = keyset_query(
+            """SELECT e.employee_id, e.first_name, e.last_name, et.type_name
+               FROM employee e
+               LEFT JOIN employee_type et ON et.employee_type_id = e.employee_type_id""",
+            keys, [("e.employee_type_id = %s", employee_type_id)], cursor, limit, descending=False
+        )
+        cur.execute(query, params)
 
-        return employees
-            
+        return page(cur.fetchall(), keys, limit, lambda row: {
+            "employee_id": row['employee_id'],
+            "firstName": row['first_name'],
+            "lastName": row['last_name'],
+            "type": row['type_name']
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail = str(e))
     
     finally:
         cur.close()
-        conn.close()
 
 @employee_router.post("/employees", response_model=schemas.Employee)
-def create_employees(employee: schemas.CreateEmployee,current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def create_employees(employee: schemas.CreateEmployee,current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT count(employee_id) FROM employee;")
-        count_result = cur.fetchone()
-        employee_id = (count_result['count'] if isinstance(count_result, dict) else count_result[0]) + 1
-
         cur.execute("""
-                    INSERT INTO employee(employee_id, employee_type_id, first_name, last_name, nic, phone, address, date_hired) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s);""",(employee_id, employee.employeeTypeId, employee.firstName, employee.lastName, employee.nic, employee.phone, employee.address, employee.dateHired,))
+                    INSERT INTO employee(employee_type_id, first_name, last_name, nic, phone, address, date_hired) 
+                    VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING employee_id;""",(employee.employeeTypeId, employee.firstName, employee.lastName, employee.nic, employee.phone, employee.address, employee.dateHired,))
+        employee_id = cur.fetchone()['employee_id']
         conn.commit()
         
         cur.execute("SELECT type_name FROM employee_type WHERE employee_type_id = %s;", (employee.employeeTypeId,))
@@ -755,44 +715,48 @@ def create_employees(employee: schemas.CreateEmployee,current_user: dict = Depen
     
     finally:
         cur.close()
-        conn.close()
 
 @employee_router.get("/employee-shedules")
-def get_employee_shedules(current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def get_employee_shedules(
+    employee_id: Optional[int] = None,
+    delivery_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user),
+    conn = Depends(database.get_db)
+):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT schedule_id, employee_id, delivery_id, hours_worked FROM employee_schedule;")
-        rows = cur.fetchall()
+        keys = [("schedule_id", "int")]
+        query, params = keyset_query(
+            "SELECT schedule_id, employee_id, delivery_id, hours_worked FROM employee_schedule",
+            keys, [("employee_id = %s", employee_id), ("delivery_id = %s", delivery_id)], cursor, limit
+        )
+        cur.execute(query, params)
 
-        shedules = []
-        for row in rows:
-            shedule: schemas.EmployeeShedules = {
-                "sheduleId": row['schedule_id'] if isinstance(row, dict) else row[0],
-                "employeeID": row['employee_id'] if isinstance(row, dict) else row[1],
-                "deliveryID": row['delivery_id'] if isinstance(row, dict) else row[2],
-                "hoursWorked": row['hours_worked'] if isinstance(row, dict) else row[3]
-            }
-            shedules.append(shedule)
-        
-        return shedules
+        return page(cur.fetchall(), keys, limit, lambda row: {
+            "sheduleId": row['schedule_id'],
+            "employeeID": row['employee_id'],
+            "deliveryID": row['delivery_id'],
+            "hoursWorked": row['hours_worked']
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail = str(e))
     
     finally:
         cur.close()
-        conn.close()
 
-@employee_router.get("/employee-types")
-def get_employee_types(current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+@employee_router.get("/employee-types", dependencies=[Depends(conditional(EMPLOYEE_TYPE, get_current_user))])
+def get_employee_types(current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT employee_type_id, type_name, hourly_rate, weekly_max_hours, max_consecutive_trips FROM employee_type;")
+        cur.execute("SELECT employee_type_id, type_name, hourly_rate, weekly_max_hours, max_consecutive_trips FROM employee_type ORDER BY employee_type_id;")
         rows = cur.fetchall()
 
         employee_types = []
@@ -814,23 +778,22 @@ def get_employee_types(current_user: dict = Depends(get_current_user)):
     
     finally:
         cur.close()
-        conn.close()
 
 @employee_router.post("/employee-types")
-def create_employee_type(employee_type: dict, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def create_employee_type(employee_type: dict, current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT COUNT(employee_type_id) FROM employee_type;")
-        employee_type_id = cur.fetchone()[0] + 1
-
         cur.execute("""
-            INSERT INTO employee_type(employee_type_id, type_name, hourly_rate, weekly_max_hours, max_consecutive_trips)
-            VALUES (%s, %s, %s, %s, %s);
-        """, (employee_type_id, employee_type["type_name"], employee_type["hourly_rate"], 
+            INSERT INTO employee_type(type_name, hourly_rate, weekly_max_hours, max_consecutive_trips)
+            VALUES (%s, %s, %s, %s) RETURNING employee_type_id;
+        """, (employee_type["type_name"], employee_type["hourly_rate"], 
               employee_type["weekly_max_hours"], employee_type["max_consecutive_trips"]))
+        employee_type_id = cur.fetchone()['employee_type_id']
+        versions = catalog_versions.bump(cur, EMPLOYEE_TYPE)
         conn.commit()
+        catalog_versions.publish(versions)
+        lookups.invalidate()
 
         return {
             "employee_type_id": employee_type_id,
@@ -846,23 +809,38 @@ def create_employee_type(employee_type: dict, current_user: dict = Depends(get_c
     
     finally:
         cur.close()
-        conn.close()
 
 @employee_router.post("/employee-shedules", response_model=schemas.EmployeeShedules)
-def create_employee_shedule(shedule: schemas.CreateEmployeeSchedule,current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def create_employee_shedule(shedule: schemas.CreateEmployeeSchedule,current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT COUNT(schedule_id) FROM employee_schedule")
-        schedule_id = cur.fetchone()[0]+1
+        cur.execute("SELECT delivery_date_time FROM delivery WHERE delivery_id = %s;", (shedule.deliveryId,))
+        delivery = cur.fetchone()
+        if not delivery:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Delivery not found")
+
+        # Drivers and assistants are held to weekly_max_hours / max_consecutive_trips
+        if roster.loaded:
+            if not roster.knows(shedule.employeeId):
+                cur.execute(STAFF_MEMBER_QUERY, (shedule.employeeId,))
+                staff = cur.fetchone()
+                if staff:
+                    roster.track(staff)
+            if roster.knows(shedule.employeeId):
+                reason = roster.violation(shedule.employeeId, delivery['delivery_date_time'], shedule.hoursWorked)
+                if reason:
+                    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=reason)
 
         cur.execute("""
-            INSERT INTO employee_schedule(schedule_id, employee_id, delivery_id, hours_worked, assigned_at)
-            VALUES(%s, %s, %s, %s, %s)
-        """, (schedule_id, shedule.employeeId, shedule.deliveryId, shedule.hoursWorked, datetime.now()))
+            INSERT INTO employee_schedule(employee_id, delivery_id, hours_worked, assigned_at)
+            VALUES(%s, %s, %s, %s) RETURNING schedule_id
+        """, (shedule.employeeId, shedule.deliveryId, shedule.hoursWorked, datetime.now()))
+        schedule_id = cur.fetchone()['schedule_id']
 
         conn.commit()
+        report_cache.invalidate(SCHEDULES)
+        roster.record(shedule.employeeId, delivery['delivery_date_time'], shedule.hoursWorked, shedule.deliveryId)
 
         return{
             "sheduleId": schedule_id,
@@ -871,55 +849,55 @@ def create_employee_shedule(shedule: schemas.CreateEmployeeSchedule,current_user
             "hoursWorked": shedule.hoursWorked
         }
 
+    except HTTPException:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail = str(e))
 
     finally:
         cur.close()
-        conn.close()
 
 @customer_router.get("/customers")
-def get_customers(current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def get_customers(
+    city: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user),
+    conn = Depends(database.get_db)
+):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT customer_id, name, city FROM customer;")
-        rows = cur.fetchall()
+        keys = [("customer_id", "int")]
+        query, params = keyset_query(
+            "SELECT customer_id, name, city FROM customer",
+            keys, [("city = %s", city)], cursor, limit, descending=False
+        )
+        cur.execute(query, params)
 
-        cutomers = []
-        for row in rows:
-            cutomer: schemas.Cutomer = {
-                "customer_id": row[0],
-                "name": row[1],
-                "city": row[2]
-            }
-            cutomers.append(cutomer)
-        
-        return cutomers
+        return page(cur.fetchall(), keys, limit)
 
+    except HTTPException:
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     finally:
         cur.close()
-        conn.close()
 
 @customer_router.post("/customers", response_model= schemas.CutomerResponse)
-def create_customer(customer: schemas.CreateCustomer, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def create_customer(customer: schemas.CreateCustomer, current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT count(customer_id) FROM customer;")
-        custome_id = cur.fetchone()[0]+1
-
         cur.execute("""
-            INSERT INTO customer (customer_id, name, type, address, city, contact_number)
-            VALUES(%s, %s, %s, %s, %s, %s)
-        """,(custome_id,customer.name,customer.type, customer.address, customer.city, customer. contactNumber))
+            INSERT INTO customer (name, type, address, city, contact_number)
+            VALUES(%s, %s, %s, %s, %s) RETURNING customer_id
+        """,(customer.name,customer.type, customer.address, customer.city, customer. contactNumber))
+        custome_id = cur.fetchone()['customer_id']
         conn.commit()
 
         return{
@@ -935,11 +913,9 @@ def create_customer(customer: schemas.CreateCustomer, current_user: dict = Depen
 
     finally:
         cur.close()
-        conn.close()
 
 @customer_router.get("/customers/{customer_id}/orders")
-def get_cutomer_orders(customer_id:int,current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def get_cutomer_orders(customer_id:int,current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
@@ -965,11 +941,42 @@ def get_cutomer_orders(customer_id:int,current_user: dict = Depends(get_current_
 
     finally:
         cur.close()
-        conn.close()
+
+# Order creation is three statements regardless of the number of lines: reserve stock,
+# insert the order, insert its items. Lines are passed as parallel arrays.
+_RESERVE_STOCK = """
+    UPDATE product p
+    SET available_units = p.available_units - l.quantity
+    FROM unnest(%s::int[], %s::int[]) AS l(product_id, quantity)
+    WHERE p.product_id = l.product_id AND p.available_units >= l.quantity
+    RETURNING p.product_id;
+"""
+
+_INSERT_ORDER_ITEMS = """
+    INSERT INTO order_item (order_id, product_id, quantity)
+    SELECT %s, l.product_id, l.quantity
+    FROM unnest(%s::int[], %s::int[]) AS l(product_id, quantity);
+"""
+
+def _order_lines(items):
+    """Collapse order items into (product_ids, quantities), summing repeated products."""
+    totals = {}
+    for item in items:
+        totals[item.productID] = totals.get(item.productID, 0) + item.quantity
+    return list(totals), list(totals.values())
+
+def _check_reserved(product_ids, reserved_rows):
+    """Raise 409 unless every product line was decremented by _RESERVE_STOCK."""
+    reserved = {row['product_id'] for row in reserved_rows}
+    short = [product_id for product_id in product_ids if product_id not in reserved]
+    if short:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Insufficient stock or unknown product for product IDs: {short}"
+        )
 
 @customer_router.post("/customers/{customer_id}/orders", tags = ["Customers"], response_model=schemas.Order)
-def create_customer_order(customer_id: int, order: schemas.CreateOrder, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def create_customer_order(customer_id: int, order: schemas.CreateOrder, current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
@@ -979,37 +986,31 @@ def create_customer_order(customer_id: int, order: schemas.CreateOrder, current_
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Customer with ID {customer_id} not found")
 
 
-        cur.execute('SELECT COUNT(order_id) FROM "order"')
-        count_result = cur.fetchone()
-        order_id = (count_result['count'] if isinstance(count_result, dict) else count_result[0]) + 1
         order_date = date.today()
 
         schedule_date = order.scheduleDate
-        items = order.items
+        product_ids, quantities = _order_lines(order.items)
 
-        cur.execute('INSERT INTO "order"(order_id, customer_id, order_date, schedule_date, user_id) VALUES(%s, %s, %s, %s, %s)',(order_id, customer_id, order_date, schedule_date, current_user["user_id"]))
-        conn.commit()
+        # Guarded decrement: rows without enough stock are simply not updated
+        cur.execute(_RESERVE_STOCK, (product_ids, quantities))
+        _check_reserved(product_ids, cur.fetchall())
 
-        for item in items:
-            cur.execute("""
-                INSERT INTO order_item (order_id, product_id, quantity)
-                VALUES(%s, %s, %s);
-            """,(order_id, item.productID, item.quantity))
+        cur.execute('INSERT INTO "order"(customer_id, order_date, schedule_date, user_id) VALUES(%s, %s, %s, %s) RETURNING order_id, status',(customer_id, order_date, schedule_date, current_user["user_id"]))
+        order_fetch = cur.fetchone()
+        order_id = order_fetch['order_id']
 
-            cur.execute("SELECT available_units FROM product WHERE product_id = %s",(item.productID,))
-            units_result = cur.fetchone()
-            available_units = (units_result['available_units'] if isinstance(units_result, dict) else units_result[0]) - item.quantity
+        cur.execute(_INSERT_ORDER_ITEMS, (order_id, product_ids, quantities))
 
-            cur.execute("UPDATE product SET available_units = %s WHERE product_id = %s", (available_units, item.productID,))
+        versions = catalog_versions.bump(cur, INVENTORY)
 
+        # One commit for stock, order and items together
         conn.commit()
-
-        cur.execute('SELECT order_id, status FROM "order" WHERE order_id = %s',(order_id,))
-        order_fetch = cur.fetchone()
+        catalog_versions.publish(versions)
+        report_cache.invalidate(ORDERS, PRODUCTS)
 
         return{
-            "order_id": order_fetch['order_id'] if isinstance(order_fetch, dict) else order_fetch[0],
-            "status": order_fetch['status'] if isinstance(order_fetch, dict) else order_fetch[1]
+            "order_id": order_id,
+            "status": order_fetch['status']
         }
 
     except HTTPException:
@@ -1020,15 +1021,13 @@ def create_customer_order(customer_id: int, order: schemas.CreateOrder, current_
 
     finally:
         cur.close()
-        conn.close()
 
-@products_router.get("/products")
-def get_products(current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+@products_router.get("/products", dependencies=[Depends(conditional(PRODUCT, get_current_user))])
+def get_products(current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT product_id, product_name, unit_price FROM product;")
+        cur.execute("SELECT product_id, product_name, unit_price FROM product ORDER BY product_id;")
         rows = cur.fetchall()
 
         products=[]
@@ -1052,21 +1051,21 @@ def get_products(current_user: dict = Depends(get_current_user)):
 
     finally:
         cur.close()
-        conn.close()
 
 @products_router.post("/products", response_model=schemas.Product)
-def create_product(product: schemas.CreateProduct, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+def create_product(product: schemas.CreateProduct, current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT count(product_id) FROM product;")
-        product_id  = cur.fetchone()[0]+1
         cur.execute("""
-            INSERT INTO product (product_id, product_name, category, unit_price, unit_weight, train_space_per_unit, available_units)
-            VALUES(%s, %s, %s, %s, %s, %s, %s);
-        """,(product_id, product.productName, product.category, product.unitPrice, product.unitWeight, product.train_space_per_unit, product.available_units,))
+            INSERT INTO product (product_name, category, unit_price, unit_weight, train_space_per_unit, available_units)
+            VALUES(%s, %s, %s, %s, %s, %s) RETURNING product_id;
+        """,(product.productName, product.category, product.unitPrice, product.unitWeight, product.train_space_per_unit, product.available_units,))
+        product_id = cur.fetchone()['product_id']
+        versions = catalog_versions.bump(cur, PRODUCT, INVENTORY)
         conn.commit()
+        catalog_versions.publish(versions)
+        report_cache.invalidate(PRODUCTS)
 
         return{
             "product_id": product_id,
@@ -1080,15 +1079,13 @@ def create_product(product: schemas.CreateProduct, current_user: dict = Depends(
     
     finally:
         cur.close()
-        conn.close()
 
-@products_router.get("/inventory")
-def get_inventory(current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+@products_router.get("/inventory", dependencies=[Depends(conditional(INVENTORY, get_current_user))])
+def get_inventory(current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     cur = conn.cursor()
 
     try:
-        cur.execute("SELECT product_id, available_units FROM product;")
+        cur.execute("SELECT product_id, available_units FROM product ORDER BY product_id;")
         rows = cur.fetchall()
 
         inventories = []
@@ -1108,85 +1105,131 @@ def get_inventory(current_user: dict = Depends(get_current_user)):
     
     finally:
         cur.close()
-        conn.close()
 
 @orders_router.get("/orders")
-def get_orders(current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+async def get_orders(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    customer_id: Optional[int] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user_async),
+    conn = Depends(async_database.get_async_db)
+):
+    """Orders newest first; from_date/to_date bound the order_date."""
     cur = conn.cursor()
 
     try:
-        cur.execute('SELECT order_id, status FROM "order";')
-        rows = cur.fetchall()
-
-        orders = []
-        for row in rows:
-            order: schemas.Order = {
-                "order_id": row['order_id'] if isinstance(row, dict) else row[0],
-                "status": row['status'] if isinstance(row, dict) else row[1]
-            }
-            orders.append(order)
+        keys = [("order_id", "int")]
+        query, params = keyset_query(
+            'SELECT order_id, status FROM "order"',
+            keys,
+            [
+                ("status = %s", status_filter),
+                ("customer_id = %s", customer_id),
+                ("order_date >= %s", from_date),
+                ("order_date <= %s", to_date),
+            ],
+            cursor, limit
+        )
+        await cur.execute(query, params)
 
-        return orders
+        return page(await cur.fetchall(), keys, limit)
 
+    except HTTPException:
+        raise
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail = str(e))
 
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
 
 @orders_router.post("/orders", response_model= schemas.Order)
-def create_order(order: schemas.CreateOrderWithId, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+async def create_order(order: schemas.CreateOrderWithId, current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     cur = conn.cursor()
 
     try:
-        cur.execute('SELECT COUNT(order_id) FROM "order"')
-        order_id = cur.fetchone()[0]+1
         order_date = date.today()
         
         schedule_date = order.scheduleDate
-        items = order.items
+        product_ids, quantities = _order_lines(order.items)
 
-        cur.execute('INSERT INTO "order"(order_id, customer_id, order_date, schedule_date, user_id) VALUES(%s, %s, %s, %s, %s)',(order_id, order.customer_id, order_date, schedule_date, current_user["user_id"]))
-        conn.commit()
+        # Guarded decrement: rows without enough stock are simply not updated
+        await cur.execute(_RESERVE_STOCK, (product_ids, quantities))
+        _check_reserved(product_ids, await cur.fetchall())
 
-        for item in items:
-            cur.execute("""
-                INSERT INTO order_item (order_id, product_id, quantity)
-                VALUES(%s, %s, %s);
-            """,(order_id, item.productID, item.quantity))
+        await cur.execute('INSERT INTO "order"(customer_id, order_date, schedule_date, user_id) VALUES(%s, %s, %s, %s) RETURNING order_id, status',(order.customer_id, order_date, schedule_date, current_user["user_id"]))
+        order_fetch = await cur.fetchone()
+        order_id = order_fetch['order_id']
 
-            cur.execute("SELECT available_units FROM product WHERE product_id = %s",(item.productID,))
-            available_units = cur.fetchone()[0] - item.quantity
+        await cur.execute(_INSERT_ORDER_ITEMS, (order_id, product_ids, quantities))
 
-            cur.execute("UPDATE product SET available_units = %s WHERE product_id = %s", (available_units, item.productID,))
-            conn.commit()
+        versions = await catalog_versions.bump_async(cur, INVENTORY)
 
-        cur.execute('SELECT order_id, status FROM "order" WHERE order_id = %s',(order_id,))
-        order_fetch = cur.fetchone()
+        # One commit for stock, order and items together
+        await conn.commit()
+        catalog_versions.publish(versions)
+        report_cache.invalidate(ORDERS, PRODUCTS)
 
         return{
-            "order_id": order_fetch[0],
-            "status": order_fetch[1]
+            "order_id": order_id,
+            "status": order_fetch['status']
         }
+    except HTTPException:
+        await conn.rollback()
+        raise
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code= status.HTTP_500_INTERNAL_SERVER_ERROR, detail = str(e))
     
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
+
+@orders_router.post("/orders/bulk")
+async def create_orders_bulk(request: Request, current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
+    """
+    Bulk order import from an NDJSON (application/x-ndjson) or CSV (text/csv) body.
+
+    The body is streamed into a COPY staging table and validated set-wise; valid orders
+    are created and stock decremented in one transaction. Returns a result per order.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    parser = bulk_orders.PARSERS.get(content_type)
+    if parser is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported content type; use one of: {', '.join(bulk_orders.PARSERS)}"
+        )
+
+    try:
+        result = await bulk_orders.ingest_orders(conn, parser(request.stream()), current_user["user_id"])
+        versions = []
+        if result["created"]:
+            cur = conn.cursor()
+            try:
+                versions = await catalog_versions.bump_async(cur, INVENTORY)
+            finally:
+                await cur.close()
+        await conn.commit()
+        catalog_versions.publish(versions)
+        report_cache.invalidate(ORDERS, PRODUCTS)
+        return result
+
+    except HTTPException:
+        await conn.rollback()
+        raise
+    except Exception as e:
+        await conn.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @orders_router.get("/orders/by-user/{user_id}")
-def get_orders_by_user(user_id: int, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+async def get_orders_by_user(user_id: int, current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     cur = conn.cursor()
     try:
-        cur.execute('SELECT order_id, status FROM "order" WHERE user_id = %s ORDER BY order_date DESC;', (user_id,))
-        rows = cur.fetchall()
+        await cur.execute('SELECT order_id, status FROM "order" WHERE user_id = %s ORDER BY order_date DESC;', (user_id,))
+        rows = await cur.fetchall()
         orders = [
             {
                 "order_id": row['order_id'] if isinstance(row, dict) else row[0],
@@ -1196,35 +1239,38 @@ def get_orders_by_user(user_id: int, current_user: dict = Depends(get_current_us
         ]
         return orders
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
 
 @orders_router.post("/orders/{order_id}/allocate-train", tags=["Orders"], response_model=schemas.AllocateTrainResponse)
-def allocate_train(order_id: int, current_user: dict = Depends(get_current_user)):
-    conn = database.get_db_connection()
+async def allocate_train(order_id: int, current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     cur = conn.cursor()
 
     try:
-        cur.execute('SELECT order_id FROM "order" WHERE order_id = %s;', (order_id,))
+        await cur.execute('SELECT order_id FROM "order" WHERE order_id = %s;', (order_id,))
         if cur.rowcount == 0:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Order with ID {order_id} not found")
         
-        cur.execute("CALL allocate_order_to_train(%s);", (order_id,))
-        conn.commit()
+        await cur.execute("CALL allocate_order_to_train(%s);", (order_id,))
+        await conn.commit()
+        report_cache.invalidate(ORDERS, SCHEDULES)
 
-        cur.execute("""
-            SELECT ts.train_trip_id
+        await cur.execute("""
+            SELECT ts.train_trip_id, ts.train_departure_date_time, tt.available_capacity
             FROM train_schedule ts
+            JOIN train_trip tt ON ts.train_trip_id = tt.train_trip_id
+                AND ts.train_departure_date_time = tt.departure_date_time
             WHERE ts.order_id = %s
             LIMIT 1;
         """, (order_id,))
-        result = cur.fetchone()
+        result = await cur.fetchone()
 
         if result:
-            train_trip_id = result[0]
+            train_trip_id = result['train_trip_id'] if isinstance(result, dict) else result[0]
+            trip_capacity.set_capacity(train_trip_id, result['train_departure_date_time'], result['available_capacity'])
+            hub.publish(topic("order", order_id), "order_allocated", {"order_id": order_id, "train_trip_id": train_trip_id})
             return {
                 "success": True,
                 "message": f"Order allocated to train {train_trip_id}"
@@ -1236,168 +1282,163 @@ def allocate_train(order_id: int, current_user: dict = Depends(get_current_user)
             }
 
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
+
+@orders_router.post("/orders/allocate-trains", tags=["Orders"])
+async def allocate_trains_batch(from_date: Optional[date] = None, to_date: Optional[date] = None, dry_run: bool = False, current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
+    """
+    Allocate all Pending orders due in [from_date, to_date] (default: the next
+    ALLOCATION_WINDOW_DAYS days) to upcoming train trips in a single transaction.
+    """
+    try:
+        result = await allocation.allocate_batch(conn, from_date, to_date, dry_run)
+        await conn.commit()
+
+        if not dry_run:
+            report_cache.invalidate(ORDERS, SCHEDULES)
+            for assignment in result["assignments"]:
+                trip_capacity.consume(assignment["train_trip_id"], assignment["departure_date_time"], assignment["allocated_space"])
+                hub.publish(topic("order", assignment["order_id"]), "order_allocated", {
+                    "order_id": assignment["order_id"],
+                    "train_trip_id": assignment["train_trip_id"]
+                })
+        return result
+
+    except Exception as e:
+        await conn.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 # Dashboard and Analytics endpoints
 dashboard_router = APIRouter(
     tags=["Dashboard & Analytics"]
 )
 
+# One round trip for every admin dashboard tile; order counts are summed over the
+# dashboard_order_daily rollup's slots (migrations/004 and 009)
+_ADMIN_STATS = """
+    SELECT o.total_orders, o.pending_orders, o.delivered_orders,
+           (SELECT COUNT(*) FROM "user"
+            WHERE last_login IS NOT NULL AND last_login > NOW() - INTERVAL '30 days') AS active_users,
+           (SELECT COALESCE(AVG(CASE WHEN total_capacity > 0
+                                     THEN ((total_capacity - available_capacity)::float / total_capacity) * 100
+                                     ELSE 0 END), 0)
+            FROM train_trip
+            WHERE departure_date_time > NOW() - INTERVAL '30 days') AS train_utilization,
+           (SELECT COALESCE(AVG(CASE WHEN status = 'In Service' THEN 100 ELSE 0 END), 0) FROM truck) AS truck_utilization,
+           (SELECT COUNT(*) FROM employee) AS staff_active
+    FROM (
+        SELECT COALESCE(SUM(order_count), 0) AS total_orders,
+               COALESCE(SUM(order_count) FILTER (WHERE status = 'Pending'), 0) AS pending_orders,
+               COALESCE(SUM(order_count) FILTER (WHERE status = 'Delivered'), 0) AS delivered_orders
+        FROM dashboard_order_daily
+    ) o;
+"""
+
 @dashboard_router.get("/dashboard/admin-stats")
-def get_admin_dashboard_stats(current_user: dict = Depends(get_current_user)):
+async def get_admin_dashboard_stats(current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     """Get statistics for admin dashboard"""
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
-        # Total orders count
-        cur.execute('SELECT COUNT(*) as count FROM "order";')
-        result = cur.fetchone()
-        total_orders = (result['count'] if isinstance(result, dict) else result[0]) or 0
-
-        # Pending orders count
-        cur.execute('SELECT COUNT(*) as count FROM "order" WHERE status = %s;', ('Pending',))
-        result = cur.fetchone()
-        pending_orders = (result['count'] if isinstance(result, dict) else result[0]) or 0
-
-        # Delivered orders count
-        cur.execute('SELECT COUNT(*) as count FROM "order" WHERE status = %s;', ('Delivered',))
-        result = cur.fetchone()
-        delivered_orders = (result['count'] if isinstance(result, dict) else result[0]) or 0
-
-        # Active users count
-        cur.execute('SELECT COUNT(*) as count FROM "user" WHERE last_login IS NOT NULL AND last_login > NOW() - INTERVAL \'30 days\';')
-        result = cur.fetchone()
-        active_users = (result['count'] if isinstance(result, dict) else result[0]) or 0
-
-        # Train utilization - simplified calculation
-        try:
-            cur.execute("""
-                SELECT
-                    COALESCE(AVG(CASE WHEN total_capacity > 0 THEN ((total_capacity - available_capacity)::float / total_capacity) * 100 ELSE 0 END), 0) as utilization
-                FROM train_trip
-                WHERE departure_date_time > NOW() - INTERVAL '30 days';
-            """)
-            result = cur.fetchone()
-            if result:
-                train_utilization = (result['utilization'] if isinstance(result, dict) else result[0]) or 0
-            else:
-                train_utilization = 0
-        except Exception:
-            train_utilization = 0
-
-        # Truck utilization
-        try:
-            cur.execute("""
-                SELECT
-                    COALESCE(AVG(CASE WHEN status = 'In Service' THEN 100 ELSE 0 END), 0) as utilization
-                FROM truck;
-            """)
-            result = cur.fetchone()
-            if result:
-                truck_utilization = (result['utilization'] if isinstance(result, dict) else result[0]) or 0
-            else:
-                truck_utilization = 0
-        except Exception:
-            truck_utilization = 0
-
-        # Staff active count - just count all employees
-        try:
-            cur.execute("""
-                SELECT COUNT(*) as count FROM employee;
-            """)
-            result = cur.fetchone()
-            staff_active = (result['count'] if isinstance(result, dict) else result[0]) or 0
-        except Exception:
-            staff_active = 0
+        await cur.execute(_ADMIN_STATS)
+        stats = await cur.fetchone()
 
         return {
-            "total_orders": int(total_orders),
-            "pending_orders": int(pending_orders),
-            "delivered_orders": int(delivered_orders),
-            "active_users": int(active_users),
-            "train_utilization": float(round(float(train_utilization), 1)),
-            "truck_utilization": float(round(float(truck_utilization), 1)),
-            "staff_active": int(staff_active)
+            "total_orders": int(stats['total_orders'] or 0),
+            "pending_orders": int(stats['pending_orders'] or 0),
+            "delivered_orders": int(stats['delivered_orders'] or 0),
+            "active_users": int(stats['active_users'] or 0),
+            "train_utilization": float(round(float(stats['train_utilization'] or 0), 1)),
+            "truck_utilization": float(round(float(stats['truck_utilization'] or 0), 1)),
+            "staff_active": int(stats['staff_active'] or 0)
         }
 
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         import traceback
         print(f"Dashboard stats error: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Dashboard error: {str(e)}")
 
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
 
 @dashboard_router.get("/dashboard/manager-stats")
-def get_manager_dashboard_stats(current_user: dict = Depends(get_current_user)):
+async def get_manager_dashboard_stats(current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     """Get statistics for manager dashboard"""
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
         # Active train trips
-        cur.execute("""
+        await cur.execute("""
             SELECT COUNT(*) as count FROM train_trip
             WHERE departure_date_time > NOW() AND arrival_date_time > NOW();
         """)
-        result = cur.fetchone()
+        result = await cur.fetchone()
         active_train_trips = (result['count'] if isinstance(result, dict) else result[0]) or 0
 
         # Active truck routes
-        cur.execute("""
+        await cur.execute("""
             SELECT COUNT(*) as count FROM delivery
             WHERE delivery_date_time > NOW() AND status != 'Delivered';
         """)
-        result = cur.fetchone()
+        result = await cur.fetchone()
         active_truck_routes = (result['count'] if isinstance(result, dict) else result[0]) or 0
 
-        # Pending orders
-        cur.execute('SELECT COUNT(*) as count FROM "order" WHERE status = %s;', ('Pending',))
-        result = cur.fetchone()
-        pending_orders = (result['count'] if isinstance(result, dict) else result[0]) or 0
-
-        # On-time delivery rate - based on delivered orders
-        cur.execute("""
+        # Pending orders and on-time delivery rate (based on delivered orders) from the rollup
+        await cur.execute("""
             SELECT
-                COALESCE(
-                    COUNT(CASE WHEN status = 'Delivered' THEN 1 END) * 100.0 /
-                    NULLIF(COUNT(*), 0),
-                    0
-                ) as on_time_rate
-            FROM "order"
-            WHERE status = 'Delivered';
+                COALESCE(SUM(order_count) FILTER (WHERE status = 'Pending'), 0) as pending_orders,
+                CASE WHEN SUM(order_count) FILTER (WHERE status = 'Delivered') > 0 THEN 100.0 ELSE 0 END as on_time_rate
+            FROM dashboard_order_daily
+            WHERE status IN ('Pending', 'Delivered');
         """)
-        result = cur.fetchone()
-        on_time_rate = (result['on_time_rate'] if isinstance(result, dict) else result[0]) or 0
-
-        # Upcoming trips with details
-        cur.execute("""
-            SELECT
-                tt.train_trip_id,
-                CONCAT(tt.departure_city, ' → ', tt.arrival_city) as route,
-                tt.departure_date_time::date as date,
-                COALESCE(ROUND((tt.total_capacity - tt.available_capacity) * 100.0 / tt.total_capacity, 1), 0) as capacity_percent,
-                COUNT(ts.order_id) as orders_count
-            FROM train_trip tt
-            LEFT JOIN train_schedule ts ON tt.train_trip_id = ts.train_trip_id
-            WHERE tt.departure_date_time > NOW()
-            GROUP BY tt.train_trip_id, tt.departure_city, tt.arrival_city, tt.departure_date_time, tt.total_capacity, tt.available_capacity
-            ORDER BY tt.departure_date_time
-            LIMIT 5;
-        """)
-        upcoming_trips = cur.fetchall()
+        result = await cur.fetchone()
+        pending_orders = int(result['pending_orders'] or 0)
+        on_time_rate = result['on_time_rate'] or 0
+
+        # Upcoming trips with details; served from the capacity index once it is loaded
+        if trip_capacity.loaded:
+            trips = trip_capacity.upcoming(limit=5)
+            await cur.execute("""
+                SELECT train_trip_id, orders_count
+                FROM dashboard_trip_orders
+                WHERE train_trip_id = ANY(%s);
+            """, ([trip["train_trip_id"] for trip in trips],))
+            orders_count = {}
+            for row in await cur.fetchall():
+                orders_count[row['train_trip_id']] = orders_count.get(row['train_trip_id'], 0) + row['orders_count']
+            upcoming_trips = [
+                {
+                    "train_trip_id": trip["train_trip_id"],
+                    "route": f"{trip['departure_city']} → {trip['arrival_city']}",
+                    "date": trip["departure_date_time"].date(),
+                    "capacity_percent": round((trip["total_capacity"] - trip["available_capacity"]) * 100.0 / trip["total_capacity"], 1) if trip["total_capacity"] else 0,
+                    "orders_count": orders_count.get(trip["train_trip_id"], 0)
+                } for trip in trips
+            ]
+        else:
+            await cur.execute("""
+                SELECT
+                    tt.train_trip_id,
+                    CONCAT(tt.departure_city, ' → ', tt.arrival_city) as route,
+                    tt.departure_date_time::date as date,
+                    COALESCE(ROUND((tt.total_capacity - tt.available_capacity) * 100.0 / tt.total_capacity, 1), 0) as capacity_percent,
+                    COALESCE((SELECT SUM(dto.orders_count) FROM dashboard_trip_orders dto
+                              WHERE dto.train_trip_id = tt.train_trip_id), 0) as orders_count
+                FROM train_trip tt
+                WHERE tt.departure_date_time > NOW()
+                ORDER BY tt.departure_date_time
+                LIMIT 5;
+            """)
+            upcoming_trips = await cur.fetchall()
 
         # Pending orders with details
-        cur.execute("""
+        await cur.execute("""
             SELECT
                 o.order_id,
                 c.name as customer_name,
@@ -1416,7 +1457,7 @@ def get_manager_dashboard_stats(current_user: dict = Depends(get_current_user)):
             ORDER BY o.schedule_date
             LIMIT 5;
         """)
-        pending_orders_details = cur.fetchall()
+        pending_orders_details = await cur.fetchall()
 
         return {
             "active_train_trips": active_train_trips,
@@ -1444,27 +1485,25 @@ def get_manager_dashboard_stats(current_user: dict = Depends(get_current_user)):
         }
 
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
 
 @dashboard_router.get("/dashboard/customer-stats")
-def get_customer_dashboard_stats(current_user: dict = Depends(get_current_user)):
+async def get_customer_dashboard_stats(current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     """Get statistics for customer dashboard"""
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
         # Get customer ID from user
-        cur.execute("""
+        await cur.execute("""
             SELECT c.customer_id FROM customer c
             JOIN "user" u ON c.user_id = u.user_id
             WHERE u.user_id = %s;
         """, (current_user["user_id"],))
-        customer_result = cur.fetchone()
+        customer_result = await cur.fetchone()
 
         if not customer_result:
             # Return empty dashboard instead of 404 for non-customers
@@ -1477,13 +1516,13 @@ def get_customer_dashboard_stats(current_user: dict = Depends(get_current_user))
         customer_id = customer_result['customer_id'] if isinstance(customer_result, dict) else customer_result[0]
 
         # Get customer orders
-        cur.execute("""
+        await cur.execute("""
             SELECT order_id, status, order_date, schedule_date
             FROM "order"
             WHERE customer_id = %s
             ORDER BY order_date DESC;
         """, (customer_id,))
-        orders = cur.fetchall()
+        orders = await cur.fetchall()
 
         active_orders = len([o for o in orders if (o['status'] if isinstance(o, dict) else o[1]) != 'Delivered'])
 
@@ -1503,36 +1542,32 @@ def get_customer_dashboard_stats(current_user: dict = Depends(get_current_user))
     except HTTPException:
         raise
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
 
 @dashboard_router.get("/dashboard/admin-chart-data")
-def get_admin_chart_data(current_user: dict = Depends(get_current_user)):
+async def get_admin_chart_data(current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     """Get data for admin dashboard charts (revenue and visitor data)"""
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
-        # Get revenue by customer type for the bar chart
-        cur.execute("""
+        # Get revenue by customer type for the bar chart (all three queries read the
+        # dashboard_order_daily rollup rather than order lines)
+        await cur.execute("""
             SELECT
-                TO_CHAR(o.order_date, 'YYYY-MM') as month,
-                c.type as customer_type,
-                COALESCE(SUM(oi.quantity * p.unit_price), 0) as revenue
-            FROM "order" o
-            JOIN customer c ON o.customer_id = c.customer_id
-            LEFT JOIN order_item oi ON o.order_id = oi.order_id
-            LEFT JOIN product p ON oi.product_id = p.product_id
-            WHERE o.order_date >= NOW() - INTERVAL '12 months'
+                TO_CHAR(order_date, 'YYYY-MM') as month,
+                NULLIF(customer_type, '') as customer_type,
+                COALESCE(SUM(revenue), 0) as revenue
+            FROM dashboard_order_daily
+            WHERE order_date >= NOW() - INTERVAL '12 months'
             GROUP BY month, customer_type
             ORDER BY month DESC
             LIMIT 12
         """)
-        revenue_data = cur.fetchall()
+        revenue_data = await cur.fetchall()
 
         # Process revenue data into monthly breakdown
         monthly_revenue = {}
@@ -1553,30 +1588,25 @@ def get_admin_chart_data(current_user: dict = Depends(get_current_user)):
                 monthly_revenue[month]['new_customers'] += revenue
 
         # Get total revenue
-        cur.execute("""
-            SELECT COALESCE(SUM(oi.quantity * p.unit_price), 0) as total
-            FROM "order" o
-            LEFT JOIN order_item oi ON o.order_id = oi.order_id
-            LEFT JOIN product p ON oi.product_id = p.product_id
-            WHERE o.order_date >= NOW() - INTERVAL '30 days'
+        await cur.execute("""
+            SELECT COALESCE(SUM(revenue), 0) as total
+            FROM dashboard_order_daily
+            WHERE order_date >= NOW() - INTERVAL '30 days'
         """)
-        total_revenue_result = cur.fetchone()
+        total_revenue_result = await cur.fetchone()
         total_revenue = float(total_revenue_result[0] if isinstance(total_revenue_result, tuple) else total_revenue_result['total']) if total_revenue_result else 0
 
         # Get revenue by customer type for analysis
-        cur.execute("""
+        await cur.execute("""
             SELECT
-                c.type as customer_type,
-                COALESCE(SUM(oi.quantity * p.unit_price), 0) as revenue,
-                COUNT(DISTINCT o.order_id) as order_count
-            FROM "order" o
-            JOIN customer c ON o.customer_id = c.customer_id
-            LEFT JOIN order_item oi ON o.order_id = oi.order_id
-            LEFT JOIN product p ON oi.product_id = p.product_id
-            WHERE o.order_date >= NOW() - INTERVAL '30 days'
-            GROUP BY c.type
+                NULLIF(customer_type, '') as customer_type,
+                COALESCE(SUM(revenue), 0) as revenue,
+                COALESCE(SUM(order_count), 0) as order_count
+            FROM dashboard_order_daily
+            WHERE order_date >= NOW() - INTERVAL '30 days'
+            GROUP BY customer_type
         """)
-        revenue_results = cur.fetchall()
+        revenue_results = await cur.fetchall()
 
         revenue_by_type = {}
         total_revenue_30days = 0
@@ -1615,27 +1645,25 @@ def get_admin_chart_data(current_user: dict = Depends(get_current_user)):
         }
 
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         import traceback
         print(f"Chart data error: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
 
 @dashboard_router.get("/dashboard/admin-alerts")
-def get_admin_alerts(current_user: dict = Depends(get_current_user)):
+async def get_admin_alerts(current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     """Get recent alerts for admin dashboard from delivery performance and system events"""
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
         alerts = []
 
         # Get cancelled deliveries as alerts
-        cur.execute("""
+        await cur.execute("""
             SELECT
                 'error' as alert_type,
                 'Cancelled delivery in Route #' || r.route_id as message,
@@ -1646,24 +1674,33 @@ def get_admin_alerts(current_user: dict = Depends(get_current_user)):
             ORDER BY d.delivery_date_time DESC
             LIMIT 3
         """)
-        failed_deliveries = cur.fetchall()
+        failed_deliveries = await cur.fetchall()
 
-        # Get capacity warnings
-        cur.execute("""
-            SELECT
-                'warning' as alert_type,
-                'Train capacity near limit for Trip #' || tt.train_trip_id as message,
-                tt.departure_date_time as timestamp
-            FROM train_trip tt
-            WHERE (tt.available_capacity / tt.total_capacity) < 0.2
-              AND tt.departure_date_time > NOW()
-            ORDER BY tt.departure_date_time DESC
-            LIMIT 3
-        """)
-        capacity_warnings = cur.fetchall()
+        # Get capacity warnings; served from the capacity index once it is loaded
+        if trip_capacity.loaded:
+            capacity_warnings = [
+                {
+                    "alert_type": "warning",
+                    "message": f"Train capacity near limit for Trip #{trip['train_trip_id']}",
+                    "timestamp": trip["departure_date_time"]
+                } for trip in trip_capacity.near_full(limit=3)
+            ]
+        else:
+            await cur.execute("""
+                SELECT
+                    'warning' as alert_type,
+                    'Train capacity near limit for Trip #' || tt.train_trip_id as message,
+                    tt.departure_date_time as timestamp
+                FROM train_trip tt
+                WHERE (tt.available_capacity / tt.total_capacity) < 0.2
+                  AND tt.departure_date_time > NOW()
+                ORDER BY tt.departure_date_time DESC
+                LIMIT 3
+            """)
+            capacity_warnings = await cur.fetchall()
 
         # Get pending order warnings (orders past deadline)
-        cur.execute("""
+        await cur.execute("""
             SELECT
                 'warning' as alert_type,
                 'Order #' || o.order_id || ' deadline approaching - ' || c.name as message,
@@ -1676,7 +1713,7 @@ def get_admin_alerts(current_user: dict = Depends(get_current_user)):
             ORDER BY o.schedule_date ASC
             LIMIT 2
         """)
-        deadline_alerts = cur.fetchall()
+        deadline_alerts = await cur.fetchall()
 
         # Combine all alerts
         all_alerts = failed_deliveries + capacity_warnings + deadline_alerts
@@ -1716,7 +1753,7 @@ def get_admin_alerts(current_user: dict = Depends(get_current_user)):
         ]
 
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         import traceback
         print(f"Alerts error: {str(e)}")
         print(traceback.format_exc())
@@ -1726,18 +1763,16 @@ def get_admin_alerts(current_user: dict = Depends(get_current_user)):
         ]
 
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
 
 # Order management endpoints
 @orders_router.get("/orders/{order_id}")
-def get_order_details(order_id: int, current_user: dict = Depends(get_current_user)):
+async def get_order_details(order_id: int, current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     """Get detailed order information"""
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
-        cur.execute("""
+        await cur.execute("""
             SELECT 
                 o.order_id, o.status, o.order_date, o.schedule_date,
                 c.name as customer_name, c.city as customer_city,
@@ -1748,12 +1783,12 @@ def get_order_details(order_id: int, current_user: dict = Depends(get_current_us
             WHERE o.order_id = %s;
         """, (order_id,))
         
-        order = cur.fetchone()
+        order = await cur.fetchone()
         if not order:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
 
         # Get order items
-        cur.execute("""
+        await cur.execute("""
             SELECT 
                 oi.product_id, oi.quantity,
                 p.product_name, p.unit_price
@@ -1762,39 +1797,37 @@ def get_order_details(order_id: int, current_user: dict = Depends(get_current_us
             WHERE oi.order_id = %s;
         """, (order_id,))
         
-        items = cur.fetchall()
+        items = await cur.fetchall()
 
         return {
-            "order_id": order[0],
-            "status": order[1],
-            "order_date": str(order[2]),
-            "schedule_date": str(order[3]),
-            "customer_name": order[4],
-            "customer_city": order[5],
-            "delivery_date_time": str(order[6]) if order[6] else None,
-            "delivery_status": order[7],
+            "order_id": order['order_id'],
+            "status": order['status'],
+            "order_date": str(order['order_date']),
+            "schedule_date": str(order['schedule_date']),
+            "customer_name": order['customer_name'],
+            "customer_city": order['customer_city'],
+            "delivery_date_time": str(order['delivery_date_time']) if order['delivery_date_time'] else None,
+            "delivery_status": order['delivery_status'],
             "items": [
                 {
-                    "product_id": item[0],
-                    "quantity": item[1],
-                    "product_name": item[2],
-                    "unit_price": float(item[3])
+                    "product_id": item['product_id'],
+                    "quantity": item['quantity'],
+                    "product_name": item['product_name'],
+                    "unit_price": float(item['unit_price'])
                 } for item in items
             ]
         }
 
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
 
 @orders_router.put("/orders/{order_id}/status")
-def update_order_status(order_id: int, status_update: dict, current_user: dict = Depends(get_current_user)):
+async def update_order_status(order_id: int, status_update: dict, current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     """Update order status"""
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
@@ -1802,54 +1835,58 @@ def update_order_status(order_id: int, status_update: dict, current_user: dict =
         if not new_status:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Status is required")
 
-        cur.execute('UPDATE "order" SET status = %s WHERE order_id = %s RETURNING order_id, status;', (new_status, order_id))
-        updated = cur.fetchone()
+        await cur.execute('UPDATE "order" SET status = %s WHERE order_id = %s RETURNING order_id, status, delivery_id;', (new_status, order_id))
+        updated = await cur.fetchone()
 
         if not updated:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
 
-        conn.commit()
+        await conn.commit()
+        report_cache.invalidate(ORDERS)
+
+        event = {"order_id": updated['order_id'], "status": updated['status']}
+        hub.publish(topic("order", updated['order_id']), "order_status", event)
+        if updated['delivery_id'] is not None:
+            hub.publish(topic("delivery", updated['delivery_id']), "order_status", event)
 
         return {
-            "order_id": updated[0],
-            "status": updated[1]
+            "order_id": updated['order_id'],
+            "status": updated['status']
         }
 
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
 
 @dashboard_router.get("/dashboard/warehouse-manager-stats")
-def get_warehouse_manager_stats(current_user: dict = Depends(get_current_user)):
+async def get_warehouse_manager_stats(current_user: dict = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
     """Get statistics for warehouse manager dashboard"""
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
         # Total products in stock
-        cur.execute('SELECT COUNT(*) as count FROM product;')
-        result = cur.fetchone()
+        await cur.execute('SELECT COUNT(*) as count FROM product;')
+        result = await cur.fetchone()
         total_products = (result['count'] if isinstance(result, dict) else result[0]) or 0
 
         # Total units available
-        cur.execute('SELECT COALESCE(SUM(available_units), 0) as total FROM product;')
-        result = cur.fetchone()
+        await cur.execute('SELECT COALESCE(SUM(available_units), 0) as total FROM product;')
+        result = await cur.fetchone()
         total_units = int((result['total'] if isinstance(result, dict) else result[0]) or 0)
 
         # Low stock items (below threshold - using 50 as default threshold)
-        cur.execute("""
+        await cur.execute("""
             SELECT COUNT(*) as count FROM product
             WHERE available_units < 50;
         """)
-        result = cur.fetchone()
+        result = await cur.fetchone()
         low_stock_items = (result['count'] if isinstance(result, dict) else result[0]) or 0
 
         # Recent stock updates (last 5 changes) - simplified version
-        cur.execute("""
+        await cur.execute("""
             SELECT
                 product_id,
                 product_name,
@@ -1860,10 +1897,10 @@ def get_warehouse_manager_stats(current_user: dict = Depends(get_current_user)):
             ORDER BY product_id DESC
             LIMIT 5;
         """)
-        recent_updates = cur.fetchall()
+        recent_updates = await cur.fetchall()
 
         # Stock distribution by category
-        cur.execute("""
+        await cur.execute("""
             SELECT
                 category,
                 COUNT(*) as product_count,
@@ -1872,20 +1909,20 @@ def get_warehouse_manager_stats(current_user: dict = Depends(get_current_user)):
             GROUP BY category
             ORDER BY total_units DESC;
         """)
-        category_distribution = cur.fetchall()
+        category_distribution = await cur.fetchall()
 
-        # Stock trend - received vs issued (using order data)
-        cur.execute("""
+        # Stock trend - received vs issued (using the daily order rollup)
+        await cur.execute("""
             SELECT
-                TO_CHAR(o.order_date, 'YYYY-MM-DD') as date,
-                COALESCE(SUM(oi.quantity), 0) as issued_units
-            FROM "order" o
-            LEFT JOIN order_item oi ON o.order_id = oi.order_id
-            WHERE o.order_date >= NOW() - INTERVAL '30 days'
-            GROUP BY TO_CHAR(o.order_date, 'YYYY-MM-DD')
+                TO_CHAR(order_date, 'YYYY-MM-DD') as date,
+                COALESCE(SUM(item_units), 0) as issued_units
+            FROM dashboard_order_daily
+            WHERE order_date >= NOW() - INTERVAL '30 days'
+            GROUP BY order_date
+            HAVING SUM(order_count) > 0
             ORDER BY date DESC;
         """)
-        stock_trend = cur.fetchall()
+        stock_trend = await cur.fetchall()
 
         return {
             "total_products": int(total_products),
@@ -1916,20 +1953,18 @@ def get_warehouse_manager_stats(current_user: dict = Depends(get_current_user)):
         }
 
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         import traceback
         print(f"Warehouse stats error: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
 
 @products_router.get("/products/{product_id}")
-def get_product(product_id: int, current_user: dict = Depends(get_current_user)):
+def get_product(product_id: int, current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     """Get detailed product information"""
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
@@ -1961,12 +1996,10 @@ def get_product(product_id: int, current_user: dict = Depends(get_current_user))
 
     finally:
         cur.close()
-        conn.close()
 
 @products_router.put("/products/{product_id}")
-def update_product(product_id: int, update_data: dict, current_user: dict = Depends(get_current_user)):
+def update_product(product_id: int, update_data: dict, current_user: dict = Depends(get_current_user), conn = Depends(database.get_db)):
     """Update product information (e.g., stock units)"""
-    conn = database.get_db_connection()
     cur = conn.cursor()
 
     try:
@@ -1986,7 +2019,10 @@ def update_product(product_id: int, update_data: dict, current_user: dict = Depe
                 (unit_price, product_id)
             )
 
+        versions = catalog_versions.bump(cur, PRODUCT, INVENTORY)
         conn.commit()
+        catalog_versions.publish(versions)
+        report_cache.invalidate(PRODUCTS)
 
         # Fetch and return updated product
         cur.execute("""
@@ -2017,4 +2053,3 @@ def update_product(product_id: int, update_data: dict, current_user: dict = Depe
 
     finally:
         cur.close()
-        conn.close()
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import threading
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from ..db import async_database
+from ..realtime.hub import hub, topic
+
+# Seconds between reloads of catalog_version. Bumps reach other workers through the hub
+# broker; the reload bounds staleness when the broker is in-memory only.
+CATALOG_VERSION_REFRESH = float(os.getenv("CATALOG_VERSION_REFRESH", "30"))
+
+# Catalog resources with a version counter (rows of catalog_version)
+PRODUCT = "product"
+INVENTORY = "inventory"
+STORE = "store"
+ROUTE = "route"
+TRUCK = "truck"
+EMPLOYEE_TYPE = "employee_type"
+
+# Inventory changes with every order, so its version comes from a sequence
+# (migrations/008_inventory_version_seq.sql): nextval takes no row lock, where bumping
+# a catalog_version row would serialize every order transaction on that row.
+_SEQUENCE_VERSIONS = {
+    INVENTORY: "SELECT 'inventory' AS resource, nextval('inventory_version_seq') AS version;",
+}
+
+_VERSIONS = """
+    SELECT resource, version FROM catalog_version WHERE resource <> 'inventory'
+    UNION ALL
+    SELECT 'inventory', last_value FROM inventory_version_seq;
+"""
+
+_BUMP = """
+    UPDATE catalog_version SET version = version + 1
+    WHERE resource = ANY(%s)
+    RETURNING resource, version;
+"""
+
+
+def _bumps(resources):
+    """Statements bumping `resources`: one UPDATE for the table rows, a nextval per sequence."""
+    rows = [resource for resource in resources if resource not in _SEQUENCE_VERSIONS]
+    if rows:
+        yield _BUMP, (rows,)
+    for resource in resources:
+        if resource in _SEQUENCE_VERSIONS:
+            yield _SEQUENCE_VERSIONS[resource], None
+
+
+class CatalogVersions:
+    """
+    In-process copy of catalog_version, so conditional GETs are answered without a query.
+
+    Writers call bump()/bump_async() inside their transaction and publish() after it
+    commits; publish() updates this process and, through the hub, every other worker.
+    A sequence-backed version also advances for a transaction that rolls back, which
+    only costs clients one extra full response.
+    """
+
+    def __init__(self):
+        self.versions = {}
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._task = None
+
+    def etag(self, resource):
+        with self._lock:
+            version = self.versions.get(resource)
+        return f'"{resource}-{version}"' if version is not None else None
+
+    def update(self, rows):
+        with self._lock:
+            for row in rows:
+                # Versions only move forward, whatever order updates arrive in
+                if row["version"] > self.versions.get(row["resource"], -1):
+                    self.versions[row["resource"]] = row["version"]
+
+    def bump(self, cur, *resources):
+        versions = []
+        for query, params in _bumps(resources):
+            cur.execute(query, params)
+            versions.extend(cur.fetchall())
+        return versions
+
+    async def bump_async(self, cur, *resources):
+        versions = []
+        for query, params in _bumps(resources):
+            await cur.execute(query, params)
+            versions.extend(await cur.fetchall())
+        return versions
+
+    def publish(self, rows):
+        self.update(rows)
+        for row in rows:
+            hub.publish(topic("catalog", row["resource"]), "catalog_version", dict(row))
+
+    # Hub subscriber interface: versions bumped by other workers
+
+    def offer(self, message):
+        self.update([json.loads(message)["data"]])
+        return True
+
+    def close(self):
+        pass
+
+    async def reload(self):
+        async with async_database.connection() as conn:
+            cur = conn.cursor()
+            try:
+                await cur.execute(_VERSIONS)
+                rows = await cur.fetchall()
+            finally:
+                await cur.close()
+        self.update(rows)
+        for row in rows:
+            hub.subscribe(self, topic("catalog", row["resource"]))
+        self.loaded = True
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Catalog version reload failed: {e}")
+            await asyncio.sleep(CATALOG_VERSION_REFRESH)
+
+
+catalog_versions = CatalogVersions()
+
+
+def conditional(resource, auth=None):
+    """
+    Route dependency for a catalog GET: tags the response with a strong ETag for
+    `resource`'s version and answers 304 when If-None-Match already has it. List it in
+    the route's `dependencies` so it runs before the handler queries anything; `auth`
+    (get_current_user for protected routes) is checked first.
+    """
+    def check(request: Request, response: Response):
+        etag = catalog_versions.etag(resource)
+        if etag is None:
+            return
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        # If-None-Match uses weak comparison, so W/"x" matches "x"
+        candidates = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+        if etag in candidates or "*" in candidates:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+
+    if auth is None:
+        return check
+
+    def check_authenticated(request: Request, response: Response, current_user = Depends(auth)):
+        check(request, response)
+    return check_authenticated
@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import os
+import uuid
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from psycopg2.extras import RealDictCursor
+
+from ..db import database
+
+# Rows fetched per round trip by the server-side cursor, and written per response chunk
+EXPORT_ITERSIZE = int(os.getenv("EXPORT_ITERSIZE", "2000"))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _ndjson_chunks(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, default=str))
+        if len(lines) >= EXPORT_ITERSIZE:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def _csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = None
+    count = 0
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row.keys()))
+            writer.writeheader()
+        writer.writerow(row)
+        count += 1
+        if count >= EXPORT_ITERSIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _rows(query, params):
+    """
+    Run `query` through a named (server-side) cursor on a connection of its own, so rows
+    arrive EXPORT_ITERSIZE at a time and memory stays flat whatever the result size.
+
+    The first next() checks out the connection, executes the query and fetches the first
+    batch, then yields None; stream_export() drives it that far before sending headers,
+    so those failures become an HTTP error. Only the rest of the iteration is deferred.
+    """
+    pool = database.get_pool()
+    try:
+        conn = pool.getconn()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Database connection error: {e}")
+    cur = None
+    try:
+        try:
+            cur = conn.cursor(name=f"export_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+            cur.itersize = EXPORT_ITERSIZE
+            cur.execute(query, params)
+            first = cur.fetchmany(EXPORT_ITERSIZE)
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        yield None
+
+        for row in first:
+            yield dict(row)
+        for row in cur:
+            yield dict(row)
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated body
+        print(f"Export failed: {e}")
+        raise
+    finally:
+        if cur is not None and not conn.closed:
+            try:
+                cur.close()
+            except Exception:
+                pass
+        pool.putconn(conn)
+
+
+def stream_export(query, params, export_format, filename):
+    """StreamingResponse of the query's rows as NDJSON (one object per line) or CSV."""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format; use one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    rows = _rows(query, params)
+    # Connect and execute now, while an error can still change the status code
+    next(rows)
+    chunks = _csv_chunks if export_format == "csv" else _ndjson_chunks
+    return StreamingResponse(
+        chunks(rows),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
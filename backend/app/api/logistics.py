@@ -1,8 +1,20 @@
-from fastapi import HTTPException, Query, APIRouter, Path, Body, Depends
-from ..db.database import get_db_connection
-from datetime import datetime
+from fastapi import HTTPException, Query, APIRouter, Path, Body, Depends, Request
+from ..db.database import get_db
+from ..db import async_database
+from datetime import date, datetime
+from typing import Optional
 from psycopg2.extras import RealDictCursor
-from .core import get_current_user
+from ..realtime.hub import hub, topic
+from ..services import delivery_planner, simulator
+from ..services.capacity_index import trip_capacity
+from ..services.report_views import REPORT_REFRESH_INTERVAL, REPORT_REFRESH_TICK, report_views
+from ..services.roster import STAFF_MEMBER_QUERY, roster
+from ..schemas import schemas
+from .etags import ROUTE, STORE, TRUCK, catalog_versions, conditional
+from .export import stream_export
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, filter_clauses, keyset_query, page
+from .report_cache import DELIVERIES, ORDERS, PRODUCTS, SCHEDULES, cached_report, report_cache
+from .core import get_current_user, get_current_user_async, get_current_user_lazy
 
 train_trips_router = APIRouter(
     prefix="/train-trips",   # all routes here start with /train-trips
@@ -36,16 +48,34 @@ train_trips_router = APIRouter(
 #     finally:
 #         cursor.close()
 #         conn.close()
-def get_train_trips():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def get_train_trips(
+    departure_city: Optional[str] = None,
+    arrival_city: Optional[str] = None,
+    depart_from: Optional[datetime] = None,
+    depart_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    conn = Depends(get_db)
+):
+    """Trips latest departure first, optionally within [depart_from, depart_to)."""
+    db_cursor = conn.cursor()
     try:
-        cursor.execute("SELECT train_trip_id, departure_city, arrival_city, departure_date_time, arrival_date_time, total_capacity, available_capacity FROM train_trip;")
-        trips = cursor.fetchall()
-        return trips
+        keys = [("departure_date_time", "timestamp"), ("train_trip_id", "int")]
+        query, params = keyset_query(
+            "SELECT train_trip_id, departure_city, arrival_city, departure_date_time, arrival_date_time, total_capacity, available_capacity FROM train_trip",
+            keys,
+            [
+                ("departure_city = %s", departure_city),
+                ("arrival_city = %s", arrival_city),
+                ("departure_date_time >= %s", depart_from),
+                ("departure_date_time < %s", depart_to),
+            ],
+            cursor, limit
+        )
+        db_cursor.execute(query, params)
+        return page(db_cursor.fetchall(), keys, limit)
     finally:
-        cursor.close()
-        conn.close()
+        db_cursor.close()
 
 
 
@@ -56,9 +86,9 @@ def create_train_trip(
     arrival_city: str = Query(...),
     departure_date_time: datetime = Query(...),
     arrival_date_time: datetime = Query(...),
-    total_capacity: float = Query(...)
+    total_capacity: float = Query(...),
+    conn = Depends(get_db)
 ):
-    conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute(
@@ -66,34 +96,67 @@ def create_train_trip(
                VALUES (%s,%s,%s,%s,%s,%s) RETURNING train_trip_id, departure_city;""",
             (departure_city, arrival_city, departure_date_time, arrival_date_time, total_capacity, total_capacity)
         )
+        created = cursor.fetchone()
         conn.commit()
-        return cursor.fetchone()
+        trip_capacity.add_trip({
+            "train_trip_id": created["train_trip_id"],
+            "departure_city": departure_city,
+            "arrival_city": arrival_city,
+            "departure_date_time": departure_date_time,
+            "arrival_date_time": arrival_date_time,
+            "total_capacity": total_capacity,
+            "available_capacity": total_capacity
+        })
+        return created
     finally:
         cursor.close()
-        conn.close()        
 
-@train_trips_router.get("/train-schedules")
-def get_train_schedules():
-    conn = get_db_connection()
+@train_trips_router.post("/train-trips/simulate")
+def simulate_allocation(request: schemas.AllocationSimulation, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    """
+    What-if allocation: run the batch allocation policy over Pending orders with
+    hypothetical extra trips and/or capacity overrides, without writing anything.
+    """
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            SELECT ts.train_trip_id, ts.train_departure_date_time, ts.order_id, ts.allocated_space, ts.status
-            FROM train_schedule ts;
-        """)
-        return cursor.fetchall()
+        return simulator.run_simulation(cursor, request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+
+@train_trips_router.get("/train-schedules")
+def get_train_schedules(
+    train_trip_id: Optional[int] = None,
+    order_id: Optional[int] = None,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    conn = Depends(get_db)
+):
+    db_cursor = conn.cursor()
+    try:
+        keys = [("ts.train_departure_date_time", "timestamp"), ("ts.train_trip_id", "int"), ("ts.order_id", "int")]
+        query, params = keyset_query(
+            """SELECT ts.train_trip_id, ts.train_departure_date_time, ts.order_id, ts.allocated_space, ts.status
+               FROM train_schedule ts""",
+            keys,
+            [("ts.train_trip_id = %s", train_trip_id), ("ts.order_id = %s", order_id), ("ts.status = %s", status)],
+            cursor, limit
+        )
+        db_cursor.execute(query, params)
+        return page(db_cursor.fetchall(), keys, limit)
+    finally:
+        db_cursor.close()
 
 @train_trips_router.post("/train-schedules")
 def create_train_schedule(
     train_trip_id: int = Query(...),
     train_departure_date_time: datetime = Query(...),
     order_id: int = Query(...),
-    allocated_space: float = Query(...)
+    allocated_space: float = Query(...),
+    conn = Depends(get_db)
 ):
-    conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("""
@@ -101,15 +164,22 @@ def create_train_schedule(
             VALUES (%s, %s, %s, %s, 'Allocated')
             RETURNING train_trip_id, order_id, allocated_space;
         """, (train_trip_id, train_departure_date_time, order_id, allocated_space))
+        created = cursor.fetchone()
+        cursor.execute(
+            "SELECT available_capacity FROM train_trip WHERE train_trip_id = %s AND departure_date_time = %s;",
+            (train_trip_id, train_departure_date_time)
+        )
+        trip = cursor.fetchone()
         conn.commit()
-        return cursor.fetchone()
+        report_cache.invalidate(SCHEDULES)
+        if trip:
+            trip_capacity.set_capacity(train_trip_id, train_departure_date_time, trip["available_capacity"])
+        return created
     finally:
         cursor.close()
-        conn.close()
 
 @train_trips_router.get("/train-to-store")
-def get_train_to_store():
-    conn = get_db_connection()
+def get_train_to_store(conn = Depends(get_db)):
     cursor = conn.cursor()
     try:
         cursor.execute("""
@@ -120,15 +190,14 @@ def get_train_to_store():
         return cursor.fetchall()
     finally:
         cursor.close()
-        conn.close()
 
 @train_trips_router.post("/train-to-store")
 def create_train_to_store(
     train_trip_id: int = Query(...),
     train_departure_date_time: datetime = Query(...),
-    store_id: int = Query(...)
+    store_id: int = Query(...),
+    conn = Depends(get_db)
 ):
-    conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("""
@@ -140,148 +209,265 @@ def create_train_to_store(
         return cursor.fetchone()
     finally:
         cursor.close()
-        conn.close()        
 truck_router = APIRouter(
     prefix="/Trucks",   # all routes here start with /train-trips
     tags=["Truck"]
 )
 
-@truck_router.get("/trucks")
-def get_trucks():
-    conn = get_db_connection()
+@truck_router.get("/trucks", dependencies=[Depends(conditional(TRUCK))])
+def get_trucks(conn = Depends(get_db)):
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT truck_id, plate_number, max_load, status FROM truck;")
+        cursor.execute("SELECT truck_id, plate_number, max_load, status FROM truck ORDER BY truck_id;")
         return cursor.fetchall()
     finally:
         cursor.close()
-        conn.close()
 
 @truck_router.post("/trucks")
 def create_truck(
     plate_number: str = Query(...), 
     max_load: float = Query(...),
     status: str = Query("Available"),
-    store_id: int = Query(None)
+    store_id: int = Query(None),
+    conn = Depends(get_db)
 ):
-    conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute(
             "INSERT INTO truck(plate_number, max_load, status, store_id) VALUES (%s,%s,%s,%s) RETURNING truck_id, plate_number;",
             (plate_number, max_load, status, store_id)
         )
+        created = cursor.fetchone()
+        versions = catalog_versions.bump(cursor, TRUCK)
         conn.commit()
-        return cursor.fetchone()
+        catalog_versions.publish(versions)
+        return created
     finally:
         cursor.close()
-        conn.close()
 
 routes_router = APIRouter(
     prefix="/routes",   # all routes here start with /train-trips
     tags=["Routes"]
 )
 
-@routes_router.get("/routes")
-def get_routes():
-    conn = get_db_connection()
+@routes_router.get("/routes", dependencies=[Depends(conditional(ROUTE))])
+def get_routes(conn = Depends(get_db)):
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT route_id, start_location, end_location, max_delivery_time FROM route;")
+        cursor.execute("SELECT route_id, start_location, end_location, max_delivery_time FROM route ORDER BY route_id;")
         return cursor.fetchall()
     finally:
         cursor.close()
-        conn.close()
 
 @routes_router.post("/routes")
 def create_route(
     start_location: str = Query(...),
     end_location: str = Query(...),
     max_delivery_time: str = Query(...),
-    area_covered_description: str = Query(None)
+    area_covered_description: str = Query(None),
+    conn = Depends(get_db)
 ):
-    conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute(
             "INSERT INTO route(start_location, end_location, max_delivery_time, area_covered_description) VALUES (%s,%s,%s,%s) RETURNING route_id, start_location, end_location;",
             (start_location, end_location, max_delivery_time, area_covered_description)
         )
+        created = cursor.fetchone()
+        versions = catalog_versions.bump(cursor, ROUTE)
         conn.commit()
-        return cursor.fetchone()
+        catalog_versions.publish(versions)
+        return created
     finally:
         cursor.close()
-        conn.close()
 deliveries_router = APIRouter(
     prefix="/deliveries",   
     tags=["Deleveries"]
 )
 @deliveries_router.get("/deliveries")
-def get_deliveries():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_deliveries(
+    status: Optional[str] = None,
+    truck_id: Optional[int] = None,
+    route_id: Optional[int] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    conn = Depends(async_database.get_async_db)
+):
+    """Deliveries latest first, optionally with delivery_date_time in [from_date, to_date)."""
+    db_cursor = conn.cursor()
     try:
-        cursor.execute("SELECT delivery_id, truck_id, route_id, delivery_date_time, status FROM delivery;")
-        return cursor.fetchall()
+        keys = [("delivery_date_time", "timestamp"), ("delivery_id", "int")]
+        query, params = keyset_query(
+            "SELECT delivery_id, truck_id, route_id, delivery_date_time, status FROM delivery",
+            keys,
+            [
+                ("status = %s", status),
+                ("truck_id = %s", truck_id),
+                ("route_id = %s", route_id),
+                ("delivery_date_time >= %s", from_date),
+                ("delivery_date_time < %s", to_date),
+            ],
+            cursor, limit
+        )
+        await db_cursor.execute(query, params)
+        return page(await db_cursor.fetchall(), keys, limit)
     finally:
-        cursor.close()
-        conn.close()
+        await db_cursor.close()
 
 @deliveries_router.post("/deliveries")
-def create_delivery(
+async def create_delivery(
     truck_id: int = Query(...),
     route_id: int = Query(...),
     user_id: int = Query(...),
     delivery_date_time: datetime = Query(...),
     driver_employee_id: int = Query(None),
-    assistant_employee_id: int = Query(None)
+    assistant_employee_id: int = Query(None),
+    conn = Depends(async_database.get_async_db)
 ):
-    conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(
+        crew = {"driver": driver_employee_id, "assistant": assistant_employee_id}
+        hours = None
+        if roster.loaded and any(crew.values()):
+            await cursor.execute("SELECT max_delivery_time FROM route WHERE route_id = %s;", (route_id,))
+            route = await cursor.fetchone()
+            if not route:
+                raise HTTPException(status_code=404, detail="Route not found")
+            hours = delivery_planner.route_hours(route["max_delivery_time"])
+            for role, employee_id in crew.items():
+                if employee_id and not roster.knows(employee_id):
+                    # Hired or retyped since the last roster load
+                    await cursor.execute(STAFF_MEMBER_QUERY, (employee_id,))
+                    staff = await cursor.fetchone()
+                    if staff:
+                        roster.track(staff)
+                reason = employee_id and roster.violation(employee_id, delivery_date_time, hours, role)
+                if reason:
+                    raise HTTPException(status_code=409, detail=f"{role.capitalize()} {employee_id}: {reason}")
+
+        await cursor.execute(
             """INSERT INTO delivery(truck_id, route_id, user_id, delivery_date_time, driver_employee_id, assistant_employee_id)
                VALUES (%s,%s,%s,%s,%s,%s) RETURNING delivery_id, status;""",
             (truck_id, route_id, user_id, delivery_date_time, driver_employee_id, assistant_employee_id)
         )
-        conn.commit()
-        return cursor.fetchone()
+        delivery = await cursor.fetchone()
+        await conn.commit()
+        report_cache.invalidate(DELIVERIES)
+        if hours is not None:
+            for employee_id in crew.values():
+                if employee_id:
+                    roster.record(employee_id, delivery_date_time, hours, delivery["delivery_id"])
+        return delivery
     finally:
-        cursor.close()
-        conn.close()        
+        await cursor.close()
+@deliveries_router.get("/eligible-staff")
+async def get_eligible_staff(
+    delivery_date_time: datetime = Query(...),
+    route_id: int = Query(None),
+    hours: float = Query(None, gt=0),
+    role: str = Query(None, pattern="^(driver|assistant)$"),
+    current_user = Depends(get_current_user_async),
+    conn = Depends(async_database.get_async_db)
+):
+    """
+    Drivers and assistants who can take a delivery starting at delivery_date_time without
+    breaking weekly_max_hours or max_consecutive_trips. The trip lasts `hours`, or the
+    route's max_delivery_time when only route_id is given.
+    """
+    if hours is None:
+        if route_id is None:
+            raise HTTPException(status_code=400, detail="Either hours or route_id is required")
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("SELECT max_delivery_time FROM route WHERE route_id = %s;", (route_id,))
+            route = await cursor.fetchone()
+        finally:
+            await cursor.close()
+        if not route:
+            raise HTTPException(status_code=404, detail="Route not found")
+        hours = delivery_planner.route_hours(route["max_delivery_time"])
+
+    if not roster.loaded:
+        await roster.reload()
+    staff = roster.eligible(delivery_date_time, hours, role)
+    return {
+        "delivery_date_time": delivery_date_time,
+        "hours": hours,
+        "drivers": [s for s in staff if s["role"] == "driver"],
+        "assistants": [s for s in staff if s["role"] == "assistant"]
+    }
+
+@deliveries_router.post("/plan")
+async def plan_deliveries(
+    delivery_date: Optional[date] = Query(None),
+    dry_run: bool = Query(False),
+    current_user = Depends(get_current_user_async),
+    conn = Depends(async_database.get_async_db)
+):
+    """
+    Create truck deliveries for the orders due on delivery_date (default today) that
+    have reached their store by train, within truck load, route time and crew limits.
+    """
+    try:
+        result = await delivery_planner.plan_day(conn, delivery_date, current_user["user_id"], dry_run)
+        await conn.commit()
+
+        if not dry_run:
+            report_cache.invalidate(ORDERS, DELIVERIES, SCHEDULES)
+            for delivery in result["deliveries"]:
+                event = {
+                    "delivery_id": delivery["delivery_id"],
+                    "route_id": delivery["route_id"],
+                    "truck_id": delivery["truck_id"],
+                    "delivery_date_time": delivery["delivery_date_time"].isoformat()
+                }
+                for employee_id in (delivery["driver_employee_id"], delivery["assistant_employee_id"]):
+                    roster.record(employee_id, delivery["delivery_date_time"], delivery["hours"], delivery["delivery_id"])
+                    hub.publish(topic("employee", employee_id), "delivery_assigned", event)
+        return result
+    except Exception as e:
+        await conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
 @deliveries_router.put("/{delivery_id}/status")
-def update_delivery_status(
+async def update_delivery_status(
     delivery_id: int = Path(..., description="ID of the delivery to update"),
-    payload: dict = Body(..., example={"status": "In Transit"})
+    payload: dict = Body(..., example={"status": "In Transit"}),
+    conn = Depends(async_database.get_async_db)
 ):
     new_status = payload.get("status")
     if not new_status:
         raise HTTPException(status_code=400, detail="Status is required")
 
-    conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            "UPDATE delivery SET status = %s WHERE delivery_id = %s RETURNING delivery_id, status;",
+        await cursor.execute(
+            "UPDATE delivery SET status = %s WHERE delivery_id = %s RETURNING delivery_id, status, driver_employee_id, assistant_employee_id;",
             (new_status, delivery_id)
         )
-        updated = cursor.fetchone()
-        conn.commit()
+        updated = await cursor.fetchone()
+        await conn.commit()
         if not updated:
             raise HTTPException(status_code=404, detail="Delivery not found")
+        report_cache.invalidate(DELIVERIES)
+
+        event = {"delivery_id": updated["delivery_id"], "status": updated["status"]}
+        hub.publish(topic("delivery", updated["delivery_id"]), "delivery_status", event)
+        for employee_id in {updated["driver_employee_id"], updated["assistant_employee_id"]} - {None}:
+            hub.publish(topic("employee", employee_id), "delivery_status", event)
         return {"id": updated["delivery_id"], "status": updated["status"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 @deliveries_router.get("/assistant/{employee_id}/assignments")
-def get_assistant_assignments(employee_id: int = Path(...), current_user = Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+async def get_assistant_assignments(employee_id: int = Path(...), current_user = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
+    cursor = conn.cursor()
     try:
-        cursor.execute("""
+        await cursor.execute("""
             SELECT
                 d.delivery_id,
                 d.delivery_date_time,
@@ -303,18 +489,16 @@ def get_assistant_assignments(employee_id: int = Path(...), current_user = Depen
             GROUP BY d.delivery_id, d.delivery_date_time, d.status, r.start_location, r.end_location, t.plate_number, t.truck_id, e.employee_id, e.first_name, e.last_name
             ORDER BY d.delivery_date_time ASC
         """, (employee_id,))
-        assignments = cursor.fetchall()
+        assignments = await cursor.fetchall()
         return [dict(a) for a in assignments]
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 @deliveries_router.get("/{delivery_id}/order-items")
-def get_delivery_items(delivery_id: int = Path(...), current_user = Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+async def get_delivery_items(delivery_id: int = Path(...), current_user = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
+    cursor = conn.cursor()
     try:
-        cursor.execute("""
+        await cursor.execute("""
             SELECT
                 o.order_id,
                 c.name AS customer_name,
@@ -328,17 +512,17 @@ def get_delivery_items(delivery_id: int = Path(...), current_user = Depends(get_
             WHERE o.delivery_id = %s
             ORDER BY o.order_id, p.product_name
         """, (delivery_id,))
-        items = cursor.fetchall()
+        items = await cursor.fetchall()
         return [dict(i) for i in items]
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 @deliveries_router.post("/{delivery_id}/confirm-item")
-def confirm_delivery_item(
+async def confirm_delivery_item(
     delivery_id: int = Path(...),
     payload: dict = Body(..., example={"order_id": 1, "product_id": 1, "confirmed_quantity": 5}),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user_async),
+    conn = Depends(async_database.get_async_db)
 ):
     order_id = payload.get("order_id")
     product_id = payload.get("product_id")
@@ -347,39 +531,37 @@ def confirm_delivery_item(
     if not order_id or not product_id:
         raise HTTPException(status_code=400, detail="order_id and product_id are required")
 
-    conn = get_db_connection()
     cursor = conn.cursor()
     try:
         # Create a delivery_confirmation tracking (if you have this table)
         # For now, just mark the item as confirmed by updating status
-        cursor.execute("""
+        await cursor.execute("""
             UPDATE "order" SET status = 'Delivered'
             WHERE order_id = %s
             RETURNING order_id, status
         """, (order_id,))
-        result = cursor.fetchone()
-        conn.commit()
+        result = await cursor.fetchone()
+        await conn.commit()
 
         if not result:
             raise HTTPException(status_code=404, detail="Order not found")
+        report_cache.invalidate(ORDERS, DELIVERIES)
 
         return {"order_id": result[0] if isinstance(result, tuple) else result['order_id'], "status": result[1] if isinstance(result, tuple) else result['status']}
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 @deliveries_router.get("/assistant/{employee_id}/notifications")
-def get_assistant_notifications(employee_id: int = Path(...), current_user = Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+async def get_assistant_notifications(employee_id: int = Path(...), current_user = Depends(get_current_user_async), conn = Depends(async_database.get_async_db)):
+    cursor = conn.cursor()
     try:
         notifications = []
 
         # Get upcoming deliveries
-        cursor.execute("""
+        await cursor.execute("""
             SELECT
                 d.delivery_id,
                 'Route Update' AS type,
@@ -394,10 +576,10 @@ def get_assistant_notifications(employee_id: int = Path(...), current_user = Dep
             LIMIT 5
         """, (employee_id,))
 
-        notifications.extend([dict(n) for n in cursor.fetchall()])
+        notifications.extend([dict(n) for n in await cursor.fetchall()])
 
         # Get alerts for items ready for delivery
-        cursor.execute("""
+        await cursor.execute("""
             SELECT
                 'Alert' AS type,
                 'Items ready for delivery at ' || r.end_location AS message,
@@ -409,139 +591,176 @@ def get_assistant_notifications(employee_id: int = Path(...), current_user = Dep
             LIMIT 3
         """, (employee_id,))
 
-        notifications.extend([dict(n) for n in cursor.fetchall()])
+        notifications.extend([dict(n) for n in await cursor.fetchall()])
 
         return notifications
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 stores_router = APIRouter(
     prefix="/stores",   # all routes here start with /train-trips
     tags=["Stores"]
 )
 
-@stores_router.get("/stores")
-def get_stores():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@stores_router.get("/stores", dependencies=[Depends(conditional(STORE))])
+def get_stores(
+    city: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    conn = Depends(get_db)
+):
+    db_cursor = conn.cursor()
     try:
-        cursor.execute("SELECT store_id, city, address, near_station_name FROM store;")
-        return cursor.fetchall()
+        keys = [("store_id", "int")]
+        query, params = keyset_query(
+            "SELECT store_id, city, address, near_station_name FROM store",
+            keys, [("city = %s", city)], cursor, limit, descending=False
+        )
+        db_cursor.execute(query, params)
+        return page(db_cursor.fetchall(), keys, limit)
     finally:
-        cursor.close()
-        conn.close()
+        db_cursor.close()
 
 @stores_router.post("/stores")
-def create_store(city: str = Query(...), address: str = Query(...), near_station_name: str = Query(None)):
-    conn = get_db_connection()
+def create_store(city: str = Query(...), address: str = Query(...), near_station_name: str = Query(None), conn = Depends(get_db)):
     cursor = conn.cursor()
     try:
         cursor.execute(
             "INSERT INTO store(city, address, near_station_name) VALUES (%s,%s,%s) RETURNING store_id, city;",
             (city, address, near_station_name)
         )
+        created = cursor.fetchone()
+        versions = catalog_versions.bump(cursor, STORE)
         conn.commit()
-        return cursor.fetchone()
+        catalog_versions.publish(versions)
+        return created
     finally:
         cursor.close()
-        conn.close()
 
 auditlog_router = APIRouter(
     prefix="/auditlog",
     tags=["Auditlogs"]
 )
 @auditlog_router.get("")
-def get_auditlog():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def get_auditlog(
+    table_name: Optional[str] = None,
+    operation: Optional[str] = None,
+    performed_by: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    conn = Depends(get_db)
+):
+    """Audit entries newest first."""
+    db_cursor = conn.cursor()
     try:
-        cursor.execute("SELECT audit_id, table_name, operation, performed_by, performed_at FROM audit_log;")
-        return cursor.fetchall()
+        keys = [("audit_id", "int")]
+        query, params = keyset_query(
+            "SELECT audit_id, table_name, operation, performed_by, performed_at FROM audit_log",
+            keys,
+            [("table_name = %s", table_name), ("operation = %s", operation), ("performed_by = %s", performed_by)],
+            cursor, limit
+        )
+        db_cursor.execute(query, params)
+        return page(db_cursor.fetchall(), keys, limit)
     finally:
-        cursor.close()
-        conn.close()
+        db_cursor.close()
+
+@auditlog_router.get("/export")
+def export_auditlog(
+    export_format: str = Query("ndjson", alias="format"),
+    table_name: Optional[str] = None,
+    operation: Optional[str] = None,
+    performed_by: Optional[int] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    current_user = Depends(get_current_user)
+):
+    """The whole (filtered) audit log in audit_id order, streamed as NDJSON or CSV."""
+    clauses, params = filter_clauses([
+        ("table_name = %s", table_name),
+        ("operation = %s", operation),
+        ("performed_by = %s", performed_by),
+        ("performed_at >= %s", from_date),
+        ("performed_at < %s", to_date),
+    ])
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return stream_export(
+        f"SELECT audit_id, table_name, operation, performed_by, performed_at FROM audit_log{where} ORDER BY audit_id;",
+        params, export_format, "audit_log"
+    )
 
 report_router = APIRouter(
     prefix="/report",   # all routes here start with /train-trips
     tags=["Report"]
-)        
+)
+
+# Reports on materialized views serve the last scheduled refresh; callers that need
+# newer data pass max_age and the view is refreshed first when it is older than that.
+# The floor and the non-blocking refresh keep callers from forcing a refresh per request.
+MAX_AGE = Query(
+    None, ge=REPORT_REFRESH_TICK,
+    description="Refresh the report's materialized view first if it is older than this many seconds; "
+                "while another refresh is running the current copy is served"
+)
+
+# Cached responses built from a view are dropped whenever that view is refreshed
+report_views.on_refresh.append(report_cache.invalidate)
+
+@report_router.get("/freshness")
+def get_report_freshness(current_user = Depends(get_current_user)):
+    """Last refresh of each report's materialized view."""
+    return {"refresh_interval": REPORT_REFRESH_INTERVAL, "views": report_views.stats()}
+
 @report_router.get("/sales")
-def get_quarterly_sales():
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cursor.execute("""
-            SELECT 
-                EXTRACT(YEAR FROM o.order_date) AS year,
-                EXTRACT(QUARTER FROM o.order_date) AS quarter,
-                COALESCE(SUM(oi.quantity * p.unit_price),0) AS totals
-            FROM "order" o
-            JOIN order_item oi ON o.order_id = oi.order_id
-            JOIN product p ON oi.product_id = p.product_id
-            GROUP BY year, quarter
-            ORDER BY year, quarter
-        """)
-        results = cursor.fetchall()
-        
+def get_quarterly_sales(request: Request):
+    return cached_report(request, None, (ORDERS, PRODUCTS), """
+        SELECT 
+            EXTRACT(YEAR FROM o.order_date) AS year,
+            EXTRACT(QUARTER FROM o.order_date) AS quarter,
+            COALESCE(SUM(oi.quantity * p.unit_price),0) AS totals
+        FROM "order" o
+        JOIN order_item oi ON o.order_id = oi.order_id
+        JOIN product p ON oi.product_id = p.product_id
+        GROUP BY year, quarter
+        ORDER BY year, quarter
+    """, lambda results: [
         # Format quarter as Q1, Q2, ...
-        return [
-            {
-                "year": int(r["year"]),
-                "quarter": f"Q{int(r['quarter'])}",
-                "totals": float(r["totals"])
-            }
-            for r in results
-        ]
-    finally:
-        cursor.close()
-        conn.close()
+        {
+            "year": int(r["year"]),
+            "quarter": f"Q{int(r['quarter'])}",
+            "totals": float(r["totals"])
+        }
+        for r in results
+    ])
 
 
 @report_router.get("/truck_usage")
-def get_truck_usage():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            SELECT t.truck_id,
-                   COALESCE(SUM(es.hours_worked) / (COUNT(DISTINCT d.delivery_id) * 24), 0) AS usage_rate
-            FROM truck t
-            LEFT JOIN delivery d ON t.truck_id = d.truck_id
-            LEFT JOIN employee_schedule es ON d.delivery_id = es.delivery_id
-            GROUP BY t.truck_id
-            ORDER BY t.truck_id
-        """)
-        result = cursor.fetchall()
-        # Access dict keys instead of indices
-        return [{"truckId": r["truck_id"], "usageRate": float(r["usage_rate"])} for r in result]
-    finally:
-        cursor.close()
-        conn.close()
+def get_truck_usage(request: Request):
+    return cached_report(request, None, (DELIVERIES, SCHEDULES), """
+        SELECT t.truck_id,
+               COALESCE(SUM(es.hours_worked) / (COUNT(DISTINCT d.delivery_id) * 24), 0) AS usage_rate
+        FROM truck t
+        LEFT JOIN delivery d ON t.truck_id = d.truck_id
+        LEFT JOIN employee_schedule es ON d.delivery_id = es.delivery_id
+        GROUP BY t.truck_id
+        ORDER BY t.truck_id
+    """, lambda result: [{"truckId": r["truck_id"], "usageRate": float(r["usage_rate"])} for r in result])
+
 @report_router.get("/driver-hours")
-def get_driver_hours():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            SELECT e.employee_id, COALESCE(SUM(es.hours_worked),0) AS total_hours
-            FROM employee e
-            JOIN employee_type et ON e.employee_type_id = et.employee_type_id
-            LEFT JOIN employee_schedule es ON e.employee_id = es.employee_id
-            WHERE LOWER(et.type_name) = 'driver'
-            GROUP BY e.employee_id
-            ORDER BY e.employee_id
-        """)
-        result = cursor.fetchall()
-        # Access dict keys
-        return [{"employeeId": r["employee_id"], "totalHours": float(r["total_hours"])} for r in result]
-    finally:
-        cursor.close()
-        conn.close()
+def get_driver_hours(request: Request):
+    return cached_report(request, None, (SCHEDULES,), """
+        SELECT e.employee_id, COALESCE(SUM(es.hours_worked),0) AS total_hours
+        FROM employee e
+        JOIN employee_type et ON e.employee_type_id = et.employee_type_id
+        LEFT JOIN employee_schedule es ON e.employee_id = es.employee_id
+        WHERE LOWER(et.type_name) = 'driver'
+        GROUP BY e.employee_id
+        ORDER BY e.employee_id
+    """, lambda result: [{"employeeId": r["employee_id"], "totalHours": float(r["total_hours"])} for r in result])
 
 @report_router.get("/train-capacity-utilization")
-def get_train_capacity_utilization(current_user = Depends(get_current_user)):
-    conn = get_db_connection()
+def get_train_capacity_utilization(max_age: Optional[float] = MAX_AGE, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    report_views.ensure_fresh("train_capacity_utilization", max_age)
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cursor.execute("""
@@ -555,7 +774,7 @@ def get_train_capacity_utilization(current_user = Depends(get_current_user)):
                 used_capacity,
                 utilization_percent,
                 orders_count
-            FROM train_capacity_utilization
+            FROM train_capacity_utilization_mv
             ORDER BY departure_date_time DESC
             LIMIT 100;
         """)
@@ -563,11 +782,10 @@ def get_train_capacity_utilization(current_user = Depends(get_current_user)):
         return [dict(r) for r in results]
     finally:
         cursor.close()
-        conn.close()
 
 @report_router.get("/delivery-performance")
-def get_delivery_performance(current_user = Depends(get_current_user)):
-    conn = get_db_connection()
+def get_delivery_performance(max_age: Optional[float] = MAX_AGE, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    report_views.ensure_fresh("delivery_performance", max_age)
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cursor.execute("""
@@ -580,7 +798,7 @@ def get_delivery_performance(current_user = Depends(get_current_user)):
                 customer_name,
                 performance_status,
                 hours_delay
-            FROM delivery_performance
+            FROM delivery_performance_mv
             ORDER BY delivery_date_time DESC
             LIMIT 100;
         """)
@@ -588,11 +806,10 @@ def get_delivery_performance(current_user = Depends(get_current_user)):
         return [dict(r) for r in results]
     finally:
         cursor.close()
-        conn.close()
 
 @report_router.get("/employee-workload")
-def get_employee_workload(current_user = Depends(get_current_user)):
-    conn = get_db_connection()
+def get_employee_workload(max_age: Optional[float] = MAX_AGE, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    report_views.ensure_fresh("employee_workload", max_age)
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cursor.execute("""
@@ -606,7 +823,7 @@ def get_employee_workload(current_user = Depends(get_current_user)):
                 avg_hours_per_assignment,
                 last_assignment,
                 assignments_this_week
-            FROM employee_workload
+            FROM employee_workload_mv
             ORDER BY total_hours DESC
             LIMIT 100;
         """)
@@ -614,63 +831,48 @@ def get_employee_workload(current_user = Depends(get_current_user)):
         return [dict(r) for r in results]
     finally:
         cursor.close()
-        conn.close()
 
 @report_router.get("/revenue-analysis")
-def get_revenue_analysis(current_user = Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cursor.execute("""
-            SELECT
-                month,
-                quarter,
-                year,
-                customer_type,
-                order_count,
-                total_revenue,
-                avg_order_value,
-                unique_customers
-            FROM revenue_analysis
-            ORDER BY year DESC, quarter DESC
-            LIMIT 100;
-        """)
-        results = cursor.fetchall()
-        return [dict(r) for r in results]
-    finally:
-        cursor.close()
-        conn.close()
+def get_revenue_analysis(request: Request, max_age: Optional[float] = MAX_AGE, current_user = Depends(get_current_user_lazy)):
+    report_views.ensure_fresh("revenue_analysis", max_age)
+    return cached_report(request, current_user, ("revenue_analysis",), """
+        SELECT
+            month,
+            quarter,
+            year,
+            customer_type,
+            order_count,
+            total_revenue,
+            avg_order_value,
+            unique_customers
+        FROM revenue_analysis_mv
+        ORDER BY year DESC, quarter DESC
+        LIMIT 100;
+    """)
 
 @report_router.get("/product-performance")
-def get_product_performance(current_user = Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cursor.execute("""
-            SELECT
-                product_id,
-                product_name,
-                category,
-                unit_price,
-                total_quantity_sold,
-                total_revenue,
-                order_count,
-                avg_quantity_per_order,
-                current_stock,
-                stock_status
-            FROM product_performance
-            ORDER BY total_revenue DESC
-            LIMIT 100;
-        """)
-        results = cursor.fetchall()
-        return [dict(r) for r in results]
-    finally:
-        cursor.close()
-        conn.close()
+def get_product_performance(request: Request, max_age: Optional[float] = MAX_AGE, current_user = Depends(get_current_user_lazy)):
+    report_views.ensure_fresh("product_performance", max_age)
+    return cached_report(request, current_user, ("product_performance",), """
+        SELECT
+            product_id,
+            product_name,
+            category,
+            unit_price,
+            total_quantity_sold,
+            total_revenue,
+            order_count,
+            avg_quantity_per_order,
+            current_stock,
+            stock_status
+        FROM product_performance_mv
+        ORDER BY total_revenue DESC
+        LIMIT 100;
+    """)
 
 @report_router.get("/inventory-alerts")
-def get_inventory_alerts(current_user = Depends(get_current_user)):
-    conn = get_db_connection()
+def get_inventory_alerts(max_age: Optional[float] = MAX_AGE, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    report_views.ensure_fresh("inventory_alerts", max_age)
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     try:
         cursor.execute("""
@@ -681,7 +883,7 @@ def get_inventory_alerts(current_user = Depends(get_current_user)):
                 category,
                 alert_level,
                 suggested_reorder_point
-            FROM inventory_alerts
+            FROM inventory_alerts_mv
             ORDER BY alert_level DESC, available_units ASC
             LIMIT 100;
         """)
@@ -689,4 +891,38 @@ def get_inventory_alerts(current_user = Depends(get_current_user)):
         return [dict(r) for r in results]
     finally:
         cursor.close()
-        conn.close()
+
+# Reporting views that can be exported in full: view -> (timestamp column for from/to, sort order)
+REPORT_EXPORTS = {
+    "delivery-performance": ("delivery_performance", "delivery_date_time", "delivery_date_time"),
+    "train-capacity-utilization": ("train_capacity_utilization", "departure_date_time", "departure_date_time"),
+    "employee-workload": ("employee_workload", None, "employee_id"),
+    "revenue-analysis": ("revenue_analysis", None, "year, quarter, month"),
+    "product-performance": ("product_performance", None, "product_id"),
+    "inventory-alerts": ("inventory_alerts", None, "product_id"),
+}
+
+@report_router.get("/{report}/export")
+def export_report(
+    report: str = Path(..., description=", ".join(REPORT_EXPORTS)),
+    export_format: str = Query("ndjson", alias="format"),
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    current_user = Depends(get_current_user)
+):
+    """
+    Every row of a reporting view, without the LIMIT 100 of the JSON endpoints, streamed
+    as NDJSON or CSV. from_date/to_date apply to views with a date column.
+    """
+    if report not in REPORT_EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown report; use one of: {', '.join(REPORT_EXPORTS)}")
+    view, date_column, order_by = REPORT_EXPORTS[report]
+    if date_column is None and (from_date or to_date):
+        raise HTTPException(status_code=400, detail=f"{report} cannot be filtered by date")
+
+    clauses, params = filter_clauses([
+        (f"{date_column} >= %s", from_date),
+        (f"{date_column} < %s", to_date),
+    ])
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return stream_export(f"SELECT * FROM {view}{where} ORDER BY {order_by};", params, export_format, view)
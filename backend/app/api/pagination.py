@@ -0,0 +1,67 @@
+import base64
+import json
+import os
+from datetime import date, datetime
+
+from fastapi import HTTPException, status
+
+# Page size for list endpoints when the caller gives no limit, and the most one call may ask for
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+
+def encode_cursor(values):
+    """Opaque cursor for the sort-key values of the last row on a page."""
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+
+def filter_clauses(filters):
+    """Split (clause, value) pairs into SQL clauses and params, skipping None values."""
+    clauses, params = [], []
+    for clause, value in filters:
+        if value is not None:
+            clauses.append(clause)
+            params.append(value)
+    return clauses, params
+
+
+def keyset_query(select, keys, filters=(), cursor=None, limit=DEFAULT_PAGE_SIZE, descending=True):
+    """
+    Add filters, a keyset condition and ORDER BY/LIMIT to `select` (a SELECT ... FROM ...
+    without WHERE).
+
+    `keys` are (column, sql_type) pairs that together identify a row, so each page is an
+    index range scan that starts after the previous page's last row rather than an
+    OFFSET. `filters` are (clause, value) pairs; pairs whose value is None are skipped.
+    One extra row is fetched so `page` can tell whether another page follows.
+    """
+    clauses, params = filter_clauses(filters)
+    if cursor:
+        columns = ", ".join(column for column, _ in keys)
+        placeholders = ", ".join(f"%s::{sql_type}" for _, sql_type in keys)
+        clauses.append(f"({columns}) {'<' if descending else '>'} ({placeholders})")
+        params.extend(decode_cursor(cursor, len(keys)))
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    order = ", ".join(f"{column} {'DESC' if descending else 'ASC'}" for column, _ in keys)
+    return f"{select}{where} ORDER BY {order} LIMIT %s;", params + [limit + 1]
+
+
+def page(rows, keys, limit, item=dict):
+    """The response envelope for rows fetched with keyset_query; `item` shapes each row."""
+    items = [item(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor([last[column.split(".")[-1]] for column, _ in keys])
+    return {"items": items, "next_cursor": next_cursor, "limit": limit}
@@ -0,0 +1,42 @@
+import os
+
+from ..cache import TaggedCache
+from ..db import database
+
+# Report responses are fresh for REPORT_CACHE_TTL seconds, then served for up to
+# REPORT_CACHE_STALE_TTL more while a background refresh reruns the query. Write
+# endpoints invalidate by tag after they commit; the TTL bounds staleness for writes
+# made through another worker process.
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "1000"))
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "30"))
+REPORT_CACHE_STALE_TTL = float(os.getenv("REPORT_CACHE_STALE_TTL", "120"))
+
+# Invalidation tags, one per kind of write
+ORDERS = "orders"
+DELIVERIES = "deliveries"
+SCHEDULES = "schedules"
+PRODUCTS = "products"
+
+report_cache = TaggedCache(REPORT_CACHE_SIZE, REPORT_CACHE_TTL, REPORT_CACHE_STALE_TTL)
+
+
+def _run(query, shape):
+    # Own connection: refreshes run off the request, and hits never touch the pool as long
+    # as the route resolves its user with get_current_user_lazy rather than get_db
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query)
+            return shape(cursor.fetchall())
+        finally:
+            cursor.close()
+
+
+def cached_report(request, current_user, tags, query, shape=lambda rows: [dict(r) for r in rows]):
+    """
+    The shaped rows of `query`, cached per route, query string and caller role and
+    dropped when any of `tags` is invalidated.
+    """
+    role = current_user["role_id"] if current_user else None
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())), role)
+    return report_cache.fetch(key, tags, lambda: _run(query, shape))
@@ -1,117 +1,185 @@
-from fastapi import APIRouter, WebSocket
-from typing import List
+from fastapi import APIRouter, HTTPException, WebSocket, status
+from typing import Optional
 import asyncio
 import datetime
 import json
-from ..db.database import get_db_connection
+import os
+from ..db import async_database
+from .core import get_current_user_async
+from ..realtime.fanout import Fanout, PeriodicBroadcaster, Subscriber
+from ..realtime.hub import TOPIC_KINDS, hub, topic
+from ..realtime.listener import PgListener
 
 router = APIRouter(
     tags=["WebSocket"]
 )
 
-# Active connections
-connections: List[WebSocket] = []
+def allowed_topics(principal):
+    """Topics a client may subscribe to: its own employee/role topics, any delivery or order."""
+    own = set()
+    if principal is not None:
+        if principal.get("employee_id") is not None:
+            own.add(topic("employee", principal["employee_id"]))
+        if principal.get("role_id") is not None:
+            own.add(topic("role", principal["role_id"]))
+    return own
+
+async def resolve_ws_principal(token):
+    if not token:
+        return None
+    async with async_database.connection() as conn:
+        return await get_current_user_async(token, conn)
 
 @router.websocket("/ws/notifications")
-async def websocket_notifications(ws: WebSocket):
+async def websocket_notifications(ws: WebSocket, token: Optional[str] = None):
+    """
+    Topic subscriptions. With ?token=<jwt> the socket is subscribed to its own
+    employee:<id> and role:<id> topics; clients may also send
+    {"action": "subscribe" | "unsubscribe", "topic": "delivery:<id>" | "order:<id>"}.
+    """
+    try:
+        principal = await resolve_ws_principal(token)
+    except HTTPException:
+        await ws.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    except Exception as e:
+        print(f"Notification socket auth failed: {e}")
+        await ws.close(code=status.WS_1011_INTERNAL_ERROR)
+        return
+
     await ws.accept()
-    connections.append(ws)
+    own = allowed_topics(principal)
+    subscriber = Subscriber(ws)
+    for name in own:
+        hub.subscribe(subscriber, name)
+
+    async def on_message(text: str):
+        try:
+            request = json.loads(text)
+            action, name = request.get("action"), str(request.get("topic", ""))
+        except (ValueError, AttributeError):
+            return
+        kind, _, key = name.partition(":")
+        if kind not in TOPIC_KINDS or not key:
+            return
+        if kind in ("employee", "role") and name not in own:
+            return
+        if action == "subscribe":
+            hub.subscribe(subscriber, name)
+        elif action == "unsubscribe":
+            hub.unsubscribe(subscriber, name)
+        else:
+            return
+        subscriber.offer(json.dumps({"type": action + "d", "topic": name}))
+
     try:
-        while True:
-            await ws.receive_text() # Keep connection open
-    except:
-        connections.remove(ws)
+        await subscriber.serve(on_message)
+    finally:
+        hub.remove(subscriber)
+
+LIVE_METRICS_INTERVAL = float(os.getenv("LIVE_METRICS_INTERVAL", "5"))
+
+async def collect_live_metrics():
+    """Compute the dashboard metrics once for every /ws/live-metrics subscriber."""
+    async with async_database.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT
+                    (SELECT COALESCE(SUM(allocated_space) / SUM(total_capacity), 0)
+                     FROM train_schedule ts
+                     JOIN train_trip tt ON ts.train_trip_id = tt.train_trip_id
+                         AND ts.train_departure_date_time = tt.departure_date_time
+                     WHERE ts.status = 'Allocated') AS train_utilization,
+                    (SELECT COUNT(*) FROM delivery
+                     WHERE status IN ('Pending', 'In Transit')) AS active_deliveries,
+                    (SELECT COUNT(*) FROM "order"
+                     WHERE status = 'Pending') AS pending_orders
+            """)
+            row = await cursor.fetchone()
+        finally:
+            await cursor.close()
+
+    return {
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "metrics": {
+            "train_utilization": float(row["train_utilization"] or 0),
+            "active_deliveries": row["active_deliveries"] or 0,
+            "pending_orders": row["pending_orders"] or 0
+        }
+    }
+
+# One producer per process, shared by every live-metrics socket; started in the app lifespan
+live_metrics = PeriodicBroadcaster(collect_live_metrics, LIVE_METRICS_INTERVAL)
 
 @router.websocket("/ws/live-metrics")
 async def websocket_live_metrics(ws: WebSocket):
     await ws.accept()
+    subscriber = live_metrics.subscribe(ws)
     try:
-        while True:
-            # Get real-time metrics from database
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            try:
-                # Get train utilization
-                cursor.execute("""
-                    SELECT 
-                        COALESCE(SUM(allocated_space) / SUM(total_capacity), 0) as utilization
-                    FROM train_schedule ts
-                    JOIN train_trip tt ON ts.train_trip_id = tt.train_trip_id 
-                        AND ts.train_departure_date_time = tt.departure_date_time
-                    WHERE ts.status = 'Allocated'
-                """)
-                train_util = cursor.fetchone()[0] or 0
-                
-                # Get active deliveries count
-                cursor.execute("""
-                    SELECT COUNT(*) FROM delivery 
-                    WHERE status IN ('Pending', 'In Transit')
-                """)
-                active_deliveries = cursor.fetchone()[0] or 0
-                
-                # Get pending orders count
-                cursor.execute("""
-                    SELECT COUNT(*) FROM "order" 
-                    WHERE status = 'Pending'
-                """)
-                pending_orders = cursor.fetchone()[0] or 0
-                
-                await ws.send_json({
-                    "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-                    "metrics": {
-                        "train_utilization": float(train_util),
-                        "active_deliveries": active_deliveries,
-                        "pending_orders": pending_orders
-                    }
-                })
-                
-            finally:
-                cursor.close()
-                conn.close()
-                
-            await asyncio.sleep(5)
-    except:
-        pass
+        await subscriber.serve()
+    finally:
+        live_metrics.unsubscribe(subscriber)
+
+# Statuses shown in the order feed, both in the snapshot and in pushed deltas
+ORDER_FEED_STATUSES = ('Scheduled', 'In Transit', 'Delivered')
+
+order_feed = Fanout()
+
+def on_order_notify(payload: str):
+    """Relay one order_updates NOTIFY (see migrations/001_order_status_notify.sql) to subscribers."""
+    change = json.loads(payload)
+    if change.get("status") not in ORDER_FEED_STATUSES:
+        return
+    order_feed.publish({
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "type": "order_update",
+        "data": change
+    })
+
+# Single LISTEN connection per process; started in the app lifespan
+order_listener = PgListener("order_updates", on_order_notify)
+
+async def order_feed_snapshot():
+    async with async_database.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT o.order_id, o.status, o.schedule_date, c.name as customer_name
+                FROM "order" o
+                JOIN customer c ON o.customer_id = c.customer_id
+                WHERE o.status = ANY(%s)
+                ORDER BY o.order_date DESC
+                LIMIT 10
+            """, (list(ORDER_FEED_STATUSES),))
+            recent_orders = await cursor.fetchall()
+        finally:
+            await cursor.close()
+
+    return {
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "type": "order_updates",
+        "data": [
+            {
+                "order_id": row["order_id"],
+                "status": row["status"],
+                "schedule_date": row["schedule_date"].isoformat() if row["schedule_date"] else None,
+                "customer_name": row["customer_name"]
+            }
+            for row in recent_orders
+        ]
+    }
 
 @router.websocket("/ws/order-updates")
 async def websocket_order_updates(ws: WebSocket):
+    """Send a snapshot of recent orders on connect, then push each status change as it happens."""
     await ws.accept()
+    # Subscribe before taking the snapshot so no change between the two is lost
+    subscriber = order_feed.subscribe(ws)
     try:
-        while True:
-            # Send order status updates
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            try:
-                cursor.execute("""
-                    SELECT o.order_id, o.status, o.schedule_date, c.name as customer_name
-                    FROM "order" o
-                    JOIN customer c ON o.customer_id = c.customer_id
-                    WHERE o.status IN ('Scheduled', 'In Transit', 'Delivered')
-                    ORDER BY o.order_date DESC
-                    LIMIT 10
-                """)
-                recent_orders = cursor.fetchall()
-                
-                await ws.send_json({
-                    "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-                    "type": "order_updates",
-                    "data": [
-                        {
-                            "order_id": row[0],
-                            "status": row[1],
-                            "schedule_date": row[2].isoformat() if row[2] else None,
-                            "customer_name": row[3]
-                        }
-                        for row in recent_orders
-                    ]
-                })
-                
-            finally:
-                cursor.close()
-                conn.close()
-                
-            await asyncio.sleep(10)
-    except:
+        await ws.send_json(await order_feed_snapshot())
+        await subscriber.serve()
+    except Exception:
         pass
+    finally:
+        order_feed.unsubscribe(subscriber)
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a per-entry time-to-live.
+
+    Holds at most `maxsize` entries; the least recently used one is evicted first.
+    Entries older than `ttl` seconds are treated as missing.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def discard_where(self, predicate):
+        """Drop every entry whose value matches `predicate`. Returns the number removed."""
+        with self._lock:
+            stale = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in stale:
+                del self._data[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+class TaggedCache:
+    """
+    Thread-safe LRU cache of computed values with tag invalidation and stale-while-revalidate.
+
+    An entry is fresh for `ttl` seconds. For `stale_ttl` seconds after that it is still
+    served while one background refresh recomputes it. invalidate(tag) drops every entry
+    carrying the tag, and results of computations that were already running when it was
+    called are returned to their caller but not stored.
+    """
+
+    def __init__(self, maxsize, ttl, stale_ttl=0, refresh_workers=2):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.refresh_workers = refresh_workers
+        self._data = OrderedDict()  # key -> (stored_at, value, tags)
+        self._versions = {}  # tag -> number of invalidations
+        self._computing = {}  # key -> lock held while one caller computes it
+        self._refreshing = set()
+        self._executor = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.refresh_errors = 0
+
+    def fetch(self, key, tags, compute):
+        """The cached value for `key`, calling `compute()` on a miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry[0]
+                if age < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                if age < self.ttl + self.stale_ttl:
+                    self._data.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._refresh_pool().submit(self._refresh, key, tags, compute)
+                    return entry[1]
+                del self._data[key]
+            self.misses += 1
+            key_lock = self._computing.setdefault(key, threading.Lock())
+
+        # Concurrent misses for one key wait for a single computation
+        with key_lock:
+            with self._lock:
+                entry = self._data.get(key)
+                if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                    return entry[1]
+            try:
+                return self._compute(key, tags, compute)
+            finally:
+                with self._lock:
+                    self._computing.pop(key, None)
+
+    def _compute(self, key, tags, compute):
+        with self._lock:
+            versions = [self._versions.get(tag, 0) for tag in tags]
+        value = compute()
+        with self._lock:
+            if versions == [self._versions.get(tag, 0) for tag in tags]:
+                self._data[key] = (time.monotonic(), value, tuple(tags))
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return value
+
+    def _refresh(self, key, tags, compute):
+        try:
+            self._compute(key, tags, compute)
+        except Exception as e:
+            print(f"Cache refresh failed for {key}: {e}")
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh_pool(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.refresh_workers, thread_name_prefix="cache-refresh")
+        return self._executor
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of `tags`. Returns the number removed."""
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+            stale = [key for key, (_, _, entry_tags) in self._data.items() if set(entry_tags) & set(tags)]
+            for key in stale:
+                del self._data[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl, "stale_ttl": self.stale_ttl,
+                "hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses,
+                "invalidations": self.invalidations, "refresh_errors": self.refresh_errors,
+            }
@@ -0,0 +1,85 @@
+import os
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from . import database
+
+load_dotenv()
+
+ASYNC_POOL_MIN_SIZE = int(os.getenv("DB_ASYNC_POOL_MIN", "1"))
+ASYNC_POOL_MAX_SIZE = int(os.getenv("DB_ASYNC_POOL_MAX", "20"))
+
+_pool = None
+
+
+async def init_pool():
+    """
+    Create and open the process-wide async pool (psycopg 3). Called from the app lifespan.
+
+    Connections use dict rows, so handlers ported from the psycopg2 RealDictCursor code keep
+    the same row shape and `%s` placeholders.
+    """
+    global _pool
+    if _pool is None:
+        pool = AsyncConnectionPool(
+            database.conninfo(),
+            min_size=ASYNC_POOL_MIN_SIZE,
+            max_size=ASYNC_POOL_MAX_SIZE,
+            timeout=database.POOL_TIMEOUT,
+            kwargs={"row_factory": dict_row},
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+        # Don't block startup on the database; the first checkout waits instead
+        await pool.open(wait=False)
+        _pool = pool
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.close()
+
+
+async def get_pool():
+    return _pool or await init_pool()
+
+
+@asynccontextmanager
+async def connection():
+    """Async pooled connection: commits on success, rolls back on error."""
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
+async def get_async_db():
+    """
+    Async counterpart of database.get_db for `async def` routes.
+
+    Yields one connection per request, shared with get_current_user_async, and commits
+    once after the handler returns (rolls back if it raised).
+    """
+    pool = await get_pool()
+    try:
+        conn = await pool.getconn()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Database connection error: {e}")
+    try:
+        yield conn
+        await conn.commit()
+    except BaseException:
+        if not conn.closed:
+            await conn.rollback()
+        raise
+    finally:
+        await pool.putconn(conn)
+
+
+def pool_stats():
+    return _pool.get_stats() if _pool is not None else None
@@ -1,27 +1,36 @@
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import psycopg2
+from fastapi import HTTPException, status
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
 
 load_dotenv()
 
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX", "10"))
+# Seconds a request waits for a free connection before giving up.
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections idle for longer than this many seconds are pinged before being handed out.
+POOL_HEALTH_CHECK_IDLE = float(os.getenv("DB_POOL_HEALTH_CHECK_IDLE", "30"))
 
-def get_db_connection():
+
+def conninfo():
     """
-    Return a new psycopg2 connection.
+    Return the libpq connection string for the app database.
 
     Priority:
     1. Use DATABASE_URL (recommended for deployments).
     2. Fall back to individual env vars: DB_HOST, DB_NAME, DB_USER, DB_PASS (or DB_PASSWORD), DB_PORT.
 
-    Raises a RuntimeError with actionable instructions when required env vars are missing or connection fails.
+    Raises a RuntimeError with actionable instructions when required env vars are missing.
     """
     database_url = os.getenv("DATABASE_URL")
     if database_url:
-        try:
-            return psycopg2.connect(database_url, cursor_factory=RealDictCursor)
-        except Exception as e:
-            raise RuntimeError(f"Failed to connect using DATABASE_URL: {e}")
+        return database_url
 
     host = os.getenv("DB_HOST")
     dbname = os.getenv("DB_NAME")
@@ -49,14 +58,300 @@ def get_db_connection():
             + ". Set DATABASE_URL or provide DB_HOST, DB_NAME, DB_USER, DB_PASS (or DB_PASSWORD), DB_PORT."
         )
 
+    return extensions.make_dsn(host=host, dbname=dbname, user=user, password=password, port=int(port))
+
+
+def _connect():
+    """Open a new psycopg2 connection. Raises a RuntimeError when the connection fails."""
+    dsn = conninfo()
     try:
-        return psycopg2.connect(
-            host=host,
-            database=dbname,
-            user=user,
-            password=password,
-            port=int(port),
-            cursor_factory=RealDictCursor,
-        )
+        return psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+    except Exception as e:
+        source = "DATABASE_URL" if os.getenv("DATABASE_URL") else "DB_* settings"
+        raise RuntimeError(f"Failed to connect using {source}: {e}")
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no connection becomes free within the pool timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of psycopg2 connections.
+
+    Callers block (up to `timeout` seconds) when all `max_size` connections are checked out.
+    Connections that sat idle longer than POOL_HEALTH_CHECK_IDLE are pinged on checkout and
+    transparently replaced when the server has dropped them.
+    """
+
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT, connect=_connect):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool sizing: min={min_size}, max={max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._connect = connect
+        self._cond = threading.Condition()
+        self._idle = []  # stack of (connection, returned_at)
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def open(self):
+        """Pre-open `min_size` connections. Failures are reported but not fatal."""
+        for _ in range(self.min_size - self._size):
+            try:
+                conn = self._connect()
+            except Exception as e:
+                print(f"Database pool warm-up failed: {e}")
+                return
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        conn = None
+        returned_at = None
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Database pool is closed")
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        # Reserve a slot; the actual connect happens outside the lock.
+                        self._size += 1
+                        break
+                    remaining = timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"Timed out after {timeout:.1f}s waiting for a database connection "
+                            f"(pool max_size={self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif not self._is_healthy(conn, returned_at):
+                self._discard(conn)
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def putconn(self, conn):
+        healthy = not conn.closed
+        if healthy:
+            try:
+                # Never hand out a connection with a half-finished transaction
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+                self._discarded += 1
+                self._close_quietly(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Check out a connection, commit on success, roll back on error, always return it."""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "checkout_latency_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "checkout_latency_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < POOL_HEALTH_CHECK_IDLE:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        with self._cond:
+            self._discarded += 1
+        self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """
+    Connection handed out by get_db_connection().
+
+    Behaves like a psycopg2 connection, except that close() returns it to the pool
+    (rolling back anything left uncommitted) instead of tearing down the socket.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.putconn(conn)
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def __del__(self):
+        # Safety net for call sites that forget to close
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool():
+    """Create and warm the process-wide pool. Called from the app lifespan."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+            _pool.open()
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def get_pool():
+    # Lazily created so scripts that never run the app lifespan still work
+    return _pool or init_pool()
+
+
+def get_db_connection():
+    """
+    Return a pooled psycopg2 connection.
+
+    Calling close() on it returns it to the process-wide pool.
+    """
+    pool = get_pool()
+    return PooledConnection(pool, pool.getconn())
+
+
+@contextmanager
+def connection():
+    """Context-managed pooled connection: commits on success, rolls back on error."""
+    with get_pool().connection() as conn:
+        yield conn
+
+
+def get_db():
+    """
+    FastAPI dependency yielding one pooled connection per request.
+
+    FastAPI caches dependencies per request, so get_current_user and the route handler
+    share this connection. The transaction is committed once after the handler returns,
+    or rolled back if it raised.
+    """
+    pool = get_pool()
+    try:
+        conn = pool.getconn()
     except Exception as e:
-        raise RuntimeError(f"Failed to connect to Postgres: {e}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Database connection error: {e}")
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def pool_stats():
+    return _pool.stats() if _pool is not None else None
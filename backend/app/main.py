@@ -1,8 +1,49 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .api import logistics, core, websockets
+from .db import database, async_database
+from .api.etags import catalog_versions
+from .api.report_cache import report_cache
+from .Authenticaton.auth import principal_cache
+from .realtime.hub import hub
+from .services.capacity_index import trip_capacity
+from .services.report_views import report_views
+from .services.roster import roster
 
-app = FastAPI(title="Kandypack Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared Postgres pool once per process instead of connecting per request
+    database.init_pool()
+    try:
+        await async_database.init_pool()
+    except Exception as e:
+        print(f"Async database pool unavailable: {e}")
+    # Binds the hub to this loop (so threadpool handlers can publish) and starts its broker
+    await hub.start()
+    websockets.live_metrics.start()
+    websockets.order_listener.start()
+    trip_capacity.start()
+    roster.start()
+    report_views.start()
+    catalog_versions.start()
+    try:
+        yield
+    finally:
+        await catalog_versions.stop()
+        await report_views.stop()
+        await roster.stop()
+        await trip_capacity.stop()
+        await websockets.order_listener.stop()
+        websockets.order_feed.close_all()
+        await hub.stop()
+        await websockets.live_metrics.stop()
+        await async_database.close_pool()
+        database.close_pool()
+
+
+app = FastAPI(title="Kandypack Backend", lifespan=lifespan)
 
 # Enable CORS for local frontend during development. Adjust origins for production.
 app.add_middleware(
@@ -42,3 +83,15 @@ def root():
 @app.get("/healthz", tags=["Health"]) 
 def healthz():
     return {"status": "ok"}
+
+@app.get("/healthz/ws", tags=["Health"])
+def healthz_ws():
+    return {"status": "ok", "hub": hub.stats()}
+
+@app.get("/healthz/cache", tags=["Health"])
+def healthz_cache():
+    return {"status": "ok", "reports": report_cache.stats(), "principals": principal_cache.stats()}
+
+@app.get("/healthz/db", tags=["Health"])
+def healthz_db():
+    return {"status": "ok", "pool": database.pool_stats(), "async_pool": async_database.pool_stats()}
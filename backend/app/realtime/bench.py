@@ -0,0 +1,111 @@
+"""
+Throughput benchmark for WebSocket event fan-out.
+
+Drives the real Hub/Subscriber code with in-process fake sockets, so it measures the
+publish -> queue -> send path without network overhead:
+
+    python -m app.realtime.bench --sockets 1000 10000
+    python -m app.realtime.bench --sockets 1000 --broker postgres   # needs the database
+
+Two scenarios per socket count:
+  broadcast  every socket subscribes to one topic (e.g. role:<id>)
+  per-topic  each socket has its own topic (e.g. employee:<id>); events round-robin
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from .fanout import Subscriber
+from .hub import Hub
+
+
+class FakeSocket:
+    """Stands in for a WebSocket: records receive times, never sends anything back."""
+
+    def __init__(self, expected: int, done: asyncio.Event, counter: list):
+        self.expected = expected
+        self.done = done
+        self.counter = counter
+        self.received = 0
+        self.latencies = []
+
+    async def send_text(self, message: str):
+        self.received += 1
+        self.latencies.append(time.perf_counter() - json.loads(message)["data"]["t"])
+        self.counter[0] += 1
+        if self.counter[0] >= self.expected:
+            self.done.set()
+
+    async def receive_text(self):
+        await asyncio.Event().wait()
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run_scenario(backend: str, sockets: int, events: int, per_topic: bool):
+    hub = Hub(backend)
+    await hub.start()
+    expected = events if per_topic else events * sockets
+    done, counter = asyncio.Event(), [0]
+
+    fakes, tasks = [], []
+    for i in range(sockets):
+        ws = FakeSocket(expected, done, counter)
+        subscriber = Subscriber(ws, maxsize=max(32, events))
+        hub.subscribe(subscriber, f"employee:{i}" if per_topic else "role:1")
+        fakes.append(ws)
+        tasks.append(asyncio.create_task(subscriber.serve()))
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    publish_elapsed = 0.0
+    for n in range(events):
+        name = f"employee:{n % sockets}" if per_topic else "role:1"
+        t = time.perf_counter()
+        hub.publish(name, "bench", {"n": n, "t": t})
+        publish_elapsed += time.perf_counter() - t
+        if n % 100 == 0:
+            await asyncio.sleep(0)  # let senders drain, as a live server would
+
+    try:
+        await asyncio.wait_for(done.wait(), timeout=120)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(l for ws in fakes for l in ws.latencies)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await hub.stop()
+
+    return {
+        "scenario": "per-topic" if per_topic else "broadcast",
+        "sockets": sockets,
+        "events": events,
+        "deliveries": counter[0],
+        "publish_per_s": round(events / publish_elapsed) if publish_elapsed else None,
+        "deliveries_per_s": round(counter[0] / elapsed) if elapsed else None,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2) if latencies else None,
+        "dropped": hub.dropped,
+    }
+
+
+async def main(args):
+    for sockets in args.sockets:
+        for per_topic in (False, True):
+            events = args.events if per_topic else max(1, args.events // sockets * 10)
+            result = await run_scenario(args.broker, sockets, events, per_topic)
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sockets", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--broker", default="memory", choices=["memory", "postgres"])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+import uuid
+
+import psycopg
+
+from ..cache import TTLCache
+from ..db import database
+from .listener import PgListener
+
+# "memory" delivers only within this process; "postgres" relays through NOTIFY so every
+# worker/replica delivers to its own sockets.
+WS_BROKER = os.getenv("WS_BROKER", "memory").lower()
+
+BROKER_CHANNEL = os.getenv("WS_BROKER_CHANNEL", "ws_events")
+
+# Outgoing events buffered while the NOTIFY connection is busy or reconnecting
+BROKER_QUEUE_SIZE = int(os.getenv("WS_BROKER_QUEUE_SIZE", "10000"))
+
+# Events sent per round trip to Postgres
+BROKER_BATCH_SIZE = int(os.getenv("WS_BROKER_BATCH_SIZE", "200"))
+
+# NOTIFY payloads must stay under 8000 bytes; larger events are delivered locally only
+NOTIFY_MAX_PAYLOAD = 7900
+
+
+class InMemoryBroker:
+    """Single-process broker: publishing is local delivery."""
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def publish(self, name: str, message: str):
+        self.deliver(name, message)
+
+    def stats(self):
+        return {"backend": "memory"}
+
+
+class PostgresBroker:
+    """
+    Cross-process broker over LISTEN/NOTIFY.
+
+    Events are delivered to local sockets immediately and queued for one writer task
+    that NOTIFYs them in batches on a dedicated connection. Every process LISTENs on
+    the same channel and delivers events whose origin is another process.
+
+    Ordering: each process numbers its events per topic and sends them over a single
+    connection, and Postgres delivers notifications from one session in order, so a
+    topic's events from any one publisher arrive in publish order everywhere. The
+    receiver checks the sequence numbers and counts gaps (events lost while a
+    connection was down) rather than reordering.
+    """
+
+    def __init__(self, deliver, channel: str = BROKER_CHANNEL):
+        self.deliver = deliver
+        self.channel = channel
+        self.origin = uuid.uuid4().hex[:12]
+        self.listener = PgListener(channel, self._on_notify)
+        self._queue = asyncio.Queue(BROKER_QUEUE_SIZE)
+        self._seq = {}
+        self._last_seen = TTLCache(maxsize=50000, ttl=600)  # (origin, topic) -> seq
+        self._task = None
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self.oversized = 0
+        self.gaps = 0
+
+    async def start(self):
+        self.listener.start()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_writer())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.listener.stop()
+
+    def publish(self, name: str, message: str):
+        self.deliver(name, message)
+
+        seq = self._seq.get(name, 0) + 1
+        self._seq[name] = seq
+        payload = json.dumps({"o": self.origin, "t": name, "s": seq, "m": message})
+        if len(payload.encode()) > NOTIFY_MAX_PAYLOAD:
+            self.oversized += 1
+            return
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _on_notify(self, payload: str):
+        event = json.loads(payload)
+        if event["o"] == self.origin:
+            return
+        self.received += 1
+        key = (event["o"], event["t"])
+        last = self._last_seen.get(key)
+        if last is not None and event["s"] != last + 1:
+            self.gaps += 1
+        self._last_seen.set(key, event["s"])
+        self.deliver(event["t"], event["m"])
+
+    async def _run_writer(self):
+        delay = 1.0
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(database.conninfo(), autocommit=True)
+                async with conn:
+                    delay = 1.0
+                    while True:
+                        batch = [await self._queue.get()]
+                        while len(batch) < BROKER_BATCH_SIZE and not self._queue.empty():
+                            batch.append(self._queue.get_nowait())
+                        # One statement per batch; notifications keep array order
+                        await conn.execute(
+                            "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) WITH ORDINALITY AS e(payload, n) ORDER BY n",
+                            (self.channel, batch)
+                        )
+                        self.sent += len(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Broker NOTIFY connection lost ({e}); retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def stats(self):
+        return {
+            "backend": "postgres",
+            "origin": self.origin,
+            "listening": self.listener.connected,
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+            "oversized": self.oversized,
+            "gaps": self.gaps
+        }
+
+
+BROKERS = {
+    "memory": InMemoryBroker,
+    "postgres": PostgresBroker,
+}
+
+
+def make_broker(deliver, backend: str = WS_BROKER):
+    try:
+        return BROKERS[backend](deliver)
+    except KeyError:
+        raise RuntimeError(f"Unknown WS_BROKER {backend!r}; expected one of {', '.join(BROKERS)}")
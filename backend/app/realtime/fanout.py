@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketDisconnect
+
+# Messages buffered per socket before it is considered a slow consumer and dropped.
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))
+
+# Close code sent to clients dropped for not keeping up ("try again later").
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class Subscriber:
+    """
+    One connected WebSocket with a bounded outbound queue.
+
+    Producers call offer() which never blocks; serve() drains the queue to the socket
+    until the client disconnects or the subscriber is dropped.
+    """
+
+    def __init__(self, ws: WebSocket, maxsize: int = SEND_QUEUE_SIZE):
+        self.ws = ws
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+        self._closed = asyncio.Event()
+
+    def offer(self, message: str) -> bool:
+        """Queue a pre-encoded message. Returns False (and drops the subscriber) when full."""
+        if self._closed.is_set():
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped = True
+            self._closed.set()
+            return False
+
+    def close(self):
+        self._closed.set()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed.is_set()
+
+    async def serve(self, on_message=None):
+        """
+        Pump queued messages to the socket until disconnect or drop.
+
+        `on_message`, if given, is awaited with each text frame the client sends.
+        """
+        tasks = [
+            asyncio.create_task(self._pump()),
+            asyncio.create_task(self._receive(on_message)),
+            asyncio.create_task(self._closed.wait()),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._closed.set()
+
+        if self.dropped:
+            try:
+                await self.ws.close(code=SLOW_CONSUMER_CLOSE_CODE)
+            except Exception:
+                pass
+
+    async def _pump(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                await self.ws.send_text(message)
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            # Socket went away mid-send; serve() notices this task finishing
+            return
+
+    async def _receive(self, on_message):
+        try:
+            while True:
+                text = await self.ws.receive_text()
+                if on_message is not None:
+                    await on_message(text)
+        except (WebSocketDisconnect, RuntimeError):
+            return
+
+
+class Fanout:
+    """Set of subscribers that all receive every published payload."""
+
+    def __init__(self):
+        self.subscribers = set()
+
+    def subscribe(self, ws: WebSocket) -> Subscriber:
+        subscriber = Subscriber(ws)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, payload) -> str:
+        message = json.dumps(payload, default=str)
+        for subscriber in list(self.subscribers):
+            if not subscriber.offer(message):
+                self.subscribers.discard(subscriber)
+        return message
+
+    def close_all(self):
+        for subscriber in list(self.subscribers):
+            subscriber.close()
+        self.subscribers.clear()
+
+
+class PeriodicBroadcaster(Fanout):
+    """
+    Single producer task that computes a payload once per tick and fans it out.
+
+    `collect` is an async callable returning a JSON-serialisable payload. Nothing is
+    computed while there are no subscribers. New subscribers get the latest payload
+    immediately instead of waiting for the next tick.
+    """
+
+    def __init__(self, collect, interval: float):
+        super().__init__()
+        self.collect = collect
+        self.interval = interval
+        self.latest = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self.close_all()
+
+    def subscribe(self, ws: WebSocket) -> Subscriber:
+        subscriber = super().subscribe(ws)
+        if self.latest is not None:
+            subscriber.offer(self.latest)
+        return subscriber
+
+    def publish(self, payload) -> str:
+        self.latest = super().publish(payload)
+        return self.latest
+
+    async def _run(self):
+        while True:
+            if self.subscribers:
+                try:
+                    self.publish(await self.collect())
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Broadcast collection failed: {e}")
+            await asyncio.sleep(self.interval)
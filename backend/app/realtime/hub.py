@@ -0,0 +1,124 @@
+import asyncio
+import datetime
+import json
+from collections import defaultdict
+
+from .brokers import WS_BROKER, make_broker
+from .fanout import Subscriber
+
+# Topic prefixes clients may subscribe to
+TOPIC_KINDS = ("employee", "role", "delivery", "order")
+
+
+def topic(kind: str, key) -> str:
+    return f"{kind}:{key}"
+
+
+class Hub:
+    """
+    Topic-based pub/sub for WebSocket subscribers.
+
+    publish() never blocks: each subscriber has a bounded queue and is dropped when it
+    falls behind. It is safe to call from sync handlers running in the threadpool; the
+    delivery is then scheduled onto the event loop the hub was bound to at startup.
+
+    Events go through a broker (see brokers.py) so that with the postgres backend an
+    event published in one worker reaches sockets connected to every worker.
+    """
+
+    def __init__(self, backend: str = WS_BROKER):
+        self.topics = defaultdict(set)
+        self._subscriptions = defaultdict(set)  # subscriber -> topics
+        self._loop = None
+        self.broker = make_broker(self.deliver, backend)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    async def start(self):
+        """Bind to the running loop and start the broker."""
+        self.bind(asyncio.get_running_loop())
+        await self.broker.start()
+
+    async def stop(self):
+        await self.broker.stop()
+        self.close_all()
+
+    def subscribe(self, subscriber: Subscriber, name: str):
+        self.topics[name].add(subscriber)
+        self._subscriptions[subscriber].add(name)
+
+    def unsubscribe(self, subscriber: Subscriber, name: str):
+        subscribers = self.topics.get(name)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.topics[name]
+        self._subscriptions[subscriber].discard(name)
+
+    def remove(self, subscriber: Subscriber):
+        for name in list(self._subscriptions.pop(subscriber, ())):
+            subscribers = self.topics.get(name)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.topics[name]
+
+    def subscriptions(self, subscriber: Subscriber):
+        return set(self._subscriptions.get(subscriber, ()))
+
+    def publish(self, name: str, event_type: str, data: dict):
+        message = json.dumps({
+            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+            "topic": name,
+            "type": event_type,
+            "data": data
+        }, default=str)
+        self.publish_encoded(name, message)
+
+    def publish_encoded(self, name: str, message: str):
+        if self._loop is None or self._on_loop_thread():
+            self._dispatch(name, message)
+        else:
+            self._loop.call_soon_threadsafe(self._dispatch, name, message)
+
+    def _dispatch(self, name: str, message: str):
+        self.published += 1
+        self.broker.publish(name, message)
+
+    def deliver(self, name: str, message: str):
+        """Hand an encoded message to this process's subscribers of `name`."""
+        for subscriber in list(self.topics.get(name, ())):
+            if subscriber.offer(message):
+                self.delivered += 1
+            else:
+                self.dropped += 1
+                self.remove(subscriber)
+
+    def close_all(self):
+        for subscriber in list(self._subscriptions):
+            subscriber.close()
+        self.topics.clear()
+        self._subscriptions.clear()
+
+    def stats(self):
+        return {
+            "topics": len(self.topics),
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "broker": self.broker.stats()
+        }
+
+    def _on_loop_thread(self):
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+
+hub = Hub()
@@ -0,0 +1,61 @@
+import asyncio
+
+import psycopg
+
+from ..db import database
+
+# Reconnect backoff bounds (seconds) when the LISTEN connection drops.
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+
+
+class PgListener:
+    """
+    One dedicated autocommit connection LISTENing on a Postgres channel.
+
+    `handler` is called with each notification payload (a str) on the event loop.
+    The connection is re-established with exponential backoff if it drops;
+    `on_connect`, if given, is awaited after every (re)connect so callers can resync.
+    """
+
+    def __init__(self, channel: str, handler, on_connect=None):
+        self.channel = channel
+        self.handler = handler
+        self.on_connect = on_connect
+        self.connected = False
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(database.conninfo(), autocommit=True)
+                async with conn:
+                    await conn.execute(f"LISTEN {self.channel};")
+                    self.connected = True
+                    delay = RECONNECT_MIN_DELAY
+                    if self.on_connect is not None:
+                        await self.on_connect()
+                    async for notify in conn.notifies():
+                        try:
+                            self.handler(notify.payload)
+                        except Exception as e:
+                            print(f"LISTEN {self.channel}: handler failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"LISTEN {self.channel}: connection lost ({e}); retrying in {delay:.0f}s")
+            finally:
+                self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import date, datetime
 from typing import List, Optional
 from enum import Enum
@@ -106,7 +106,7 @@ class Order(BaseModel):
 
 class Item(BaseModel):
     productID: int
-    quantity: int
+    quantity: int = Field(gt=0)
 
 class CreateOrder(BaseModel):
     scheduleDate: date
@@ -138,6 +138,24 @@ class AllocateTrainResponse(BaseModel):
     success: bool
     message: str
 
+class SimulatedTrip(BaseModel):
+    departure_city: str
+    arrival_city: str
+    departure_date_time: datetime
+    arrival_date_time: datetime
+    total_capacity: float = Field(gt=0)
+
+class CapacityChange(BaseModel):
+    train_trip_id: int
+    departure_date_time: Optional[datetime] = None
+    available_capacity: float = Field(ge=0)
+
+class AllocationSimulation(BaseModel):
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+    extra_trips: List[SimulatedTrip] = []
+    capacity_changes: List[CapacityChange] = []
+
 # Additional schemas for DDL tables
 class EmployeeType(BaseModel):
     employee_type_id: int
@@ -0,0 +1,168 @@
+import os
+from datetime import date, datetime, timedelta
+
+from .capacity_index import TripCapacityIndex
+
+# Default look-ahead for batch allocation: Pending orders due within this many days
+ALLOCATION_WINDOW_DAYS = int(os.getenv("ALLOCATION_WINDOW_DAYS", "14"))
+
+# Train space is compared in integer thousandths of a unit, so capacity sums are exact
+SPACE_SCALE = 1000
+
+# Pending orders in the window with the train space they need. SKIP LOCKED keeps two
+# concurrent batch runs (or a single allocate-train call) from claiming the same order.
+_PENDING_ORDERS = """
+    SELECT o.order_id, o.schedule_date, o.order_date, c.city,
+           COALESCE(SUM(oi.quantity * p.train_space_per_unit), 0) AS required_space
+    FROM "order" o
+    JOIN customer c ON c.customer_id = o.customer_id
+    LEFT JOIN order_item oi ON oi.order_id = o.order_id
+    LEFT JOIN product p ON p.product_id = oi.product_id
+    WHERE o.status = 'Pending'
+      AND o.schedule_date BETWEEN %s AND %s
+      AND o.order_id IN (
+          SELECT order_id FROM "order"
+          WHERE status = 'Pending' AND schedule_date BETWEEN %s AND %s
+          FOR UPDATE SKIP LOCKED
+      )
+      AND NOT EXISTS (SELECT 1 FROM train_schedule ts WHERE ts.order_id = o.order_id)
+    GROUP BY o.order_id, o.schedule_date, o.order_date, c.city;
+"""
+
+_UPCOMING_TRIPS = """
+    SELECT train_trip_id, departure_city, arrival_city, departure_date_time, arrival_date_time,
+           total_capacity, available_capacity
+    FROM train_trip
+    WHERE departure_date_time >= %s
+      AND departure_date_time < %s
+      AND available_capacity > 0
+    ORDER BY departure_date_time
+    FOR UPDATE;
+"""
+
+_INSERT_SCHEDULES = """
+    INSERT INTO train_schedule (train_trip_id, train_departure_date_time, order_id, allocated_space, status)
+    SELECT a.train_trip_id, a.departure_date_time, a.order_id, a.allocated_space, 'Allocated'
+    FROM unnest(%s::int[], %s::timestamp[], %s::int[], %s::numeric[])
+        AS a(train_trip_id, departure_date_time, order_id, allocated_space);
+"""
+
+_CONSUME_CAPACITY = """
+    UPDATE train_trip t
+    SET available_capacity = t.available_capacity - a.space
+    FROM (
+        SELECT train_trip_id, departure_date_time, SUM(allocated_space) AS space
+        FROM unnest(%s::int[], %s::timestamp[], %s::numeric[])
+            AS u(train_trip_id, departure_date_time, allocated_space)
+        GROUP BY train_trip_id, departure_date_time
+    ) a
+    WHERE t.train_trip_id = a.train_trip_id
+      AND t.departure_date_time = a.departure_date_time
+      AND t.available_capacity >= a.space;
+"""
+
+_MARK_SCHEDULED = """UPDATE "order" SET status = 'Scheduled' WHERE order_id = ANY(%s::int[]);"""
+
+
+def space_units(space) -> int:
+    return round(float(space) * SPACE_SCALE)
+
+
+def arrival_deadline(schedule_date) -> datetime:
+    """Goods must arrive by the end of the day before the scheduled delivery date."""
+    return datetime.combine(schedule_date, datetime.min.time())
+
+
+def plan_allocation(orders, trips, now: datetime = None):
+    """
+    Assign orders to train trips in one pass.
+
+    Orders are taken earliest deadline first (schedule_date, then order_date); each goes
+    whole onto the earliest-departing trip to the customer's city that arrives before its
+    deadline and still has room (first fit). The result depends only on the inputs, not
+    on the order in which orders were created or requested. Each lookup is O(log n) in
+    the number of trips via a TripCapacityIndex over `trips`.
+
+    `orders` are dicts with order_id, schedule_date, order_date, city, required_space;
+    `trips` are train_trip rows. Returns (assignments, unallocated).
+    """
+    index = TripCapacityIndex().load(
+        dict(trip, available_capacity=space_units(trip["available_capacity"]), total_capacity=None)
+        for trip in trips
+    )
+
+    assignments, unallocated = [], []
+    for order in sorted(orders, key=lambda o: (o["schedule_date"], o["order_date"] or date.min, o["order_id"])):
+        space = float(order["required_space"])
+        if space <= 0:
+            unallocated.append({"order_id": order["order_id"], "reason": "Order has no items"})
+            continue
+
+        deadline = arrival_deadline(order["schedule_date"])
+        units = space_units(space)
+        chosen = index.first_fit_to_city(order["city"], units, now, deadline)
+
+        if chosen is None:
+            reason = "No trip to this city arrives before the schedule date" if index.first_fit_to_city(
+                order["city"], 0, now, deadline
+            ) is None else "No trip with enough remaining capacity before the schedule date"
+            unallocated.append({"order_id": order["order_id"], "reason": reason})
+            continue
+
+        index.consume(chosen["train_trip_id"], chosen["departure_date_time"], units)
+
+        assignments.append({
+            "order_id": order["order_id"],
+            "train_trip_id": chosen["train_trip_id"],
+            "departure_date_time": chosen["departure_date_time"],
+            "allocated_space": space
+        })
+
+    return assignments, unallocated
+
+
+async def allocate_batch(conn, start: date = None, end: date = None, dry_run: bool = False):
+    """
+    Allocate every Pending order with schedule_date in [start, end] to upcoming trips.
+
+    Reads orders and trips once, plans in memory, and writes all train_schedule rows,
+    capacity updates and order statuses with one statement each in the caller's
+    transaction. With dry_run nothing is written.
+    """
+    start = start or date.today()
+    end = end or start + timedelta(days=ALLOCATION_WINDOW_DAYS)
+    now = datetime.now()
+
+    cur = conn.cursor()
+    try:
+        await cur.execute(_PENDING_ORDERS, (start, end, start, end))
+        orders = await cur.fetchall()
+
+        await cur.execute(_UPCOMING_TRIPS, (now, arrival_deadline(end)))
+        trips = await cur.fetchall()
+
+        assignments, unallocated = plan_allocation(orders, trips, now)
+
+        if assignments and not dry_run:
+            trip_ids = [a["train_trip_id"] for a in assignments]
+            departures = [a["departure_date_time"] for a in assignments]
+            order_ids = [a["order_id"] for a in assignments]
+            spaces = [a["allocated_space"] for a in assignments]
+
+            await cur.execute(_INSERT_SCHEDULES, (trip_ids, departures, order_ids, spaces))
+            await cur.execute(_CONSUME_CAPACITY, (trip_ids, departures, spaces))
+            if cur.rowcount != len(set(zip(trip_ids, departures))):
+                raise RuntimeError("Train capacity changed during batch allocation")
+            await cur.execute(_MARK_SCHEDULED, (order_ids,))
+    finally:
+        await cur.close()
+
+    return {
+        "window": {"from": start, "to": end},
+        "dry_run": dry_run,
+        "orders_considered": len(orders),
+        "allocated": len(assignments),
+        "trips_used": len({(a["train_trip_id"], a["departure_date_time"]) for a in assignments}),
+        "assignments": assignments,
+        "unallocated": unallocated
+    }
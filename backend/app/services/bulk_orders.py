@@ -0,0 +1,273 @@
+import csv
+import json
+import os
+from datetime import date, datetime
+
+from fastapi import HTTPException, status
+
+# Upper bound on order lines accepted by one POST /orders/bulk request
+BULK_ORDER_MAX_LINES = int(os.getenv("BULK_ORDER_MAX_LINES", "200000"))
+
+CSV_COLUMNS = ("ref", "customer_id", "schedule_date", "product_id", "quantity")
+
+_CREATE_STAGING = """
+    CREATE TEMP TABLE bulk_order_line (
+        line_no int NOT NULL,
+        ref text NOT NULL,
+        customer_id int NOT NULL,
+        schedule_date date NOT NULL,
+        product_id int NOT NULL,
+        quantity int NOT NULL
+    ) ON COMMIT DROP;
+"""
+
+_COPY_STAGING = "COPY bulk_order_line (line_no, ref, customer_id, schedule_date, product_id, quantity) FROM STDIN"
+
+_INVALID_REFERENCES = """
+    SELECT s.ref,
+           bool_or(c.customer_id IS NULL) AS unknown_customer,
+           array_agg(DISTINCT s.product_id) FILTER (WHERE p.product_id IS NULL) AS unknown_products
+    FROM bulk_order_line s
+    LEFT JOIN customer c ON c.customer_id = s.customer_id
+    LEFT JOIN product p ON p.product_id = s.product_id
+    GROUP BY s.ref
+    HAVING bool_or(c.customer_id IS NULL) OR bool_or(p.product_id IS NULL);
+"""
+
+# Row locks keep the stock read here valid until the decrement below commits
+_LOCK_STOCK = """
+    SELECT product_id, available_units
+    FROM product
+    WHERE product_id IN (SELECT DISTINCT product_id FROM bulk_order_line)
+    ORDER BY product_id
+    FOR UPDATE;
+"""
+
+_ALLOCATE_ORDER_IDS = """
+    SELECT nextval(pg_get_serial_sequence('"order"', 'order_id')) AS order_id
+    FROM generate_series(1, %s);
+"""
+
+_INSERT_ORDERS = """
+    INSERT INTO "order" (order_id, customer_id, order_date, schedule_date, user_id)
+    SELECT a.order_id, a.customer_id, %s, a.schedule_date, %s
+    FROM unnest(%s::int[], %s::int[], %s::date[]) AS a(order_id, customer_id, schedule_date);
+"""
+
+_INSERT_ITEMS = """
+    INSERT INTO order_item (order_id, product_id, quantity)
+    SELECT a.order_id, s.product_id, SUM(s.quantity)
+    FROM bulk_order_line s
+    JOIN unnest(%s::text[], %s::int[]) AS a(ref, order_id) ON a.ref = s.ref
+    GROUP BY a.order_id, s.product_id;
+"""
+
+_DECREMENT_STOCK = """
+    UPDATE product p
+    SET available_units = p.available_units - d.quantity
+    FROM (
+        SELECT s.product_id, SUM(s.quantity) AS quantity
+        FROM bulk_order_line s
+        JOIN unnest(%s::text[]) AS a(ref) ON a.ref = s.ref
+        GROUP BY s.product_id
+    ) d
+    WHERE p.product_id = d.product_id AND p.available_units >= d.quantity;
+"""
+
+
+async def _text_lines(chunks):
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+def _schedule_date(value):
+    """ISO date string (or date) to a date; ValueError for anything else, so the row is rejected."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value.strip():
+        return date.fromisoformat(value.strip())
+    if value is None or value == "":
+        raise ValueError("schedule_date is required")
+    raise ValueError(f"schedule_date must be an ISO date string, got {type(value).__name__}")
+
+
+def _order_line(line_no, ref, customer_id, schedule_date, product_id, quantity):
+    quantity = int(quantity)
+    if quantity <= 0:
+        raise ValueError("quantity must be positive")
+    schedule_date = _schedule_date(schedule_date)
+    return (line_no, str(ref), int(customer_id), schedule_date, int(product_id), quantity)
+
+
+async def parse_ndjson(chunks):
+    """
+    One order per line:
+    {"ref": "A-1", "customer_id": 3, "scheduleDate": "2025-11-01", "items": [{"productID": 2, "quantity": 5}]}
+
+    Yields (line_no, ref, parsed_lines, error); `ref` defaults to the line number.
+    """
+    line_no = 0
+    async for text in _text_lines(chunks):
+        line_no += 1
+        if not text.strip():
+            continue
+        ref = str(line_no)
+        try:
+            row = json.loads(text)
+            ref = str(row.get("ref", line_no))
+            schedule_date = row.get("scheduleDate", row.get("schedule_date"))
+            items = row["items"]
+            if not items:
+                raise ValueError("order has no items")
+            lines = [
+                _order_line(line_no, ref, row["customer_id"], schedule_date,
+                            item.get("productID", item.get("product_id")), item["quantity"])
+                for item in items
+            ]
+            yield line_no, ref, lines, None
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            yield line_no, ref, [], f"Invalid row: {e}"
+
+
+async def parse_csv(chunks):
+    """
+    One order line per row, with a header naming the columns in CSV_COLUMNS. Rows that
+    share a `ref` form one order; without a `ref` column each row is its own order.
+    Quoted fields may not contain newlines.
+    """
+    header = None
+    line_no = 0
+    async for text in _text_lines(chunks):
+        line_no += 1
+        if not text.strip():
+            continue
+        fields = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in fields]
+            missing = set(CSV_COLUMNS) - {"ref"} - set(header)
+            if missing:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"CSV header is missing columns: {', '.join(sorted(missing))}"
+                )
+            continue
+        row = dict(zip(header, fields))
+        ref = row.get("ref") or str(line_no)
+        try:
+            line = _order_line(line_no, ref, row["customer_id"], row["schedule_date"],
+                               row["product_id"], row["quantity"])
+            yield line_no, ref, [line], None
+        except (ValueError, KeyError) as e:
+            yield line_no, ref, [], f"Invalid row: {e}"
+
+
+PARSERS = {
+    "application/x-ndjson": parse_ndjson,
+    "application/jsonl": parse_ndjson,
+    "text/csv": parse_csv,
+}
+
+
+async def ingest_orders(conn, rows, user_id: int):
+    """
+    Load parsed rows through a COPY staging table and create every valid order.
+
+    An order is all-or-nothing: any bad line, unknown customer/product or missing stock
+    rejects the whole order. Stock is granted first come, first served in input order.
+    Everything runs in the caller's transaction with a fixed number of statements.
+    """
+    orders = {}  # ref -> {"line", "customer_id", "schedule_date", "lines": {product_id: quantity}, "error"}
+    total_lines = 0
+
+    cur = conn.cursor()
+    try:
+        await cur.execute(_CREATE_STAGING)
+        async with cur.copy(_COPY_STAGING) as copy:
+            async for line_no, ref, lines, error in rows:
+                order = orders.get(ref)
+                if order is None:
+                    order = orders[ref] = {"line": line_no, "customer_id": None, "schedule_date": None,
+                                           "lines": {}, "error": None}
+                if error:
+                    order["error"] = order["error"] or f"line {line_no}: {error}"
+                    continue
+                for line in lines:
+                    total_lines += 1
+                    if total_lines > BULK_ORDER_MAX_LINES:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Bulk upload is limited to {BULK_ORDER_MAX_LINES} order lines"
+                        )
+                    _, _, customer_id, schedule_date, product_id, quantity = line
+                    if order["customer_id"] is None:
+                        order["customer_id"], order["schedule_date"] = customer_id, schedule_date
+                    elif (customer_id, schedule_date) != (order["customer_id"], order["schedule_date"]):
+                        order["error"] = order["error"] or f"line {line_no}: customer_id/schedule_date differ within order"
+                    order["lines"][product_id] = order["lines"].get(product_id, 0) + quantity
+                    await copy.write_row(line)
+
+        await cur.execute(_INVALID_REFERENCES)
+        for row in await cur.fetchall():
+            order = orders[row["ref"]]
+            if order["error"]:
+                continue
+            if row["unknown_customer"]:
+                order["error"] = f"Customer {order['customer_id']} not found"
+            else:
+                order["error"] = f"Unknown product IDs: {sorted(row['unknown_products'])}"
+
+        await cur.execute(_LOCK_STOCK)
+        stock = {row["product_id"]: row["available_units"] for row in await cur.fetchall()}
+
+        accepted = []
+        for ref, order in orders.items():
+            if order["error"]:
+                continue
+            short = [pid for pid, quantity in order["lines"].items() if stock.get(pid, 0) < quantity]
+            if short:
+                order["error"] = f"Insufficient stock for product IDs: {short}"
+                continue
+            for pid, quantity in order["lines"].items():
+                stock[pid] -= quantity
+            accepted.append(ref)
+
+        if accepted:
+            await cur.execute(_ALLOCATE_ORDER_IDS, (len(accepted),))
+            order_ids = sorted(row["order_id"] for row in await cur.fetchall())
+            for ref, order_id in zip(accepted, order_ids):
+                orders[ref]["order_id"] = order_id
+
+            await cur.execute(_INSERT_ORDERS, (
+                date.today(), user_id, order_ids,
+                [orders[ref]["customer_id"] for ref in accepted],
+                [orders[ref]["schedule_date"] for ref in accepted],
+            ))
+            await cur.execute(_INSERT_ITEMS, (accepted, order_ids))
+            await cur.execute(_DECREMENT_STOCK, (accepted,))
+            expected = len({pid for ref in accepted for pid in orders[ref]["lines"]})
+            if cur.rowcount != expected:
+                raise RuntimeError("Stock changed during bulk order ingestion")
+    finally:
+        await cur.close()
+
+    results = [
+        {"ref": ref, "line": order["line"], "status": "rejected", "error": order["error"]}
+        if order["error"] else
+        {"ref": ref, "line": order["line"], "status": "created", "order_id": order["order_id"]}
+        for ref, order in orders.items()
+    ]
+    created = sum(1 for result in results if result["status"] == "created")
+    return {
+        "created": created,
+        "rejected": len(results) - created,
+        "lines": total_lines,
+        "results": results
+    }
@@ -0,0 +1,306 @@
+import asyncio
+import bisect
+import heapq
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from ..db import async_database
+
+# Seconds between full reloads from train_trip; picks up changes made by other workers
+# and by stored procedures the API does not see.
+CAPACITY_INDEX_REFRESH = float(os.getenv("CAPACITY_INDEX_REFRESH", "60"))
+
+# Trips with less than this share of capacity left are reported as near full
+CAPACITY_WARNING_RATIO = float(os.getenv("CAPACITY_WARNING_RATIO", "0.2"))
+
+_UPCOMING_TRIPS = """
+    SELECT train_trip_id, departure_city, arrival_city, departure_date_time, arrival_date_time,
+           total_capacity, available_capacity
+    FROM train_trip
+    WHERE departure_date_time > NOW();
+"""
+
+
+def as_naive(value):
+    """Compare timestamps as naive local time whatever the column or caller supplied."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+class RouteTrips:
+    """
+    Trips on one route sorted by departure, with a max segment tree over remaining
+    capacity so "first trip in a departure range with at least X free" is O(log n).
+    Capacity updates are O(log n); adding a trip rebuilds this route's tree.
+    """
+
+    def __init__(self):
+        self.keys = []   # (departure_date_time, train_trip_id), sorted
+        self.trips = []  # parallel to keys
+        self.size = 1
+        self.tree = [float("-inf")] * 2
+
+    def rebuild(self):
+        self.size = 1
+        while self.size < len(self.trips):
+            self.size *= 2
+        self.tree = [float("-inf")] * (2 * self.size)
+        for i, trip in enumerate(self.trips):
+            self.tree[self.size + i] = trip["available_capacity"]
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def insert(self, trip):
+        key = (trip["departure_date_time"], trip["train_trip_id"])
+        pos = bisect.bisect_left(self.keys, key)
+        if pos < len(self.keys) and self.keys[pos] == key:
+            self.trips[pos] = trip
+        else:
+            self.keys.insert(pos, key)
+            self.trips.insert(pos, trip)
+        self.rebuild()
+
+    def position(self, train_trip_id, departure_date_time):
+        key = (departure_date_time, train_trip_id)
+        pos = bisect.bisect_left(self.keys, key)
+        return pos if pos < len(self.keys) and self.keys[pos] == key else None
+
+    def update(self, pos, available_capacity):
+        self.trips[pos]["available_capacity"] = available_capacity
+        node = self.size + pos
+        self.tree[node] = available_capacity
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+    def first_fit(self, units, lo=0, hi=None):
+        """Leftmost position in [lo, hi) whose remaining capacity is >= units, or None."""
+        hi = len(self.trips) if hi is None else hi
+        if lo >= hi:
+            return None
+        return self._find(1, 0, self.size, lo, hi, units)
+
+    def _find(self, node, node_lo, node_hi, lo, hi, units):
+        if node_hi <= lo or hi <= node_lo or self.tree[node] < units:
+            return None
+        if node_hi - node_lo == 1:
+            return node_lo
+        mid = (node_lo + node_hi) // 2
+        found = self._find(2 * node, node_lo, mid, lo, hi, units)
+        if found is None:
+            found = self._find(2 * node + 1, mid, node_hi, lo, hi, units)
+        return found
+
+    def bounds(self, depart_after=None, depart_before=None):
+        lo = 0 if depart_after is None else bisect.bisect_left(self.keys, (depart_after,))
+        hi = len(self.keys) if depart_before is None else bisect.bisect_left(self.keys, (depart_before,))
+        return lo, hi
+
+
+class TripCapacityIndex:
+    """
+    In-process index of upcoming train trips keyed by route (departure_city, arrival_city).
+
+    Loaded from train_trip at startup and every CAPACITY_INDEX_REFRESH seconds, and kept
+    current in between by the endpoints that create trips or consume capacity. It is a
+    read-side accelerator: writes still go through guarded SQL updates.
+    """
+
+    def __init__(self):
+        self.routes = defaultdict(RouteTrips)
+        self.routes_to = defaultdict(set)  # arrival_city -> routes
+        self.route_of = {}                 # (train_trip_id, departure_date_time) -> route
+        self.near_full_keys = set()        # (route, train_trip_id, departure_date_time)
+        self.loaded = False
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._task = None
+
+    # Maintenance
+
+    def load(self, rows):
+        """Replace the index contents with `rows` (dicts shaped like train_trip)."""
+        routes = defaultdict(RouteTrips)
+        for row in rows:
+            trip = self._trip(row)
+            route = routes[(trip["departure_city"], trip["arrival_city"])]
+            route.keys.append((trip["departure_date_time"], trip["train_trip_id"]))
+            route.trips.append(trip)
+        routes_to, route_of, near_full = defaultdict(set), {}, set()
+        for route_key, route in routes.items():
+            order = sorted(range(len(route.keys)), key=route.keys.__getitem__)
+            route.keys = [route.keys[i] for i in order]
+            route.trips = [route.trips[i] for i in order]
+            route.rebuild()
+            routes_to[route_key[1]].add(route_key)
+            for trip in route.trips:
+                route_of[(trip["train_trip_id"], trip["departure_date_time"])] = route_key
+                if self._is_near_full(trip):
+                    near_full.add((route_key, trip["train_trip_id"], trip["departure_date_time"]))
+        with self._lock:
+            self.routes, self.routes_to, self.route_of = routes, routes_to, route_of
+            self.near_full_keys = near_full
+            self.loaded, self.loaded_at = True, datetime.now()
+        return self
+
+    def add_trip(self, row):
+        trip = self._trip(row)
+        route_key = (trip["departure_city"], trip["arrival_city"])
+        with self._lock:
+            self.routes[route_key].insert(trip)
+            self.routes_to[trip["arrival_city"]].add(route_key)
+            self.route_of[(trip["train_trip_id"], trip["departure_date_time"])] = route_key
+            self._track_near_full(route_key, trip)
+
+    def set_capacity(self, train_trip_id, departure_date_time, available_capacity):
+        with self._lock:
+            found = self._locate(train_trip_id, departure_date_time)
+            if found is not None:
+                route_key, route, pos = found
+                route.update(pos, float(available_capacity))
+                self._track_near_full(route_key, route.trips[pos])
+
+    def consume(self, train_trip_id, departure_date_time, space):
+        with self._lock:
+            found = self._locate(train_trip_id, departure_date_time)
+            if found is not None:
+                route_key, route, pos = found
+                route.update(pos, route.trips[pos]["available_capacity"] - float(space))
+                self._track_near_full(route_key, route.trips[pos])
+
+    # Lookups
+
+    def first_fit(self, departure_city, arrival_city, units, depart_after=None, arrive_by=None):
+        """Earliest-departing trip on the route with at least `units` free, arriving by `arrive_by`."""
+        with self._lock:
+            route = self.routes.get((departure_city, arrival_city))
+            if route is None:
+                return None
+            pos = self._first_fit(route, units, depart_after, arrive_by)
+            return dict(route.trips[pos]) if pos is not None else None
+
+    def first_fit_to_city(self, arrival_city, units, depart_after=None, arrive_by=None):
+        """Like first_fit, over every route that ends in `arrival_city`."""
+        with self._lock:
+            best = None
+            for route_key in self.routes_to.get(arrival_city, ()):
+                route = self.routes[route_key]
+                pos = self._first_fit(route, units, depart_after, arrive_by)
+                if pos is not None and (best is None or route.keys[pos] < best.keys[best_pos]):
+                    best, best_pos = route, pos
+            return dict(best.trips[best_pos]) if best is not None else None
+
+    def upcoming(self, now=None, limit=5):
+        """The next `limit` departures across all routes."""
+        now = as_naive(now) or datetime.now()
+        with self._lock:
+            streams = []
+            for route in self.routes.values():
+                lo, _ = route.bounds(depart_after=now)
+                streams.append(route.trips[lo:lo + limit])
+            merged = heapq.merge(*streams, key=lambda t: (t["departure_date_time"], t["train_trip_id"]))
+            return [dict(trip) for _, trip in zip(range(limit), merged)]
+
+    def near_full(self, now=None, limit=3):
+        """Upcoming trips below CAPACITY_WARNING_RATIO free, latest departure first."""
+        now = as_naive(now) or datetime.now()
+        with self._lock:
+            trips = []
+            for route_key, train_trip_id, departure in self.near_full_keys:
+                if departure > now:
+                    pos = self.routes[route_key].position(train_trip_id, departure)
+                    trips.append(self.routes[route_key].trips[pos])
+        trips.sort(key=lambda t: t["departure_date_time"], reverse=True)
+        return [dict(trip) for trip in trips[:limit]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "loaded_at": self.loaded_at,
+                "routes": len(self.routes),
+                "trips": sum(len(route.trips) for route in self.routes.values()),
+                "near_full": len(self.near_full_keys)
+            }
+
+    # Refresh task
+
+    async def reload(self):
+        async with async_database.connection() as conn:
+            cur = conn.cursor()
+            try:
+                await cur.execute(_UPCOMING_TRIPS)
+                rows = await cur.fetchall()
+            finally:
+                await cur.close()
+        return self.load(rows)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Capacity index reload failed: {e}")
+            await asyncio.sleep(CAPACITY_INDEX_REFRESH)
+
+    # Internals
+
+    @staticmethod
+    def _trip(row):
+        trip = dict(row)
+        trip["departure_date_time"] = as_naive(trip["departure_date_time"])
+        trip["arrival_date_time"] = as_naive(trip.get("arrival_date_time"))
+        trip["available_capacity"] = float(trip["available_capacity"])
+        if trip.get("total_capacity") is not None:
+            trip["total_capacity"] = float(trip["total_capacity"])
+        return trip
+
+    def _first_fit(self, route, units, depart_after, arrive_by):
+        depart_after, arrive_by = as_naive(depart_after), as_naive(arrive_by)
+        lo, hi = route.bounds(depart_after, arrive_by)
+        while True:
+            pos = route.first_fit(units, lo, hi)
+            # Departure order almost always matches arrival order; skip the odd slow trip
+            if pos is None or arrive_by is None or route.trips[pos]["arrival_date_time"] <= arrive_by:
+                return pos
+            lo = pos + 1
+
+    def _locate(self, train_trip_id, departure_date_time):
+        departure_date_time = as_naive(departure_date_time)
+        route_key = self.route_of.get((train_trip_id, departure_date_time))
+        if route_key is None:
+            return None
+        route = self.routes[route_key]
+        return route_key, route, route.position(train_trip_id, departure_date_time)
+
+    @staticmethod
+    def _is_near_full(trip):
+        total = trip.get("total_capacity")
+        return bool(total) and trip["available_capacity"] / total < CAPACITY_WARNING_RATIO
+
+    def _track_near_full(self, route_key, trip):
+        key = (route_key, trip["train_trip_id"], trip["departure_date_time"])
+        if self._is_near_full(trip):
+            self.near_full_keys.add(key)
+        else:
+            self.near_full_keys.discard(key)
+
+
+# Shared per-process index; reloaded in the background from the app lifespan
+trip_capacity = TripCapacityIndex()
@@ -0,0 +1,403 @@
+import os
+import re
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from .capacity_index import as_naive
+
+# Truck trips are planned inside this daily window (local hours)
+DELIVERY_SHIFT_START = int(os.getenv("DELIVERY_SHIFT_START", "8"))
+DELIVERY_SHIFT_END = int(os.getenv("DELIVERY_SHIFT_END", "20"))
+
+# Trips less than this far apart count as consecutive for max_consecutive_trips
+CREW_REST_MINUTES = int(os.getenv("CREW_REST_MINUTES", "30"))
+
+UNAVAILABLE_TRUCK_STATUSES = ("Maintenance", "Out of Service", "Inactive")
+
+# Orders due on the day that reached a store by train and are not on a truck yet. The
+# store is the train_to_store row of the order's latest train trip, falling back to the
+# store in the trip's arrival city. SKIP LOCKED keeps concurrent planners apart.
+_READY_ORDERS = """
+    SELECT o.order_id, c.city AS customer_city, s.store_id, s.city AS store_city,
+           a.ready_at, COALESCE(w.weight, 0) AS weight
+    FROM "order" o
+    JOIN customer c ON c.customer_id = o.customer_id
+    JOIN LATERAL (
+        SELECT tt.arrival_date_time AS ready_at,
+               COALESCE(tts.store_id, (
+                   SELECT st.store_id FROM store st WHERE st.city = tt.arrival_city ORDER BY st.store_id LIMIT 1
+               )) AS store_id
+        FROM train_schedule ts
+        JOIN train_trip tt ON tt.train_trip_id = ts.train_trip_id
+                          AND tt.departure_date_time = ts.train_departure_date_time
+        LEFT JOIN train_to_store tts ON tts.train_trip_id = ts.train_trip_id
+                                    AND tts.train_departure_date_time = ts.train_departure_date_time
+        WHERE ts.order_id = o.order_id
+        ORDER BY tt.arrival_date_time DESC
+        LIMIT 1
+    ) a ON TRUE
+    JOIN store s ON s.store_id = a.store_id
+    LEFT JOIN LATERAL (
+        SELECT SUM(oi.quantity * p.unit_weight) AS weight
+        FROM order_item oi
+        JOIN product p ON p.product_id = oi.product_id
+        WHERE oi.order_id = o.order_id
+    ) w ON TRUE
+    WHERE o.schedule_date = %s
+      AND o.delivery_id IS NULL
+      AND o.status NOT IN ('Delivered', 'Cancelled')
+      AND o.order_id IN (
+          SELECT order_id FROM "order"
+          WHERE schedule_date = %s AND delivery_id IS NULL
+          FOR UPDATE SKIP LOCKED
+      );
+"""
+
+_ROUTES = "SELECT route_id, start_location, end_location, max_delivery_time, area_covered_description FROM route;"
+
+_TRUCKS = """
+    SELECT truck_id, store_id, max_load
+    FROM truck
+    WHERE store_id IS NOT NULL
+      AND COALESCE(status, 'Available') <> ALL(%s)
+    ORDER BY truck_id;
+"""
+
+# Drivers and assistants with the hours they already have on deliveries this week
+_CREW = """
+    SELECT e.employee_id,
+           CASE WHEN et.type_name ILIKE '%%assistant%%' THEN 'assistant' ELSE 'driver' END AS role,
+           et.weekly_max_hours, et.max_consecutive_trips,
+           COALESCE(SUM(w.hours_worked), 0) AS week_hours
+    FROM employee e
+    JOIN employee_type et ON et.employee_type_id = e.employee_type_id
+    LEFT JOIN (
+        SELECT es.employee_id, es.hours_worked
+        FROM employee_schedule es
+        JOIN delivery d ON d.delivery_id = es.delivery_id
+        WHERE d.delivery_date_time >= %s AND d.delivery_date_time < %s
+    ) w ON w.employee_id = e.employee_id
+    WHERE et.type_name ILIKE '%%driver%%' OR et.type_name ILIKE '%%assistant%%'
+    GROUP BY e.employee_id, et.type_name, et.weekly_max_hours, et.max_consecutive_trips
+    ORDER BY e.employee_id;
+"""
+
+# Deliveries already on the day, so trucks and crew are not double booked
+_BOOKED = """
+    SELECT d.truck_id, d.driver_employee_id, d.assistant_employee_id, d.delivery_date_time, r.max_delivery_time
+    FROM delivery d
+    JOIN route r ON r.route_id = d.route_id
+    WHERE d.delivery_date_time >= %s AND d.delivery_date_time < %s
+      AND COALESCE(d.status, '') <> 'Cancelled'
+    ORDER BY d.delivery_date_time;
+"""
+
+_ALLOCATE_DELIVERY_IDS = """
+    SELECT nextval(pg_get_serial_sequence('delivery', 'delivery_id')) AS delivery_id
+    FROM generate_series(1, %s);
+"""
+
+_INSERT_DELIVERIES = """
+    INSERT INTO delivery (delivery_id, truck_id, route_id, user_id, delivery_date_time,
+                          driver_employee_id, assistant_employee_id)
+    SELECT a.delivery_id, a.truck_id, a.route_id, %s, a.delivery_date_time, a.driver_id, a.assistant_id
+    FROM unnest(%s::int[], %s::int[], %s::int[], %s::timestamp[], %s::int[], %s::int[])
+        AS a(delivery_id, truck_id, route_id, delivery_date_time, driver_id, assistant_id);
+"""
+
+_ASSIGN_ORDERS = """
+    UPDATE "order" o
+    SET delivery_id = a.delivery_id
+    FROM unnest(%s::int[], %s::int[]) AS a(order_id, delivery_id)
+    WHERE o.order_id = a.order_id AND o.delivery_id IS NULL;
+"""
+
+_INSERT_CREW_SCHEDULES = """
+    INSERT INTO employee_schedule (employee_id, delivery_id, hours_worked, assigned_at)
+    SELECT a.employee_id, a.delivery_id, a.hours_worked, %s
+    FROM unnest(%s::int[], %s::int[], %s::numeric[]) AS a(employee_id, delivery_id, hours_worked);
+"""
+
+
+def route_hours(value) -> float:
+    """route.max_delivery_time as hours, whether stored as interval, time, number or text."""
+    if value is None:
+        return 0.0
+    if isinstance(value, timedelta):
+        return value.total_seconds() / 3600
+    if isinstance(value, time):
+        return value.hour + value.minute / 60 + value.second / 3600
+    if isinstance(value, (int, float)) or not isinstance(value, str):
+        return float(value)
+    text = value.strip()
+    match = re.fullmatch(r"(\d+):(\d{1,2})(?::(\d{1,2}))?", text)
+    if match:
+        hours, minutes, seconds = (int(part or 0) for part in match.groups())
+        return hours + minutes / 60 + seconds / 3600
+    match = re.match(r"([\d.]+)\s*(h|hour|hours|m|min|mins|minutes)?\b", text, re.IGNORECASE)
+    if match:
+        amount = float(match.group(1))
+        return amount / 60 if (match.group(2) or "h").lower().startswith("m") else amount
+    raise ValueError(f"Unrecognised max_delivery_time: {value!r}")
+
+
+def _match_route(routes_from, store_city, customer_city):
+    """A route out of the store's city ending at, or covering, the customer's city."""
+    city = (customer_city or "").strip().lower()
+    candidates = routes_from.get((store_city or "").strip().lower(), ())
+    for route in candidates:
+        if (route["end_location"] or "").strip().lower() == city:
+            return route
+    for route in candidates:
+        if city and city in (route["area_covered_description"] or "").lower():
+            return route
+    return None
+
+
+def _pack(orders, capacity):
+    """First fit decreasing by weight into loads of at most `capacity`."""
+    loads = []
+    for order in sorted(orders, key=lambda o: (-o["weight"], o["order_id"])):
+        for load in loads:
+            if load["weight"] + order["weight"] <= capacity:
+                break
+        else:
+            load = {"weight": 0.0, "orders": [], "ready_at": None}
+            loads.append(load)
+        load["weight"] += order["weight"]
+        load["orders"].append(order["order_id"])
+        ready = as_naive(order["ready_at"])
+        if ready is not None and (load["ready_at"] is None or ready > load["ready_at"]):
+            load["ready_at"] = ready
+    return loads
+
+
+class _Crew:
+    """Availability and limits of one driver or assistant while a day is planned."""
+
+    def __init__(self, row):
+        self.employee_id = row["employee_id"]
+        self.role = row["role"]
+        self.max_hours = float(row["weekly_max_hours"]) if row["weekly_max_hours"] is not None else None
+        self.max_consecutive = row["max_consecutive_trips"]
+        self.week_hours = float(row["week_hours"] or 0)
+        self.free_at = None
+        self.last_end = None
+        self.streak = 0
+
+    def has_hours(self, hours):
+        return self.max_hours is None or self.week_hours + hours <= self.max_hours + 1e-9
+
+    def earliest(self, start, rest):
+        """Earliest start >= `start` at which this employee may take the next trip."""
+        if self.free_at is not None and self.free_at > start:
+            start = self.free_at
+        if (self.last_end is not None and self.max_consecutive
+                and self.streak >= self.max_consecutive and start - self.last_end < rest):
+            start = self.last_end + rest
+        return start
+
+    def book(self, start, end, hours, rest):
+        consecutive = self.last_end is not None and start - self.last_end < rest
+        self.streak = self.streak + 1 if consecutive else 1
+        self.free_at = self.last_end = end
+        self.week_hours += hours
+
+
+def _pick(pool, start, hours, rest):
+    """Least-loaded employee in `pool` able to start at `start`, or None."""
+    best = None
+    for member in pool:
+        if member.has_hours(hours) and member.earliest(start, rest) <= start:
+            if best is None or (member.week_hours, member.employee_id) < (best.week_hours, best.employee_id):
+                best = member
+    return best
+
+
+def plan_deliveries(orders, routes, trucks, crew, booked=(), delivery_date: date = None):
+    """
+    Turn a day's store arrivals into truck deliveries.
+
+    Orders are grouped by store and route (the route from the store's city to the
+    customer's city) and packed first fit decreasing by weight into loads no heavier
+    than the store's largest truck. Loads on the longest routes are placed first; each
+    takes the truck and start time that let it leave earliest within the shift, after
+    its goods reached the store and once a driver and an assistant are free. Crew are
+    rotated least-hours-first and never exceed weekly_max_hours or
+    max_consecutive_trips (trips under CREW_REST_MINUTES apart are consecutive).
+
+    `booked` are the day's existing deliveries. Returns (deliveries, unplanned).
+    """
+    delivery_date = delivery_date or date.today()
+    day = datetime.combine(delivery_date, time())
+    shift_start = day + timedelta(hours=DELIVERY_SHIFT_START)
+    shift_end = day + timedelta(hours=DELIVERY_SHIFT_END)
+    rest = timedelta(minutes=CREW_REST_MINUTES)
+
+    routes_from = defaultdict(list)
+    for route in sorted(routes, key=lambda r: r["route_id"]):
+        routes_from[(route["start_location"] or "").strip().lower()].append(route)
+
+    trucks_at = defaultdict(list)
+    truck_free = {}
+    for truck in trucks:
+        trucks_at[truck["store_id"]].append(truck)
+        truck_free[truck["truck_id"]] = shift_start
+
+    members = {row["employee_id"]: _Crew(row) for row in crew}
+    drivers = [m for m in members.values() if m.role == "driver"]
+    assistants = [m for m in members.values() if m.role == "assistant"]
+
+    for row in booked:
+        start = as_naive(row["delivery_date_time"])
+        end = start + timedelta(hours=route_hours(row["max_delivery_time"]))
+        if row["truck_id"] in truck_free:
+            truck_free[row["truck_id"]] = max(truck_free[row["truck_id"]], end)
+        for employee_id in (row["driver_employee_id"], row["assistant_employee_id"]):
+            if employee_id in members:
+                members[employee_id].book(start, end, 0, rest)  # hours already counted in week_hours
+
+    unplanned = []
+    groups = defaultdict(list)
+    for order in orders:
+        order = dict(order, weight=float(order["weight"] or 0))
+        if order["weight"] <= 0:
+            unplanned.append({"order_id": order["order_id"], "reason": "Order has no items"})
+            continue
+        route = _match_route(routes_from, order["store_city"], order["customer_city"])
+        if route is None:
+            unplanned.append({"order_id": order["order_id"], "reason": "No route from the store to the customer's city"})
+            continue
+        groups[(order["store_id"], route["route_id"])].append(order)
+
+    route_by_id = {route["route_id"]: route for route in routes}
+    loads = []
+    for (store_id, route_id), group in groups.items():
+        capacity = max((float(t["max_load"] or 0) for t in trucks_at[store_id]), default=0.0)
+        fits = [o for o in group if o["weight"] <= capacity]
+        for order in group:
+            if order["weight"] > capacity:
+                reason = "No available truck at the store" if not capacity else "Heavier than any truck at the store"
+                unplanned.append({"order_id": order["order_id"], "reason": reason})
+        hours = route_hours(route_by_id[route_id]["max_delivery_time"])
+        for load in _pack(fits, capacity):
+            loads.append(dict(load, store_id=store_id, route_id=route_id, hours=hours))
+
+    deliveries = []
+    for load in sorted(loads, key=lambda l: (-l["hours"], -l["weight"], l["orders"][0])):
+        duration = timedelta(hours=load["hours"])
+        ready = max(shift_start, load["ready_at"] or shift_start)
+        best = None
+        for truck in trucks_at[load["store_id"]]:
+            if float(truck["max_load"] or 0) < load["weight"]:
+                continue
+            earliest = max(ready, truck_free[truck["truck_id"]])
+            driver_at = min((m.earliest(earliest, rest) for m in drivers if m.has_hours(load["hours"])), default=None)
+            assistant_at = min((m.earliest(earliest, rest) for m in assistants if m.has_hours(load["hours"])), default=None)
+            if driver_at is None or assistant_at is None:
+                continue
+            start = max(driver_at, assistant_at)
+            if start + duration > shift_end:
+                continue
+            key = (start, float(truck["max_load"] or 0), truck["truck_id"])
+            if best is None or key < best[0]:
+                best = (key, truck)
+
+        if best is None:
+            if not drivers or not assistants or not any(m.has_hours(load["hours"]) for m in drivers) \
+                    or not any(m.has_hours(load["hours"]) for m in assistants):
+                reason = "No driver or assistant with weekly hours left"
+            else:
+                reason = "No truck and crew free within the delivery shift"
+            unplanned.extend({"order_id": order_id, "reason": reason} for order_id in load["orders"])
+            continue
+
+        (start, _, truck_id), truck = best
+        end = start + duration
+        driver = _pick(drivers, start, load["hours"], rest)
+        assistant = _pick(assistants, start, load["hours"], rest)
+        driver.book(start, end, load["hours"], rest)
+        assistant.book(start, end, load["hours"], rest)
+        truck_free[truck_id] = end
+
+        deliveries.append({
+            "store_id": load["store_id"],
+            "route_id": load["route_id"],
+            "truck_id": truck_id,
+            "driver_employee_id": driver.employee_id,
+            "assistant_employee_id": assistant.employee_id,
+            "delivery_date_time": start,
+            "hours": load["hours"],
+            "load": round(load["weight"], 3),
+            "max_load": float(truck["max_load"]),
+            "order_ids": sorted(load["orders"]),
+        })
+
+    deliveries.sort(key=lambda d: (d["delivery_date_time"], d["truck_id"]))
+    return deliveries, unplanned
+
+
+async def plan_day(conn, delivery_date: date = None, user_id: int = None, dry_run: bool = False):
+    """
+    Plan truck deliveries for every order due on `delivery_date` (default today) that is
+    waiting at a store, and write the deliveries, order assignments and crew schedules
+    with one statement each in the caller's transaction. With dry_run nothing is written.
+    """
+    delivery_date = delivery_date or date.today()
+    day = datetime.combine(delivery_date, time())
+    week_start = day - timedelta(days=day.weekday())
+
+    cur = conn.cursor()
+    try:
+        await cur.execute(_READY_ORDERS, (delivery_date, delivery_date))
+        orders = await cur.fetchall()
+        await cur.execute(_ROUTES)
+        routes = await cur.fetchall()
+        await cur.execute(_TRUCKS, (list(UNAVAILABLE_TRUCK_STATUSES),))
+        trucks = await cur.fetchall()
+        await cur.execute(_CREW, (week_start, week_start + timedelta(days=7)))
+        crew = await cur.fetchall()
+        await cur.execute(_BOOKED, (day, day + timedelta(days=1)))
+        booked = await cur.fetchall()
+
+        deliveries, unplanned = plan_deliveries(orders, routes, trucks, crew, booked, delivery_date)
+
+        if deliveries and not dry_run:
+            await cur.execute(_ALLOCATE_DELIVERY_IDS, (len(deliveries),))
+            delivery_ids = sorted(row["delivery_id"] for row in await cur.fetchall())
+            for delivery, delivery_id in zip(deliveries, delivery_ids):
+                delivery["delivery_id"] = delivery_id
+
+            await cur.execute(_INSERT_DELIVERIES, (
+                user_id, delivery_ids,
+                [d["truck_id"] for d in deliveries],
+                [d["route_id"] for d in deliveries],
+                [d["delivery_date_time"] for d in deliveries],
+                [d["driver_employee_id"] for d in deliveries],
+                [d["assistant_employee_id"] for d in deliveries],
+            ))
+
+            order_ids = [order_id for d in deliveries for order_id in d["order_ids"]]
+            await cur.execute(_ASSIGN_ORDERS, (
+                order_ids, [d["delivery_id"] for d in deliveries for _ in d["order_ids"]]
+            ))
+            if cur.rowcount != len(order_ids):
+                raise RuntimeError("Orders changed during delivery planning")
+
+            await cur.execute(_INSERT_CREW_SCHEDULES, (
+                datetime.now(),
+                [d[role] for d in deliveries for role in ("driver_employee_id", "assistant_employee_id")],
+                [d["delivery_id"] for d in deliveries for _ in range(2)],
+                [d["hours"] for d in deliveries for _ in range(2)],
+            ))
+    finally:
+        await cur.close()
+
+    return {
+        "date": delivery_date,
+        "dry_run": dry_run,
+        "orders_considered": len(orders),
+        "planned_orders": sum(len(d["order_ids"]) for d in deliveries),
+        "deliveries": deliveries,
+        "unplanned": unplanned
+    }
@@ -0,0 +1,96 @@
+import os
+import re
+import threading
+import time
+
+# Seconds a loaded copy is trusted. Changes made through this process reload it at once;
+# the TTL bounds staleness for changes made through another worker.
+LOOKUP_TTL = float(os.getenv("LOOKUP_TTL", "300"))
+
+# Roles with this name are granted every permission, whatever their access_rights say
+SUPERUSER_ROLE = "Admin"
+
+_ROLES = "SELECT role_id, role_name, access_rights FROM role;"
+
+_EMPLOYEE_TYPES = """
+    SELECT employee_type_id, type_name, hourly_rate, weekly_max_hours, max_consecutive_trips
+    FROM employee_type;
+"""
+
+
+def parse_access_rights(text):
+    """
+    Permissions granted by a role's access_rights: tokens such as "users:read",
+    "roles:*" or "*" separated by commas, semicolons or whitespace.
+    """
+    return frozenset(token.lower() for token in re.split(r"[,;\s]+", text or "") if token)
+
+
+class Lookups:
+    """
+    Process-level copy of the role and employee_type tables.
+
+    Both are tiny and rarely change, so handlers resolve ids and names here instead of
+    querying per request or per row. The copy is loaded on first use through the
+    caller's cursor and dropped by invalidate() after a role or employee type changes.
+    """
+
+    def __init__(self):
+        self.roles = {}           # role_id -> row
+        self.employee_types = {}  # employee_type_id -> row
+        self.permissions = {}     # role_id -> frozenset of parsed access_rights
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    def load(self, cur):
+        cur.execute(_ROLES)
+        roles = {row["role_id"]: dict(row) for row in cur.fetchall()}
+        permissions = {role_id: parse_access_rights(role["access_rights"]) for role_id, role in roles.items()}
+        cur.execute(_EMPLOYEE_TYPES)
+        employee_types = {row["employee_type_id"]: dict(row) for row in cur.fetchall()}
+        with self._lock:
+            self.roles, self.employee_types, self.permissions = roles, employee_types, permissions
+            self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self.loaded_at = None
+
+    def role_name(self, cur, role_id):
+        role = self._fresh(cur).roles.get(role_id)
+        return role["role_name"] if role else None
+
+    def role_id(self, cur, role_name):
+        for role in self._fresh(cur).roles.values():
+            if role["role_name"] == role_name:
+                return role["role_id"]
+        return None
+
+    def all_roles(self, cur):
+        return sorted(self._fresh(cur).roles.values(), key=lambda role: role["role_id"])
+
+    def allows(self, cur, role_id, permission):
+        """Whether `role_id` holds `permission` ("resource:action")."""
+        role = self._fresh(cur).roles.get(role_id)
+        if role is None:
+            return False
+        if role["role_name"] == SUPERUSER_ROLE:
+            return True
+        granted = self.permissions.get(role_id, frozenset())
+        resource = permission.split(":", 1)[0]
+        return permission in granted or f"{resource}:*" in granted or "*" in granted
+
+    def employee_type_name(self, cur, employee_type_id):
+        employee_type = self._fresh(cur).employee_types.get(employee_type_id)
+        return employee_type["type_name"] if employee_type else None
+
+    def _fresh(self, cur):
+        with self._lock:
+            loaded_at = self.loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > LOOKUP_TTL:
+            self.load(cur)
+        return self
+
+
+# Shared per-process copy
+lookups = Lookups()
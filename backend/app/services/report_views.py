@@ -0,0 +1,169 @@
+import asyncio
+import os
+import threading
+import time
+
+from ..db import database
+
+# A report view's materialized copy is refreshed once it is older than this many seconds.
+# Every worker runs the scheduler; an advisory lock lets only one of them refresh a view.
+REPORT_REFRESH_INTERVAL = float(os.getenv("REPORT_REFRESH_INTERVAL", "300"))
+
+# Seconds between scheduler passes (each pass only refreshes views that are due)
+REPORT_REFRESH_TICK = float(os.getenv("REPORT_REFRESH_TICK", "30"))
+
+# Reporting view -> materialized copy (migrations/005_report_matviews.sql)
+REPORT_VIEWS = {
+    "train_capacity_utilization": "train_capacity_utilization_mv",
+    "delivery_performance": "delivery_performance_mv",
+    "employee_workload": "employee_workload_mv",
+    "revenue_analysis": "revenue_analysis_mv",
+    "product_performance": "product_performance_mv",
+    "inventory_alerts": "inventory_alerts_mv",
+}
+
+_REFRESH_STATUS = """
+    SELECT view_name, refreshed_at, duration_ms
+    FROM report_view_refresh;
+"""
+
+_RECORD_REFRESH = """
+    INSERT INTO report_view_refresh (view_name, refreshed_at, duration_ms)
+    VALUES (%s, NOW(), %s)
+    ON CONFLICT (view_name) DO UPDATE
+    SET refreshed_at = EXCLUDED.refreshed_at, duration_ms = EXCLUDED.duration_ms
+    RETURNING view_name, refreshed_at, duration_ms;
+"""
+
+
+class ReportViews:
+    """
+    Keeps the materialized copies of the reporting views current.
+
+    Refreshes are REFRESH MATERIALIZED VIEW CONCURRENTLY, so report reads never block on
+    them. Refresh times live in report_view_refresh and are shared by every worker;
+    `on_refresh` callbacks run whenever this process sees a view change, whoever
+    refreshed it.
+    """
+
+    def __init__(self):
+        self.status = {}  # view -> {"refreshed_at", "duration_ms", "error"}
+        self.on_refresh = []
+        self._refreshing = set()  # views a request thread is refreshing in this process
+        self._lock = threading.Lock()
+        self._task = None
+
+    def refresh(self, view, max_age=0, wait=True):
+        """
+        Refresh `view` unless it was refreshed within `max_age` seconds. With wait=False
+        a refresh already running in another worker is skipped rather than waited for.
+        Returns True when this call refreshed the view.
+        """
+        with database.connection() as conn:
+            cur = conn.cursor()
+            try:
+                lock = "pg_advisory_xact_lock" if wait else "pg_try_advisory_xact_lock"
+                cur.execute(f"SELECT {lock}(hashtext(%s)) AS locked;", (f"report_view:{view}",))
+                if cur.fetchone()["locked"] is False:
+                    return False
+                cur.execute("""
+                    SELECT view_name, refreshed_at, duration_ms FROM report_view_refresh
+                    WHERE view_name = %s AND refreshed_at > NOW() - make_interval(secs => %s);
+                """, (view, max_age))
+                current = cur.fetchone()
+                if current:
+                    self._record(current)
+                    return False
+                started = time.perf_counter()
+                cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {REPORT_VIEWS[view]};")
+                cur.execute(_RECORD_REFRESH, (view, round((time.perf_counter() - started) * 1000, 1)))
+                refreshed = cur.fetchone()
+            finally:
+                cur.close()
+        self._record(refreshed)
+        return True
+
+    def ensure_fresh(self, view, max_age):
+        """
+        Per-request freshness: refresh first if the copy is older than `max_age` seconds.
+        Never waits on a refresh already running here or in another worker; the request
+        is served from the current copy instead.
+        """
+        if max_age is None:
+            return False
+        with self._lock:
+            known = self.status.get(view, {}).get("refreshed_at")
+            if known is not None and time.time() - known.timestamp() < max_age:
+                return False
+            if view in self._refreshing:
+                return False
+            self._refreshing.add(view)
+        try:
+            return self.refresh(view, max_age, wait=False)
+        finally:
+            with self._lock:
+                self._refreshing.discard(view)
+
+    def refresh_due(self):
+        """One scheduler pass: pick up other workers' refreshes, then refresh stale views."""
+        with database.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(_REFRESH_STATUS)
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+        for row in rows:
+            self._record(row)
+        for view in REPORT_VIEWS:
+            try:
+                self.refresh(view, REPORT_REFRESH_INTERVAL, wait=False)
+            except Exception as e:
+                print(f"Report view refresh failed for {view}: {e}")
+                with self._lock:
+                    self.status.setdefault(view, {})["error"] = str(e)
+
+    def stats(self):
+        with self._lock:
+            return {
+                view: {
+                    "materialized_view": REPORT_VIEWS[view],
+                    "refreshed_at": self.status.get(view, {}).get("refreshed_at"),
+                    "duration_ms": self.status.get(view, {}).get("duration_ms"),
+                    "error": self.status.get(view, {}).get("error"),
+                }
+                for view in REPORT_VIEWS
+            }
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh_due)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Report view refresh failed: {e}")
+            await asyncio.sleep(REPORT_REFRESH_TICK)
+
+    def _record(self, row):
+        view = row["view_name"]
+        with self._lock:
+            previous = self.status.get(view, {}).get("refreshed_at")
+            self.status[view] = {"refreshed_at": row["refreshed_at"], "duration_ms": row["duration_ms"], "error": None}
+        if previous != row["refreshed_at"]:
+            for callback in self.on_refresh:
+                callback(view)
+
+
+# Shared per-process scheduler; started from the app lifespan
+report_views = ReportViews()
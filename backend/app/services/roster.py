@@ -0,0 +1,227 @@
+import asyncio
+import bisect
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from ..db import async_database
+from .capacity_index import as_naive
+from .delivery_planner import CREW_REST_MINUTES
+
+# weekly_max_hours applies to every window of this many consecutive days
+ROSTER_WINDOW_DAYS = int(os.getenv("ROSTER_WINDOW_DAYS", "7"))
+
+# Seconds between full reloads from employee_schedule; picks up rows written elsewhere
+ROSTER_REFRESH = float(os.getenv("ROSTER_REFRESH", "60"))
+
+_STAFF = """
+    SELECT e.employee_id,
+           CASE WHEN et.type_name ILIKE '%%assistant%%' THEN 'assistant' ELSE 'driver' END AS role,
+           et.weekly_max_hours, et.max_consecutive_trips
+    FROM employee e
+    JOIN employee_type et ON et.employee_type_id = e.employee_type_id
+    WHERE (et.type_name ILIKE '%%driver%%' OR et.type_name ILIKE '%%assistant%%')
+      {where};
+"""
+
+STAFF_QUERY = _STAFF.format(where="")
+STAFF_MEMBER_QUERY = _STAFF.format(where="AND e.employee_id = %s")
+
+# Assignments that can still fall in a window around today
+_RECENT_ASSIGNMENTS = """
+    SELECT es.employee_id, es.delivery_id, es.hours_worked, d.delivery_date_time
+    FROM employee_schedule es
+    JOIN delivery d ON d.delivery_id = es.delivery_id
+    WHERE d.delivery_date_time >= %s;
+"""
+
+
+class StaffRoster:
+    """
+    One employee's recent trips: hours per day for the rolling window, and trips sorted
+    by start for the consecutive-trip rule. Checks look at a fixed number of days and at
+    most max_consecutive_trips neighbours, so they cost O(1) in the schedule's size.
+    """
+
+    def __init__(self, employee_id, role, weekly_max_hours=None, max_consecutive_trips=None):
+        self.employee_id = employee_id
+        self.role = role
+        self.weekly_max_hours = float(weekly_max_hours) if weekly_max_hours is not None else None
+        self.max_consecutive_trips = max_consecutive_trips
+        self.day_hours = {}  # date -> hours
+        self.trips = []      # (start, end, delivery_id), sorted
+
+    def record(self, start, hours, delivery_id=None):
+        start = as_naive(start)
+        day = start.date()
+        self.day_hours[day] = self.day_hours.get(day, 0.0) + float(hours)
+        bisect.insort(self.trips, (start, start + timedelta(hours=float(hours)), delivery_id or 0))
+
+    def remaining_hours(self, day: date):
+        """Hours left in the tightest window that includes `day`; None when uncapped."""
+        if self.weekly_max_hours is None:
+            return None
+        days = [self.day_hours.get(day + timedelta(days=offset), 0.0)
+                for offset in range(1 - ROSTER_WINDOW_DAYS, ROSTER_WINDOW_DAYS)]
+        window = sum(days[:ROSTER_WINDOW_DAYS])
+        busiest = window
+        for offset in range(ROSTER_WINDOW_DAYS, len(days)):
+            window += days[offset] - days[offset - ROSTER_WINDOW_DAYS]
+            busiest = max(busiest, window)
+        return self.weekly_max_hours - busiest
+
+    def violation(self, start, hours):
+        """Why this employee cannot take a trip of `hours` at `start`, or None."""
+        start = as_naive(start)
+        end = start + timedelta(hours=float(hours))
+
+        remaining = self.remaining_hours(start.date())
+        if remaining is not None and float(hours) > remaining + 1e-9:
+            return f"Would exceed {self.weekly_max_hours:g} hours in {ROSTER_WINDOW_DAYS} days"
+
+        pos = bisect.bisect_left(self.trips, (start,))
+        if (pos > 0 and self.trips[pos - 1][1] > start) or (pos < len(self.trips) and self.trips[pos][0] < end):
+            return "Already on a delivery at that time"
+
+        if self.max_consecutive_trips:
+            rest = timedelta(minutes=CREW_REST_MINUTES)
+            limit = self.max_consecutive_trips
+            chain, edge, i = 1, start, pos - 1
+            while i >= 0 and chain <= limit and edge - self.trips[i][1] < rest:
+                chain, edge, i = chain + 1, self.trips[i][0], i - 1
+            edge, i = end, pos
+            while i < len(self.trips) and chain <= limit and self.trips[i][0] - edge < rest:
+                chain, edge, i = chain + 1, self.trips[i][1], i + 1
+            if chain > limit:
+                return f"Would exceed {limit} consecutive trips"
+        return None
+
+
+class RosterIndex:
+    """
+    In-process view of driver and assistant workload used to validate assignments.
+
+    Loaded from employee_schedule at startup and every ROSTER_REFRESH seconds, and kept
+    current in between by the endpoints that insert schedule rows. Like the capacity
+    index it accelerates reads; employee_schedule stays the source of truth.
+    """
+
+    def __init__(self):
+        self.staff = {}
+        self.loaded = False
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._task = None
+
+    # Maintenance
+
+    def load(self, staff_rows, assignment_rows):
+        staff = {row["employee_id"]: self._staff(row) for row in staff_rows}
+        for row in assignment_rows:
+            member = staff.get(row["employee_id"])
+            if member is not None and row["delivery_date_time"] is not None:
+                member.record(row["delivery_date_time"], row["hours_worked"] or 0, row["delivery_id"])
+        with self._lock:
+            self.staff = staff
+            self.loaded, self.loaded_at = True, datetime.now()
+        return self
+
+    def track(self, staff_row):
+        """Register an employee created or retyped since the last load."""
+        with self._lock:
+            current = self.staff.get(staff_row["employee_id"])
+            member = self._staff(staff_row)
+            if current is not None:
+                member.day_hours, member.trips = current.day_hours, current.trips
+            self.staff[member.employee_id] = member
+
+    def record(self, employee_id, start, hours, delivery_id=None):
+        with self._lock:
+            member = self.staff.get(employee_id)
+            if member is not None:
+                member.record(start, hours, delivery_id)
+
+    # Lookups
+
+    def knows(self, employee_id):
+        with self._lock:
+            return employee_id in self.staff
+
+    def violation(self, employee_id, start, hours, role=None):
+        """Reason `employee_id` may not work a trip of `hours` from `start`, or None if they may."""
+        with self._lock:
+            member = self.staff.get(employee_id)
+            if member is None:
+                return "Not a driver or assistant"
+            if role is not None and member.role != role:
+                return f"Employee type is not {role}"
+            return member.violation(start, hours)
+
+    def eligible(self, start, hours, role=None):
+        """Every driver/assistant free to work the slot, most hours left first."""
+        with self._lock:
+            found = [
+                {
+                    "employee_id": member.employee_id,
+                    "role": member.role,
+                    "remaining_hours": member.remaining_hours(as_naive(start).date())
+                }
+                for member in self.staff.values()
+                if (role is None or member.role == role) and member.violation(start, hours) is None
+            ]
+        found.sort(key=lambda s: (s["remaining_hours"] is not None, -(s["remaining_hours"] or 0), s["employee_id"]))
+        return found
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "loaded_at": self.loaded_at,
+                "staff": len(self.staff),
+                "trips": sum(len(member.trips) for member in self.staff.values())
+            }
+
+    # Refresh task
+
+    async def reload(self):
+        since = datetime.combine(date.today() - timedelta(days=ROSTER_WINDOW_DAYS), datetime.min.time())
+        async with async_database.connection() as conn:
+            cur = conn.cursor()
+            try:
+                await cur.execute(STAFF_QUERY)
+                staff_rows = await cur.fetchall()
+                await cur.execute(_RECENT_ASSIGNMENTS, (since,))
+                assignment_rows = await cur.fetchall()
+            finally:
+                await cur.close()
+        return self.load(staff_rows, assignment_rows)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Roster reload failed: {e}")
+            await asyncio.sleep(ROSTER_REFRESH)
+
+    # Internals
+
+    @staticmethod
+    def _staff(row):
+        return StaffRoster(row["employee_id"], row["role"], row["weekly_max_hours"], row["max_consecutive_trips"])
+
+
+# Shared per-process roster; reloaded in the background from the app lifespan
+roster = RosterIndex()
@@ -0,0 +1,247 @@
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from .allocation import SPACE_SCALE, arrival_deadline
+from .capacity_index import as_naive
+
+# Default horizon for what-if runs: Pending orders due within this many days
+SIMULATION_HORIZON_DAYS = int(os.getenv("SIMULATION_HORIZON_DAYS", "30"))
+
+_PENDING_ORDERS = """
+    SELECT o.order_id, o.schedule_date, o.order_date, c.city
+    FROM "order" o
+    JOIN customer c ON c.customer_id = o.customer_id
+    WHERE o.status = 'Pending'
+      AND o.schedule_date BETWEEN %s AND %s
+      AND NOT EXISTS (SELECT 1 FROM train_schedule ts WHERE ts.order_id = o.order_id)
+    ORDER BY o.order_id;
+"""
+
+_ORDER_ITEMS = """
+    SELECT oi.order_id, oi.product_id, oi.quantity
+    FROM order_item oi
+    JOIN "order" o ON o.order_id = oi.order_id
+    WHERE o.status = 'Pending'
+      AND o.schedule_date BETWEEN %s AND %s;
+"""
+
+_PRODUCT_SPACE = "SELECT product_id, train_space_per_unit FROM product ORDER BY product_id;"
+
+_TRIPS = """
+    SELECT train_trip_id, departure_city, arrival_city, departure_date_time, arrival_date_time,
+           total_capacity, available_capacity
+    FROM train_trip
+    WHERE departure_date_time >= %s
+      AND departure_date_time < %s
+    ORDER BY departure_date_time, train_trip_id;
+"""
+
+
+def _positions(keys, values):
+    """Index of each of `values` in the sorted array `keys`, or -1 where absent."""
+    if not len(keys):
+        return np.full(len(values), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(keys, values), len(keys) - 1)
+    return np.where(keys[pos] == values, pos, -1)
+
+
+def load_problem(cur, start: date, end: date, now: datetime):
+    """Read pending orders, their items, product space and trips in the horizon into arrays."""
+    cur.execute(_PENDING_ORDERS, (start, end))
+    orders = cur.fetchall()
+    cur.execute(_ORDER_ITEMS, (start, end))
+    items = cur.fetchall()
+    cur.execute(_PRODUCT_SPACE)
+    products = cur.fetchall()
+    cur.execute(_TRIPS, (now, arrival_deadline(end)))
+    trips = cur.fetchall()
+
+    order_ids = np.array([row["order_id"] for row in orders], dtype=np.int64)
+
+    # Required train space per order: sum(quantity * train_space_per_unit), vectorized
+    product_ids = np.array([row["product_id"] for row in products], dtype=np.int64)
+    space_per_unit = np.array([float(row["train_space_per_unit"] or 0) for row in products])
+    item_orders = np.array([row["order_id"] for row in items], dtype=np.int64)
+    item_products = np.array([row["product_id"] for row in items], dtype=np.int64)
+    item_quantity = np.array([row["quantity"] for row in items], dtype=np.float64)
+
+    order_pos = _positions(order_ids, item_orders)
+    product_pos = _positions(product_ids, item_products)
+    known = (order_pos >= 0) & (product_pos >= 0)
+    required = np.bincount(
+        order_pos[known],
+        weights=item_quantity[known] * space_per_unit[product_pos[known]],
+        minlength=len(order_ids)
+    )
+
+    return {
+        "order_id": order_ids,
+        "city": np.array([row["city"] or "" for row in orders], dtype=object),
+        "deadline": np.array([arrival_deadline(row["schedule_date"]) for row in orders], dtype="datetime64[us]"),
+        "priority": np.lexsort((
+            order_ids,
+            np.array([row["order_date"] or date.min for row in orders], dtype="datetime64[D]"),
+            np.array([row["schedule_date"] for row in orders], dtype="datetime64[D]"),
+        )),
+        "required": required,
+        "trips": [dict(row) for row in trips],
+    }
+
+
+def _trip_arrays(trips):
+    return {
+        "trip_id": np.array([t["train_trip_id"] for t in trips], dtype=np.int64),
+        "city": np.array([t["arrival_city"] for t in trips], dtype=object),
+        "departure": np.array([as_naive(t["departure_date_time"]) for t in trips], dtype="datetime64[us]"),
+        "arrival": np.array([as_naive(t["arrival_date_time"]) for t in trips], dtype="datetime64[us]"),
+        "total": np.array([float(t["total_capacity"] or 0) for t in trips]),
+        "available": np.array([float(t["available_capacity"] or 0) for t in trips]),
+    }
+
+
+def allocate_vectorized(problem, trips):
+    """
+    The allocation.plan_allocation policy, computed trip by trip.
+
+    Per city, trips are visited in departure order. Each trip takes the eligible,
+    still-unassigned orders in deadline priority, skipping any that no longer fit. This
+    assigns every order to the same trip as plan_allocation's order-by-order first fit.
+    Each trip is resolved with whole-array operations: the longest prefix that fits comes
+    from one cumsum/searchsorted, and each skipped order costs one more such step.
+
+    Returns (trip index per order or -1, remaining capacity per trip).
+    """
+    n_orders = len(problem["order_id"])
+    assigned = np.full(n_orders, -1, dtype=np.int64)
+    # Same fixed-point units as plan_allocation, so both make identical fit decisions
+    remaining = np.rint(trips["available"] * SPACE_SCALE).astype(np.int64)
+
+    priority = problem["priority"]
+    order_city = problem["city"][priority]
+    deadline = problem["deadline"][priority]
+    required = np.rint(problem["required"][priority] * SPACE_SCALE).astype(np.int64)
+    assigned_sorted = np.full(n_orders, -1, dtype=np.int64)
+
+    trip_order = np.lexsort((trips["trip_id"], trips["departure"]))
+    for city in np.unique(order_city) if n_orders else ():
+        in_city = np.flatnonzero(order_city == city)
+        city_deadline, city_required = deadline[in_city], required[in_city]
+        open_orders = city_required > 0
+        for t in trip_order[trips["city"][trip_order] == city]:
+            capacity = remaining[t]
+            if capacity <= 0:
+                continue
+            eligible = np.flatnonzero(
+                open_orders & (city_deadline > trips["departure"][t]) & (city_deadline >= trips["arrival"][t])
+            )
+            sizes = city_required[eligible]
+            start, taken = 0, []
+            while start < len(sizes):
+                fits = np.flatnonzero(sizes[start:] <= capacity)
+                if not len(fits):
+                    break
+                start += fits[0]
+                cumulative = np.cumsum(sizes[start:])
+                count = int(np.searchsorted(cumulative, capacity, side="right"))
+                taken.append(eligible[start:start + count])
+                capacity -= cumulative[count - 1]
+                start += count
+            if taken:
+                taken = np.concatenate(taken)
+                open_orders[taken] = False
+                assigned_sorted[in_city[taken]] = t
+                remaining[t] = capacity
+
+    assigned[priority] = assigned_sorted
+    return assigned, remaining / SPACE_SCALE
+
+
+def _summary(problem, trips, assigned, remaining):
+    total = trips["total"].sum()
+    used = (trips["total"] - remaining).sum()
+    return {
+        "orders": int(len(assigned)),
+        "allocated": int((assigned >= 0).sum()),
+        "unallocated": int((assigned < 0).sum()),
+        "allocated_space": float(problem["required"][assigned >= 0].sum()),
+        "utilization": round(float(used / total), 4) if total else 0.0,
+    }
+
+
+def simulate(problem, extra_trips=(), capacity_changes=()):
+    """
+    Run the allocation policy on the current trips and on a what-if variant with extra
+    trips and/or overridden capacities, and report the difference.
+    """
+    started = time.perf_counter()
+    base_trips = problem["trips"]
+
+    scenario_trips = [dict(t) for t in base_trips]
+    changes = {(c["train_trip_id"], as_naive(c.get("departure_date_time"))): c["available_capacity"] for c in capacity_changes}
+    for trip in scenario_trips:
+        key = (trip["train_trip_id"], as_naive(trip["departure_date_time"]))
+        override = changes.get(key, changes.get((trip["train_trip_id"], None)))
+        if override is not None:
+            trip["available_capacity"] = min(float(override), float(trip["total_capacity"] or override))
+    for n, extra in enumerate(extra_trips, 1):
+        scenario_trips.append({
+            "train_trip_id": -n,  # hypothetical trips get negative ids
+            "departure_city": extra["departure_city"],
+            "arrival_city": extra["arrival_city"],
+            "departure_date_time": extra["departure_date_time"],
+            "arrival_date_time": extra["arrival_date_time"],
+            "total_capacity": extra["total_capacity"],
+            "available_capacity": extra["total_capacity"],
+        })
+
+    base_arrays, scenario_arrays = _trip_arrays(base_trips), _trip_arrays(scenario_trips)
+    base_assigned, base_remaining = allocate_vectorized(problem, base_arrays)
+    scenario_assigned, scenario_remaining = allocate_vectorized(problem, scenario_arrays)
+
+    baseline = _summary(problem, base_arrays, base_assigned, base_remaining)
+    scenario = _summary(problem, scenario_arrays, scenario_assigned, scenario_remaining)
+
+    newly_allocated = problem["order_id"][(base_assigned < 0) & (scenario_assigned >= 0)]
+    newly_unallocated = problem["order_id"][(base_assigned >= 0) & (scenario_assigned < 0)]
+
+    changed = np.flatnonzero(
+        np.concatenate([scenario_remaining[:len(base_trips)] != base_remaining, np.ones(len(extra_trips), dtype=bool)])
+    )
+    trip_changes = [
+        {
+            "train_trip_id": int(scenario_arrays["trip_id"][i]) if i < len(base_trips) else None,
+            "hypothetical": bool(i >= len(base_trips)),
+            "route": f"{scenario_trips[i]['departure_city']} → {scenario_trips[i]['arrival_city']}",
+            "departure_date_time": scenario_trips[i]["departure_date_time"],
+            "utilization_before": round(float(1 - base_remaining[i] / base_arrays["total"][i]), 4) if i < len(base_trips) and base_arrays["total"][i] else None,
+            "utilization_after": round(float(1 - scenario_remaining[i] / scenario_arrays["total"][i]), 4) if scenario_arrays["total"][i] else None,
+        }
+        for i in changed
+    ]
+
+    return {
+        "baseline": baseline,
+        "scenario": scenario,
+        "delta": {key: round(scenario[key] - baseline[key], 4) for key in ("allocated", "unallocated", "allocated_space", "utilization")},
+        "newly_allocated_orders": newly_allocated.tolist(),
+        "newly_unallocated_orders": newly_unallocated.tolist(),
+        "trip_changes": trip_changes,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def run_simulation(cur, request, now: datetime = None):
+    now = now or datetime.now()
+    start = request.from_date or now.date()
+    end = request.to_date or start + timedelta(days=SIMULATION_HORIZON_DAYS)
+    problem = load_problem(cur, start, end, now)
+    result = simulate(
+        problem,
+        [trip.model_dump() for trip in request.extra_trips],
+        [change.model_dump() for change in request.capacity_changes],
+    )
+    result["window"] = {"from": start, "to": end}
+    return result
@@ -0,0 +1,28 @@
+-- Push "order" status changes to the app over LISTEN/NOTIFY.
+--
+-- The backend keeps one connection LISTENing on the order_updates channel and
+-- relays each payload to /ws/order-updates subscribers.
+--
+-- Apply with: psql "$DATABASE_URL" -f migrations/001_order_status_notify.sql
+
+CREATE OR REPLACE FUNCTION notify_order_status_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR NEW.status IS DISTINCT FROM OLD.status THEN
+        PERFORM pg_notify('order_updates', json_build_object(
+            'order_id', NEW.order_id,
+            'status', NEW.status,
+            'previous_status', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+            'schedule_date', NEW.schedule_date,
+            'customer_name', (SELECT c.name FROM customer c WHERE c.customer_id = NEW.customer_id)
+        )::text);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS order_status_notify ON "order";
+
+CREATE TRIGGER order_status_notify
+    AFTER INSERT OR UPDATE OF status ON "order"
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_order_status_change();
@@ -0,0 +1,42 @@
+-- Database-generated primary keys for every table the API inserts into.
+--
+-- The create endpoints used to compute ids as COUNT(*)+1 / MAX()+1, which scans the
+-- table on each insert and hands out duplicate ids under concurrent requests (and
+-- after any delete). They now rely on column defaults and INSERT ... RETURNING.
+--
+-- For each id column this reuses an existing serial/identity sequence, or creates
+-- one and makes it the column default, then moves the sequence past the current
+-- MAX(id). Safe to re-run; re-run it after any bulk load that sets ids explicitly.
+--
+-- Apply with: psql "$DATABASE_URL" -f migrations/002_id_sequences.sql
+
+DO $$
+DECLARE
+    t record;
+    seq text;
+BEGIN
+    FOR t IN
+        SELECT * FROM (VALUES
+            ('user', 'user_id'),
+            ('role', 'role_id'),
+            ('employee', 'employee_id'),
+            ('employee_type', 'employee_type_id'),
+            ('employee_schedule', 'schedule_id'),
+            ('customer', 'customer_id'),
+            ('order', 'order_id'),
+            ('product', 'product_id')
+        ) AS v(tbl, col)
+    LOOP
+        seq := pg_get_serial_sequence(format('%I', t.tbl), t.col);
+        IF seq IS NULL THEN
+            seq := format('%I', t.tbl || '_' || t.col || '_seq');
+            EXECUTE format('CREATE SEQUENCE IF NOT EXISTS %s OWNED BY %I.%I', seq, t.tbl, t.col);
+            EXECUTE format('ALTER TABLE %I ALTER COLUMN %I SET DEFAULT nextval(%L)', t.tbl, t.col, seq);
+        END IF;
+        EXECUTE format(
+            'SELECT setval(%L, COALESCE((SELECT MAX(%I) FROM %I), 0) + 1, false)',
+            seq, t.col, t.tbl
+        );
+    END LOOP;
+END;
+$$;
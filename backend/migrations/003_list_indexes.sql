@@ -0,0 +1,41 @@
+-- Indexes behind the paginated list endpoints.
+--
+-- List endpoints page by keyset (WHERE (sort key) < last seen ORDER BY sort key LIMIT n)
+-- instead of returning whole tables. Each index below matches one endpoint's filter
+-- followed by its sort key, so a page is a bounded index range scan whatever the
+-- table size. CONCURRENTLY keeps the tables writable while the indexes build.
+--
+-- Apply with: psql "$DATABASE_URL" -f migrations/003_list_indexes.sql
+
+-- GET /orders (status, customer_id, order_date range; order_id DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS order_status_id_idx ON "order" (status, order_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS order_customer_id_idx ON "order" (customer_id, order_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS order_order_date_idx ON "order" (order_date, order_id);
+
+-- GET /customers (city; customer_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS customer_city_id_idx ON customer (city, customer_id);
+
+-- GET /employees (employee_type_id; employee_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS employee_type_id_idx ON employee (employee_type_id, employee_id);
+
+-- GET /employee-shedules (employee_id, delivery_id; schedule_id DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS employee_schedule_employee_idx ON employee_schedule (employee_id, schedule_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS employee_schedule_delivery_idx ON employee_schedule (delivery_id, schedule_id);
+
+-- GET /deliveries/deliveries (status, truck_id, route_id, date range; delivery_date_time DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS delivery_time_id_idx ON delivery (delivery_date_time, delivery_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS delivery_status_time_idx ON delivery (status, delivery_date_time, delivery_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS delivery_truck_time_idx ON delivery (truck_id, delivery_date_time, delivery_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS delivery_route_time_idx ON delivery (route_id, delivery_date_time, delivery_id);
+
+-- GET /train-trips/train-trips (cities, departure range; departure_date_time DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS train_trip_departure_idx ON train_trip (departure_date_time, train_trip_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS train_trip_route_departure_idx ON train_trip (departure_city, arrival_city, departure_date_time, train_trip_id);
+
+-- GET /train-trips/train-schedules (train_trip_id, order_id, status; departure DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS train_schedule_departure_idx ON train_schedule (train_departure_date_time, train_trip_id, order_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS train_schedule_order_idx ON train_schedule (order_id);
+
+-- GET /auditlog (table_name, operation, performed_by; audit_id DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS audit_log_table_id_idx ON audit_log (table_name, audit_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS audit_log_performed_by_id_idx ON audit_log (performed_by, audit_id);
@@ -0,0 +1,263 @@
+-- Pre-aggregated rows behind the dashboards.
+--
+-- The admin, manager, warehouse and chart endpoints used to re-count orders and re-sum
+-- SUM(oi.quantity * p.unit_price) across "order", order_item, product and customer on
+-- every load. They now read these tables instead:
+--
+--   dashboard_order_daily   orders, units and revenue per order_date, status and
+--                           customer type (a month is ~30 rows per status and type)
+--   dashboard_trip_orders   orders and allocated space per train trip departure
+--
+-- Statement-level triggers keep them current: each INSERT/UPDATE/DELETE statement applies
+-- one grouped delta from its transition tables, so a bulk load of 100k orders is a single
+-- upsert rather than 100k. Revenue uses the current unit_price, as the old queries did;
+-- a price or customer type change moves the affected totals.
+--
+-- Orders are never deleted by the API. If rows are deleted by hand with ON DELETE CASCADE
+-- items, run SELECT dashboard_rebuild_rollups(); afterwards.
+--
+-- Apply with: psql "$DATABASE_URL" -f migrations/004_dashboard_rollups.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS dashboard_order_daily (
+    order_date date NOT NULL,
+    status text NOT NULL,
+    customer_type text NOT NULL,
+    order_count bigint NOT NULL DEFAULT 0,
+    item_units bigint NOT NULL DEFAULT 0,
+    revenue numeric NOT NULL DEFAULT 0,
+    PRIMARY KEY (order_date, status, customer_type)
+);
+
+CREATE TABLE IF NOT EXISTS dashboard_trip_orders (
+    train_trip_id int NOT NULL,
+    departure_date_time timestamp NOT NULL,
+    orders_count bigint NOT NULL DEFAULT 0,
+    allocated_space numeric NOT NULL DEFAULT 0,
+    PRIMARY KEY (train_trip_id, departure_date_time)
+);
+
+-- Add (sign = 1) or remove (sign = -1) whole orders, items included
+CREATE OR REPLACE FUNCTION dashboard_move_orders(
+    order_ids int[], order_dates date[], statuses text[], customer_types text[], signs int[]
+) RETURNS void AS $$
+    INSERT INTO dashboard_order_daily AS d (order_date, status, customer_type, order_count, item_units, revenue)
+    SELECT m.order_date, m.status, m.customer_type,
+           SUM(m.sign), SUM(m.sign * COALESCE(t.units, 0)), SUM(m.sign * COALESCE(t.revenue, 0))
+    FROM unnest(order_ids, order_dates, statuses, customer_types, signs)
+        AS m(order_id, order_date, status, customer_type, sign)
+    LEFT JOIN (
+        SELECT oi.order_id, SUM(oi.quantity) AS units, SUM(oi.quantity * COALESCE(p.unit_price, 0)) AS revenue
+        FROM order_item oi
+        JOIN product p ON p.product_id = oi.product_id
+        WHERE oi.order_id = ANY(order_ids)
+        GROUP BY oi.order_id
+    ) t ON t.order_id = m.order_id
+    WHERE m.order_date IS NOT NULL
+    GROUP BY m.order_date, m.status, m.customer_type
+    ON CONFLICT (order_date, status, customer_type) DO UPDATE
+    SET order_count = d.order_count + EXCLUDED.order_count,
+        item_units = d.item_units + EXCLUDED.item_units,
+        revenue = d.revenue + EXCLUDED.revenue;
+$$ LANGUAGE sql;
+
+-- Add or remove order lines on their (existing) orders
+CREATE OR REPLACE FUNCTION dashboard_move_items(
+    order_ids int[], product_ids int[], quantities int[], signs int[]
+) RETURNS void AS $$
+    INSERT INTO dashboard_order_daily AS d (order_date, status, customer_type, order_count, item_units, revenue)
+    SELECT o.order_date, o.status::text, COALESCE(c.type::text, ''),
+           0, SUM(m.sign * m.quantity), SUM(m.sign * m.quantity * COALESCE(p.unit_price, 0))
+    FROM unnest(order_ids, product_ids, quantities, signs) AS m(order_id, product_id, quantity, sign)
+    JOIN "order" o ON o.order_id = m.order_id
+    LEFT JOIN customer c ON c.customer_id = o.customer_id
+    LEFT JOIN product p ON p.product_id = m.product_id
+    WHERE o.order_date IS NOT NULL
+    GROUP BY o.order_date, o.status::text, COALESCE(c.type::text, '')
+    ON CONFLICT (order_date, status, customer_type) DO UPDATE
+    SET item_units = d.item_units + EXCLUDED.item_units,
+        revenue = d.revenue + EXCLUDED.revenue;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION dashboard_order_rollup() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM dashboard_move_orders(array_agg(n.order_id), array_agg(n.order_date), array_agg(n.status::text),
+                                      array_agg(COALESCE(c.type::text, '')), array_agg(1))
+        FROM new_rows n
+        LEFT JOIN customer c ON c.customer_id = n.customer_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Only orders whose date, status or customer changed move between rows
+        PERFORM dashboard_move_orders(array_agg(m.order_id), array_agg(m.order_date), array_agg(m.status),
+                                      array_agg(m.customer_type), array_agg(m.sign))
+        FROM (
+            SELECT o.order_id, o.order_date, o.status::text AS status, COALESCE(c.type::text, '') AS customer_type, -1 AS sign
+            FROM old_rows o
+            JOIN new_rows n ON n.order_id = o.order_id
+            LEFT JOIN customer c ON c.customer_id = o.customer_id
+            WHERE (o.order_date, o.status, o.customer_id) IS DISTINCT FROM (n.order_date, n.status, n.customer_id)
+            UNION ALL
+            SELECT n.order_id, n.order_date, n.status::text, COALESCE(c.type::text, ''), 1
+            FROM old_rows o
+            JOIN new_rows n ON n.order_id = o.order_id
+            LEFT JOIN customer c ON c.customer_id = n.customer_id
+            WHERE (o.order_date, o.status, o.customer_id) IS DISTINCT FROM (n.order_date, n.status, n.customer_id)
+        ) m;
+    ELSE
+        PERFORM dashboard_move_orders(array_agg(o.order_id), array_agg(o.order_date), array_agg(o.status::text),
+                                      array_agg(COALESCE(c.type::text, '')), array_agg(-1))
+        FROM old_rows o
+        LEFT JOIN customer c ON c.customer_id = o.customer_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dashboard_order_item_rollup() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM dashboard_move_items(array_agg(order_id), array_agg(product_id), array_agg(quantity), array_agg(-1))
+        FROM old_rows;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM dashboard_move_items(array_agg(order_id), array_agg(product_id), array_agg(quantity), array_agg(1))
+        FROM new_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Revenue follows unit_price; stock updates (the common product UPDATE) change nothing here
+CREATE OR REPLACE FUNCTION dashboard_product_rollup() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO dashboard_order_daily AS d (order_date, status, customer_type, order_count, item_units, revenue)
+    SELECT o.order_date, o.status::text, COALESCE(c.type::text, ''),
+           0, 0, SUM(oi.quantity * (COALESCE(n.unit_price, 0) - COALESCE(old.unit_price, 0)))
+    FROM old_rows old
+    JOIN new_rows n ON n.product_id = old.product_id
+    JOIN order_item oi ON oi.product_id = n.product_id
+    JOIN "order" o ON o.order_id = oi.order_id
+    LEFT JOIN customer c ON c.customer_id = o.customer_id
+    WHERE old.unit_price IS DISTINCT FROM n.unit_price
+      AND o.order_date IS NOT NULL
+    GROUP BY o.order_date, o.status::text, COALESCE(c.type::text, '')
+    ON CONFLICT (order_date, status, customer_type) DO UPDATE
+    SET revenue = d.revenue + EXCLUDED.revenue;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dashboard_customer_rollup() RETURNS trigger AS $$
+BEGIN
+    PERFORM dashboard_move_orders(array_agg(m.order_id), array_agg(m.order_date), array_agg(m.status),
+                                  array_agg(m.customer_type), array_agg(m.sign))
+    FROM (
+        SELECT o.order_id, o.order_date, o.status::text AS status, COALESCE(old.type::text, '') AS customer_type, -1 AS sign
+        FROM old_rows old
+        JOIN new_rows n ON n.customer_id = old.customer_id
+        JOIN "order" o ON o.customer_id = n.customer_id
+        WHERE old.type IS DISTINCT FROM n.type
+        UNION ALL
+        SELECT o.order_id, o.order_date, o.status::text, COALESCE(n.type::text, ''), 1
+        FROM old_rows old
+        JOIN new_rows n ON n.customer_id = old.customer_id
+        JOIN "order" o ON o.customer_id = n.customer_id
+        WHERE old.type IS DISTINCT FROM n.type
+    ) m;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dashboard_train_schedule_rollup() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO dashboard_trip_orders AS d (train_trip_id, departure_date_time, orders_count, allocated_space)
+        SELECT train_trip_id, train_departure_date_time, -COUNT(*), -COALESCE(SUM(allocated_space), 0)
+        FROM old_rows
+        GROUP BY train_trip_id, train_departure_date_time
+        ON CONFLICT (train_trip_id, departure_date_time) DO UPDATE
+        SET orders_count = d.orders_count + EXCLUDED.orders_count,
+            allocated_space = d.allocated_space + EXCLUDED.allocated_space;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO dashboard_trip_orders AS d (train_trip_id, departure_date_time, orders_count, allocated_space)
+        SELECT train_trip_id, train_departure_date_time, COUNT(*), COALESCE(SUM(allocated_space), 0)
+        FROM new_rows
+        GROUP BY train_trip_id, train_departure_date_time
+        ON CONFLICT (train_trip_id, departure_date_time) DO UPDATE
+        SET orders_count = d.orders_count + EXCLUDED.orders_count,
+            allocated_space = d.allocated_space + EXCLUDED.allocated_space;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute both tables from scratch (backfill, or repair after manual deletes)
+CREATE OR REPLACE FUNCTION dashboard_rebuild_rollups() RETURNS void AS $$
+    TRUNCATE dashboard_order_daily, dashboard_trip_orders;
+
+    INSERT INTO dashboard_order_daily (order_date, status, customer_type, order_count, item_units, revenue)
+    SELECT o.order_date, o.status::text, COALESCE(c.type::text, ''),
+           COUNT(*), COALESCE(SUM(t.units), 0), COALESCE(SUM(t.revenue), 0)
+    FROM "order" o
+    LEFT JOIN customer c ON c.customer_id = o.customer_id
+    LEFT JOIN (
+        SELECT oi.order_id, SUM(oi.quantity) AS units, SUM(oi.quantity * COALESCE(p.unit_price, 0)) AS revenue
+        FROM order_item oi
+        JOIN product p ON p.product_id = oi.product_id
+        GROUP BY oi.order_id
+    ) t ON t.order_id = o.order_id
+    WHERE o.order_date IS NOT NULL
+    GROUP BY o.order_date, o.status::text, COALESCE(c.type::text, '');
+
+    INSERT INTO dashboard_trip_orders (train_trip_id, departure_date_time, orders_count, allocated_space)
+    SELECT train_trip_id, train_departure_date_time, COUNT(*), COALESCE(SUM(allocated_space), 0)
+    FROM train_schedule
+    GROUP BY train_trip_id, train_departure_date_time;
+$$ LANGUAGE sql;
+
+-- Block writers while the triggers go in and the backfill runs, so nothing is missed
+LOCK TABLE "order", order_item, product, customer, train_schedule IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS dashboard_order_insert ON "order";
+DROP TRIGGER IF EXISTS dashboard_order_update ON "order";
+DROP TRIGGER IF EXISTS dashboard_order_delete ON "order";
+CREATE TRIGGER dashboard_order_insert AFTER INSERT ON "order"
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_order_rollup();
+CREATE TRIGGER dashboard_order_update AFTER UPDATE ON "order"
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_order_rollup();
+CREATE TRIGGER dashboard_order_delete AFTER DELETE ON "order"
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_order_rollup();
+
+DROP TRIGGER IF EXISTS dashboard_order_item_insert ON order_item;
+DROP TRIGGER IF EXISTS dashboard_order_item_update ON order_item;
+DROP TRIGGER IF EXISTS dashboard_order_item_delete ON order_item;
+CREATE TRIGGER dashboard_order_item_insert AFTER INSERT ON order_item
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_order_item_rollup();
+CREATE TRIGGER dashboard_order_item_update AFTER UPDATE ON order_item
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_order_item_rollup();
+CREATE TRIGGER dashboard_order_item_delete AFTER DELETE ON order_item
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_order_item_rollup();
+
+DROP TRIGGER IF EXISTS dashboard_product_update ON product;
+CREATE TRIGGER dashboard_product_update AFTER UPDATE ON product
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_product_rollup();
+
+DROP TRIGGER IF EXISTS dashboard_customer_update ON customer;
+CREATE TRIGGER dashboard_customer_update AFTER UPDATE ON customer
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_customer_rollup();
+
+DROP TRIGGER IF EXISTS dashboard_train_schedule_insert ON train_schedule;
+DROP TRIGGER IF EXISTS dashboard_train_schedule_update ON train_schedule;
+DROP TRIGGER IF EXISTS dashboard_train_schedule_delete ON train_schedule;
+CREATE TRIGGER dashboard_train_schedule_insert AFTER INSERT ON train_schedule
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_train_schedule_rollup();
+CREATE TRIGGER dashboard_train_schedule_update AFTER UPDATE ON train_schedule
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_train_schedule_rollup();
+CREATE TRIGGER dashboard_train_schedule_delete AFTER DELETE ON train_schedule
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION dashboard_train_schedule_rollup();
+
+SELECT dashboard_rebuild_rollups();
+
+COMMIT;
@@ -0,0 +1,79 @@
+-- Materialized copies of the reporting views behind /report/*.
+--
+-- The views are recomputed in full on every query, so report latency grew with order
+-- and delivery history. Each <view>_mv holds the view's rows as of its last refresh:
+--
+--   * a unique index on the view's grain, which REFRESH MATERIALIZED VIEW CONCURRENTLY
+--     needs so readers are never blocked while a refresh runs;
+--   * an index on the report's ORDER BY, so LIMIT 100 reads 100 index entries.
+--
+-- The app refreshes them on a schedule (app/services/report_views.py) and records each
+-- refresh in report_view_refresh. The copies select from the views, so changing a view
+-- definition needs only a refresh (or a DROP/CREATE here if its columns change).
+--
+-- Apply with: psql "$DATABASE_URL" -f migrations/005_report_matviews.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS report_view_refresh (
+    view_name text PRIMARY KEY,
+    refreshed_at timestamptz NOT NULL,
+    duration_ms numeric
+);
+
+-- GET /report/train-capacity-utilization (departure_date_time DESC)
+CREATE MATERIALIZED VIEW IF NOT EXISTS train_capacity_utilization_mv AS
+    SELECT * FROM train_capacity_utilization;
+CREATE UNIQUE INDEX IF NOT EXISTS train_capacity_utilization_mv_key
+    ON train_capacity_utilization_mv (train_trip_id, departure_date_time);
+CREATE INDEX IF NOT EXISTS train_capacity_utilization_mv_departure_idx
+    ON train_capacity_utilization_mv (departure_date_time DESC);
+
+-- GET /report/delivery-performance (delivery_date_time DESC)
+CREATE MATERIALIZED VIEW IF NOT EXISTS delivery_performance_mv AS
+    SELECT * FROM delivery_performance;
+CREATE UNIQUE INDEX IF NOT EXISTS delivery_performance_mv_key
+    ON delivery_performance_mv (delivery_id, order_id);
+CREATE INDEX IF NOT EXISTS delivery_performance_mv_date_idx
+    ON delivery_performance_mv (delivery_date_time DESC);
+
+-- GET /report/employee-workload (total_hours DESC)
+CREATE MATERIALIZED VIEW IF NOT EXISTS employee_workload_mv AS
+    SELECT * FROM employee_workload;
+CREATE UNIQUE INDEX IF NOT EXISTS employee_workload_mv_key
+    ON employee_workload_mv (employee_id);
+CREATE INDEX IF NOT EXISTS employee_workload_mv_hours_idx
+    ON employee_workload_mv (total_hours DESC);
+
+-- GET /report/revenue-analysis (year DESC, quarter DESC)
+CREATE MATERIALIZED VIEW IF NOT EXISTS revenue_analysis_mv AS
+    SELECT * FROM revenue_analysis;
+CREATE UNIQUE INDEX IF NOT EXISTS revenue_analysis_mv_key
+    ON revenue_analysis_mv (year, quarter, month, customer_type);
+CREATE INDEX IF NOT EXISTS revenue_analysis_mv_period_idx
+    ON revenue_analysis_mv (year DESC, quarter DESC);
+
+-- GET /report/product-performance (total_revenue DESC)
+CREATE MATERIALIZED VIEW IF NOT EXISTS product_performance_mv AS
+    SELECT * FROM product_performance;
+CREATE UNIQUE INDEX IF NOT EXISTS product_performance_mv_key
+    ON product_performance_mv (product_id);
+CREATE INDEX IF NOT EXISTS product_performance_mv_revenue_idx
+    ON product_performance_mv (total_revenue DESC);
+
+-- GET /report/inventory-alerts (alert_level DESC, available_units)
+CREATE MATERIALIZED VIEW IF NOT EXISTS inventory_alerts_mv AS
+    SELECT * FROM inventory_alerts;
+CREATE UNIQUE INDEX IF NOT EXISTS inventory_alerts_mv_key
+    ON inventory_alerts_mv (product_id);
+CREATE INDEX IF NOT EXISTS inventory_alerts_mv_level_idx
+    ON inventory_alerts_mv (alert_level DESC, available_units);
+
+-- The copies were populated just now
+INSERT INTO report_view_refresh (view_name, refreshed_at)
+VALUES ('train_capacity_utilization', NOW()), ('delivery_performance', NOW()),
+       ('employee_workload', NOW()), ('revenue_analysis', NOW()),
+       ('product_performance', NOW()), ('inventory_alerts', NOW())
+ON CONFLICT (view_name) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,18 @@
+-- Version counters behind the ETags of the catalog endpoints.
+--
+-- /products, /inventory, /stores/stores, /routes/routes, /Trucks/trucks and
+-- /employee-types answer If-None-Match from an in-process copy of these counters,
+-- so a 304 never queries the database. Endpoints that change a catalog bump its row
+-- in the same transaction. The counters start at the current epoch in milliseconds, so
+-- recreating this table never hands out a version a client has already seen.
+--
+-- Apply with: psql "$DATABASE_URL" -f migrations/006_catalog_versions.sql
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+    resource text PRIMARY KEY,
+    version bigint NOT NULL DEFAULT (extract(epoch FROM clock_timestamp()) * 1000)::bigint
+);
+
+INSERT INTO catalog_version (resource)
+VALUES ('product'), ('inventory'), ('store'), ('route'), ('truck'), ('employee_type')
+ON CONFLICT (resource) DO NOTHING;
@@ -0,0 +1,23 @@
+-- Database-generated delivery_id, as 002_id_sequences.sql does for the other tables.
+--
+-- POST /deliveries/plan preallocates the ids of the deliveries it writes with
+-- nextval(pg_get_serial_sequence('delivery', 'delivery_id')), so the column needs an
+-- owned sequence. This reuses an existing serial/identity sequence, or creates one and
+-- makes it the column default, then moves the sequence past the current MAX(delivery_id).
+-- Safe to re-run; re-run it after any bulk load that sets ids explicitly.
+--
+-- Apply with: psql "$DATABASE_URL" -f migrations/007_delivery_id_sequence.sql
+
+DO $$
+DECLARE
+    seq text;
+BEGIN
+    seq := pg_get_serial_sequence('delivery', 'delivery_id');
+    IF seq IS NULL THEN
+        seq := 'delivery_delivery_id_seq';
+        CREATE SEQUENCE IF NOT EXISTS delivery_delivery_id_seq OWNED BY delivery.delivery_id;
+        ALTER TABLE delivery ALTER COLUMN delivery_id SET DEFAULT nextval('delivery_delivery_id_seq');
+    END IF;
+    PERFORM setval(seq, COALESCE((SELECT MAX(delivery_id) FROM delivery), 0) + 1, false);
+END;
+$$;
@@ -0,0 +1,25 @@
+-- Sequence-backed version for the /inventory ETag.
+--
+-- 006_catalog_versions.sql bumps a catalog_version row inside each writer's
+-- transaction. Every order changes stock, so every order transaction updated the
+-- 'inventory' row and held its lock until commit, serializing order creation across
+-- all workers. The inventory version now comes from nextval(), which is
+-- non-transactional and takes no row lock. The sequence continues from the row's
+-- current version (or the epoch in milliseconds, if higher), so clients never see a
+-- version reused; the row itself is removed.
+--
+-- Apply with: psql "$DATABASE_URL" -f migrations/008_inventory_version_seq.sql
+
+BEGIN;
+
+CREATE SEQUENCE IF NOT EXISTS inventory_version_seq;
+
+SELECT setval('inventory_version_seq', GREATEST(
+    (SELECT last_value FROM inventory_version_seq),
+    (SELECT version FROM catalog_version WHERE resource = 'inventory'),
+    (extract(epoch FROM clock_timestamp()) * 1000)::bigint
+));
+
+DELETE FROM catalog_version WHERE resource = 'inventory';
+
+COMMIT;
@@ -0,0 +1,102 @@
+-- Spread dashboard_order_daily writes over hashed sub-rows.
+--
+-- The 004 triggers upsert one row per (order_date, status, customer_type), so every new
+-- order and its items updated the same today / 'Pending' / type row and held its lock
+-- until commit, serializing order creation across all workers. Each key now has up to
+-- DASHBOARD_ROLLUP_SLOTS rows: a trigger writes to the slot picked by its backend's pid,
+-- so concurrent order transactions on different connections update different rows.
+--
+-- Readers already SUM(...) over the table (grouped by date, status or type), so they
+-- see the same totals. dashboard_compact_rollups() folds the slots back into slot 0;
+-- it is optional and only trims rows, since a key never has more than 16.
+--
+-- Apply with: psql "$DATABASE_URL" -f migrations/009_dashboard_rollup_slots.sql
+
+BEGIN;
+
+ALTER TABLE dashboard_order_daily ADD COLUMN IF NOT EXISTS slot smallint NOT NULL DEFAULT 0;
+ALTER TABLE dashboard_order_daily DROP CONSTRAINT IF EXISTS dashboard_order_daily_pkey;
+ALTER TABLE dashboard_order_daily ADD PRIMARY KEY (order_date, status, customer_type, slot);
+
+-- DASHBOARD_ROLLUP_SLOTS = 16; replace this function to change it
+CREATE OR REPLACE FUNCTION dashboard_rollup_slot() RETURNS smallint AS $$
+    SELECT (pg_backend_pid() % 16)::smallint;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION dashboard_move_orders(
+    order_ids int[], order_dates date[], statuses text[], customer_types text[], signs int[]
+) RETURNS void AS $$
+    INSERT INTO dashboard_order_daily AS d (order_date, status, customer_type, slot, order_count, item_units, revenue)
+    SELECT m.order_date, m.status, m.customer_type, dashboard_rollup_slot(),
+           SUM(m.sign), SUM(m.sign * COALESCE(t.units, 0)), SUM(m.sign * COALESCE(t.revenue, 0))
+    FROM unnest(order_ids, order_dates, statuses, customer_types, signs)
+        AS m(order_id, order_date, status, customer_type, sign)
+    LEFT JOIN (
+        SELECT oi.order_id, SUM(oi.quantity) AS units, SUM(oi.quantity * COALESCE(p.unit_price, 0)) AS revenue
+        FROM order_item oi
+        JOIN product p ON p.product_id = oi.product_id
+        WHERE oi.order_id = ANY(order_ids)
+        GROUP BY oi.order_id
+    ) t ON t.order_id = m.order_id
+    WHERE m.order_date IS NOT NULL
+    GROUP BY m.order_date, m.status, m.customer_type
+    ON CONFLICT (order_date, status, customer_type, slot) DO UPDATE
+    SET order_count = d.order_count + EXCLUDED.order_count,
+        item_units = d.item_units + EXCLUDED.item_units,
+        revenue = d.revenue + EXCLUDED.revenue;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION dashboard_move_items(
+    order_ids int[], product_ids int[], quantities int[], signs int[]
+) RETURNS void AS $$
+    INSERT INTO dashboard_order_daily AS d (order_date, status, customer_type, slot, order_count, item_units, revenue)
+    SELECT o.order_date, o.status::text, COALESCE(c.type::text, ''), dashboard_rollup_slot(),
+           0, SUM(m.sign * m.quantity), SUM(m.sign * m.quantity * COALESCE(p.unit_price, 0))
+    FROM unnest(order_ids, product_ids, quantities, signs) AS m(order_id, product_id, quantity, sign)
+    JOIN "order" o ON o.order_id = m.order_id
+    LEFT JOIN customer c ON c.customer_id = o.customer_id
+    LEFT JOIN product p ON p.product_id = m.product_id
+    WHERE o.order_date IS NOT NULL
+    GROUP BY o.order_date, o.status::text, COALESCE(c.type::text, '')
+    ON CONFLICT (order_date, status, customer_type, slot) DO UPDATE
+    SET item_units = d.item_units + EXCLUDED.item_units,
+        revenue = d.revenue + EXCLUDED.revenue;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION dashboard_product_rollup() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO dashboard_order_daily AS d (order_date, status, customer_type, slot, order_count, item_units, revenue)
+    SELECT o.order_date, o.status::text, COALESCE(c.type::text, ''), dashboard_rollup_slot(),
+           0, 0, SUM(oi.quantity * (COALESCE(n.unit_price, 0) - COALESCE(old.unit_price, 0)))
+    FROM old_rows old
+    JOIN new_rows n ON n.product_id = old.product_id
+    JOIN order_item oi ON oi.product_id = n.product_id
+    JOIN "order" o ON o.order_id = oi.order_id
+    LEFT JOIN customer c ON c.customer_id = o.customer_id
+    WHERE old.unit_price IS DISTINCT FROM n.unit_price
+      AND o.order_date IS NOT NULL
+    GROUP BY o.order_date, o.status::text, COALESCE(c.type::text, '')
+    ON CONFLICT (order_date, status, customer_type, slot) DO UPDATE
+    SET revenue = d.revenue + EXCLUDED.revenue;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Fold every key's slots into slot 0 (optional housekeeping, e.g. nightly)
+CREATE OR REPLACE FUNCTION dashboard_compact_rollups() RETURNS void AS $$
+    WITH moved AS (
+        DELETE FROM dashboard_order_daily
+        WHERE slot <> 0
+        RETURNING order_date, status, customer_type, order_count, item_units, revenue
+    )
+    INSERT INTO dashboard_order_daily AS d (order_date, status, customer_type, slot, order_count, item_units, revenue)
+    SELECT order_date, status, customer_type, 0, SUM(order_count), SUM(item_units), SUM(revenue)
+    FROM moved
+    GROUP BY order_date, status, customer_type
+    ON CONFLICT (order_date, status, customer_type, slot) DO UPDATE
+    SET order_count = d.order_count + EXCLUDED.order_count,
+        item_units = d.item_units + EXCLUDED.item_units,
+        revenue = d.revenue + EXCLUDED.revenue;
+$$ LANGUAGE sql;
+
+COMMIT;
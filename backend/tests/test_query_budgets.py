@@ -0,0 +1,89 @@
+"""
+Round-trip budgets of the dashboard and list handlers, without a database.
+
+Each handler in app.api.bench.ENDPOINTS runs against a stub connection whose cursors
+count execute() calls and answer every query with a few rows whose columns read as 0.
+A handler that goes back to one query per metric or per row (N+1) exceeds its budget
+here; the same budgets are checked against a live database by `python -m app.api.bench`.
+"""
+import asyncio
+
+import pytest
+
+from app.api.bench import ENDPOINTS
+from app.services.lookups import lookups
+
+# Rows per result set; more than one, so per-row lookups show up as extra round trips
+STUB_ROWS = 3
+
+
+class StubRow(dict):
+    """A result row where every column (by name or position) reads as 0."""
+
+    def __missing__(self, key):
+        return 0
+
+
+class StubCursor:
+    def __init__(self, counter):
+        self._counter = counter
+        self.rowcount = 0
+
+    def execute(self, *args, **kwargs):
+        self._counter[0] += 1
+
+    def fetchone(self):
+        return StubRow()
+
+    def fetchall(self):
+        return [StubRow() for _ in range(STUB_ROWS)]
+
+    def close(self):
+        pass
+
+
+class AsyncStubCursor(StubCursor):
+    async def execute(self, *args, **kwargs):
+        self._counter[0] += 1
+
+    async def fetchone(self):
+        return StubRow()
+
+    async def fetchall(self):
+        return [StubRow() for _ in range(STUB_ROWS)]
+
+    async def close(self):
+        pass
+
+
+class StubConnection:
+    def __init__(self, is_async):
+        self.counter = [0]
+        self._cursor = AsyncStubCursor if is_async else StubCursor
+
+    def cursor(self, *args, **kwargs):
+        return self._cursor(self.counter)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def round_trips(handler, kwargs):
+    is_async = asyncio.iscoroutinefunction(handler)
+    conn = StubConnection(is_async)
+    result = handler(current_user={"user_id": 1, "role_id": 1}, conn=conn, **kwargs)
+    if is_async:
+        asyncio.run(result)
+    return conn.counter[0]
+
+
+@pytest.mark.parametrize("name", list(ENDPOINTS))
+def test_round_trip_budget(name):
+    handler, budget, kwargs = ENDPOINTS[name]
+    lookups.invalidate()
+    # The first call loads process-level caches, as a running server would have
+    round_trips(handler, kwargs)
+    assert round_trips(handler, kwargs) <= budget
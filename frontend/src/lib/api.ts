@@ -185,17 +185,61 @@ export async function getProducts() {
   }
 }
 
+// List endpoints return one page at a time: { items, next_cursor, limit }.
+// Pass next_cursor back as `cursor` to get the following page.
+export interface Page<T> {
+  items: T[]
+  next_cursor: string | null
+  limit: number
+}
+export type PageParams = Record<string, string | number | null | undefined> & {
+  cursor?: string | null
+  limit?: number
+}
+
+// Largest page the backend serves (MAX_PAGE_SIZE)
+const LIST_LIMIT = 500
+
+export async function fetchPage<T>(path: string, params: PageParams = {}) {
+  const qs = new URLSearchParams()
+  for (const [key, value] of Object.entries(params)) {
+    if (value != null && value !== '') qs.set(key, String(value))
+  }
+  const query = qs.toString()
+  const res = await apiFetch<Page<T>>(query ? `${path}?${query}` : path)
+  return { items: Array.isArray(res?.items) ? res.items : [], next_cursor: res?.next_cursor ?? null, limit: res?.limit ?? 0 }
+}
+
+// Rows per page of the paged tables (orders, deliveries, audit log)
+export const PAGE_SIZE = 50
+
+export function emptyPage<T>(): Page<T> {
+  return { items: [], next_cursor: null, limit: 0 }
+}
+
+// Every item from `params.cursor` (or the start) on, following next_cursor page by page.
+// Only for short lists needed whole, such as dropdown options; tables use fetchPage.
+export async function fetchAll<T>(path: string, params: PageParams = {}) {
+  const items: T[] = []
+  let cursor = params.cursor ?? null
+  do {
+    const page = await fetchPage<T>(path, { limit: LIST_LIMIT, ...params, cursor })
+    items.push(...page.items)
+    cursor = page.next_cursor
+  } while (cursor)
+  return items
+}
+
 export interface OrderSummary {
   order_id: number
   status: string
 }
-export async function getOrders() {
+export async function getOrders(params: PageParams = {}) {
   try {
-    const res = await apiFetch<OrderSummary[]>('/orders')
-    return Array.isArray(res) ? res : []
+    return await fetchPage<OrderSummary>('/orders', { limit: PAGE_SIZE, ...params })
   } catch (err) {
-    console.warn('getOrders failed, returning empty list:', err)
-    return [] as OrderSummary[]
+    console.warn('getOrders failed, returning empty page:', err)
+    return emptyPage<OrderSummary>()
   }
 }
 
@@ -423,9 +467,10 @@ export interface EmployeeSummary {
   lastName: string
   type: string
 }
-export async function getEmployees() {
+// Whole list: it fills the driver and assistant dropdowns
+export async function getEmployees(params: PageParams = {}) {
   try {
-    return await apiFetch<EmployeeSummary[]>('/employees')
+    return await fetchAll<EmployeeSummary>('/employees', params)
   } catch (err) {
     console.warn('getEmployees failed:', err)
     return []
@@ -469,12 +514,12 @@ export async function getRoutes() {
     return []
   }
 }
-export async function getDeliveries() {
+export async function getDeliveries(params: PageParams = {}) {
   try {
-    return await apiFetch<DeliveryInfo[]>('/deliveries/deliveries')
+    return await fetchPage<DeliveryInfo>('/deliveries/deliveries', { limit: PAGE_SIZE, ...params })
   } catch (err) {
     console.warn('getDeliveries failed:', err)
-    return []
+    return emptyPage<DeliveryInfo>()
   }
 }
 
@@ -511,12 +556,12 @@ export interface AuditLog {
   row_data?: any
 }
 
-export async function getAuditLogs() {
+export async function getAuditLogs(params: PageParams = {}) {
   try {
-    return await apiFetch<AuditLog[]>('/auditlog')
+    return await fetchPage<AuditLog>('/auditlog', { limit: PAGE_SIZE, ...params })
   } catch (err) {
     console.warn('getAuditLogs failed:', err)
-    return []
+    return emptyPage<AuditLog>()
   }
 }
 
@@ -796,10 +841,10 @@ export interface Store {
   near_station_name?: string
 }
 
-export async function getStores() {
+// Whole list: it fills the store selector
+export async function getStores(params: PageParams = {}) {
   try {
-    const res = await apiFetch<Store[]>('/stores')
-    return Array.isArray(res) ? res : []
+    return await fetchAll<Store>('/stores/stores', params)
   } catch (err) {
     console.warn('getStores failed:', err)
     return []
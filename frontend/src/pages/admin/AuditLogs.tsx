@@ -7,13 +7,18 @@ function AuditLogs() {
   const [searchTerm, setSearchTerm] = useState('')
   const [logs, setLogs] = useState<AuditLog[]>([])
   const [loading, setLoading] = useState(true)
+  // Cursor of every page up to the one shown (null for the first page), and the next page's
+  const [cursors, setCursors] = useState<(string | null)[]>([null])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
 
   useEffect(() => {
     let mounted = true
-    getAuditLogs()
-      .then((logList) => {
+    setLoading(true)
+    getAuditLogs({ cursor: cursors[cursors.length - 1] })
+      .then((page) => {
         if (!mounted) return
-        setLogs(logList)
+        setLogs(page.items)
+        setNextCursor(page.next_cursor)
       })
       .catch((err) => {
         console.error('Failed to load audit logs:', err)
@@ -25,7 +30,7 @@ function AuditLogs() {
     return () => {
       mounted = false
     }
-  }, [])
+  }, [cursors])
 
   const actionTypes = [
     { value: 'all', label: 'All Actions', count: logs.length },
@@ -147,13 +152,21 @@ function AuditLogs() {
       </div>
 
       <div className="logs-pagination">
-        <button className="btn-page" disabled>
+        <button
+          className="btn-page"
+          disabled={cursors.length === 1}
+          onClick={() => setCursors(prev => prev.slice(0, -1))}
+        >
           ← Previous
         </button>
         <div className="page-info">
-          Page 1 of 5
+          Page {cursors.length}
         </div>
-        <button className="btn-page">
+        <button
+          className="btn-page"
+          disabled={!nextCursor}
+          onClick={() => setCursors(prev => [...prev, nextCursor])}
+        >
           Next →
         </button>
       </div>
@@ -5,15 +5,32 @@ import { allocateOrderToTrain, getOrderDetails, getOrders, updateOrderStatus, ty
 
 function OrdersManagement() {
   const [orders, setOrders] = useState<OrderSummary[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [selectedId, setSelectedId] = useState<number | null>(null)
   const [details, setDetails] = useState<OrderDetails | null>(null)
   const [loading, setLoading] = useState(false)
   const [updating, setUpdating] = useState(false)
 
   useEffect(() => {
-    getOrders().then(setOrders)
+    getOrders().then(page => {
+      setOrders(page.items)
+      setNextCursor(page.next_cursor)
+    })
   }, [])
 
+  async function loadMore() {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    try {
+      const page = await getOrders({ cursor: nextCursor })
+      setOrders(prev => [...prev, ...page.items])
+      setNextCursor(page.next_cursor)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   useEffect(() => {
     if (selectedId == null) return
     setLoading(true)
@@ -29,11 +46,10 @@ function OrdersManagement() {
     setUpdating(true)
     try {
       await updateOrderStatus(selectedId, status)
-      const refreshed = await getOrders()
-      setOrders(refreshed)
-      const current = refreshed.find(o => o.order_id === selectedId)
-      if (!current) setSelectedId(null)
-      else setSelectedId(current.order_id)
+      // Update the loaded row in place rather than reloading every page shown so far
+      setOrders(prev => prev.map(o => (o.order_id === selectedId ? { ...o, status } : o)))
+      const refreshed = await getOrderDetails(selectedId)
+      setDetails(refreshed)
     } finally {
       setUpdating(false)
     }
@@ -65,6 +81,11 @@ function OrdersManagement() {
                 <span className="order-status">{o.status}</span>
               </button>
             ))}
+            {nextCursor && (
+              <button className="btn btn-secondary" disabled={loadingMore} onClick={loadMore}>
+                {loadingMore ? 'Loading…' : 'Load more'}
+              </button>
+            )}
           </div>
 
           <div className="order-details">
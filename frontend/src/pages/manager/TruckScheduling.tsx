@@ -8,6 +8,8 @@ function TruckScheduling() {
   const [trucks, setTrucks] = useState<Truck[]>([])
   const [routes, setRoutes] = useState<RouteInfo[]>([])
   const [deliveries, setDeliveries] = useState<DeliveryInfo[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [employees, setEmployees] = useState<EmployeeSummary[]>([])
   const [userId, setUserId] = useState<number | null>(null)
 
@@ -21,7 +23,7 @@ function TruckScheduling() {
   useEffect(() => {
     getTrucks().then(setTrucks)
     getRoutes().then(setRoutes)
-    getDeliveries().then(setDeliveries)
+    loadDeliveries()
     getEmployees().then(setEmployees)
     getProfile().then(p => setUserId(p.user_id)).catch(() => setUserId(null))
   }, [])
@@ -29,6 +31,24 @@ function TruckScheduling() {
   const drivers = useMemo(() => employees.filter(e => e.type.toLowerCase().includes('driver')), [employees])
   const assistants = useMemo(() => employees.filter(e => e.type.toLowerCase().includes('assistant')), [employees])
 
+  async function loadDeliveries() {
+    const page = await getDeliveries()
+    setDeliveries(page.items)
+    setNextCursor(page.next_cursor)
+  }
+
+  async function loadMore() {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    try {
+      const page = await getDeliveries({ cursor: nextCursor })
+      setDeliveries(prev => [...prev, ...page.items])
+      setNextCursor(page.next_cursor)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   async function submit() {
     if (!userId || !truckId || !routeId || !dateTime) return
     setSubmitting(true)
@@ -42,8 +62,7 @@ function TruckScheduling() {
         assistant_employee_id: assistantId ? Number(assistantId) : null,
       })
       setTruckId(''); setRouteId(''); setDriverId(''); setAssistantId(''); setDateTime('')
-      const refreshed = await getDeliveries()
-      setDeliveries(refreshed)
+      await loadDeliveries()
     } finally {
       setSubmitting(false)
     }
@@ -115,6 +134,11 @@ function TruckScheduling() {
               </div>
             ))}
             {deliveries.length === 0 && <div className="subtext text-center">No deliveries scheduled</div>}
+            {nextCursor && (
+              <button className="btn btn-secondary" disabled={loadingMore} onClick={loadMore}>
+                {loadingMore ? 'Loading…' : 'Load more'}
+              </button>
+            )}
           </div>
         </div>
       </div>